@@ -0,0 +1,336 @@
+"""
+Local stand-in for the Spotify Web API, used to exercise SpotifySearcher without the live service.
+
+Three modes are available:
+- fake: answer from a canned catalog (unknown track IDs get a deterministic synthetic track)
+- record: forward requests to the real API and save every response as a fixture
+- replay: answer only from previously recorded fixtures
+
+Latency and 429 responses can be injected in every mode. Point SpotifySearcher at the server with
+`api_url=server.api_url, auth_url=server.auth_url`, or `mporg --spotify-url ... --spotify-auth-url ...`.
+
+Usage:
+    python -m benchmarks.fake_spotify --port 8777 --latency 0.05 --rate-limit 0.1
+    python -m benchmarks.fake_spotify --record fixtures/
+    python -m benchmarks.fake_spotify --replay fixtures/
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+
+from mporg.spotify_searcher import API_URL, AUTH_URL
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+
+def make_track(track_id: str, name: str, artists: list[str], album: str = None, album_artists: list[str] = None,
+               release_date: str = "2023-01-01", track_number: int = 1, total_tracks: int = 10) -> dict:
+    """
+    Build a track object shaped like the Spotify Web API's
+    """
+    album = album or f"{name} - Single"
+    album_artists = album_artists or artists
+    album_id = hashlib.md5(f"{album}-{album_artists}".encode()).hexdigest()[:22]
+    return {
+        "id": track_id,
+        "name": name,
+        "track_number": track_number,
+        "disc_number": 1,
+        "artists": [{"id": _artist_id(a), "name": a} for a in artists],
+        "album": {
+            "id": album_id,
+            "name": album,
+            "release_date": release_date,
+            "total_tracks": total_tracks,
+            "artists": [{"id": _artist_id(a), "name": a} for a in album_artists],
+            "images": [{"url": f"https://i.scdn.co/image/{album_id}", "height": 640, "width": 640}],
+        },
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+def _artist_id(name: str) -> str:
+    return hashlib.md5(name.encode()).hexdigest()[:22]
+
+
+class FakeCatalog:
+    """
+    Canned tracks served in fake mode
+    """
+    def __init__(self, tracks: list[dict] = None):
+        self.tracks = {}
+        self.artists = {}
+        for track in tracks or []:
+            self.add(track)
+
+    def add(self, track: dict):
+        self.tracks[track["id"]] = track
+        for artist in track["artists"] + track["album"]["artists"]:
+            self.artists[artist["id"]] = artist["name"]
+
+    def add_track(self, name: str, artists: list[str], **kwargs) -> dict:
+        track_id = hashlib.md5(f"{name}-{artists}".encode()).hexdigest()[:22]
+        track = make_track(track_id, name, artists, **kwargs)
+        self.add(track)
+        return track
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        # SpotifySearcher queries "<first artist> <track name>"
+        return [t for t in self.tracks.values() if f"{t['artists'][0]['name']} {t['name']}" == query][:limit]
+
+    def track(self, track_id: str) -> dict:
+        if track_id not in self.tracks:
+            self.add(make_track(track_id, f"Track {track_id}", [f"Artist {track_id[:4]}"]))
+        return self.tracks[track_id]
+
+    def artist(self, artist_id: str) -> dict:
+        name = self.artists.get(artist_id, f"Artist {artist_id[:4]}")
+        genres = ["rock", "indie"] if int(hashlib.md5(artist_id.encode()).hexdigest(), 16) % 2 else ["pop"]
+        return {"id": artist_id, "name": name, "genres": genres}
+
+    @staticmethod
+    def audio_analysis(track_id: str) -> dict:
+        seed = int(hashlib.md5(track_id.encode()).hexdigest(), 16)
+        return {"track": {"tempo": 60 + seed % 120, "key": seed % 12}}
+
+    @classmethod
+    def load(cls, path: Path) -> "FakeCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+def fixture_key(method: str, path: str, query: list[tuple[str, str]]) -> str:
+    raw = json.dumps([method, path, sorted(query)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server standing in for api.spotify.com and accounts.spotify.com
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, catalog: FakeCatalog = None, latency: float = 0,
+                 jitter: float = 0, rate_limit: float = 0, rate_limit_every: int = 0, retry_after: int = 1,
+                 record: Path = None, replay: Path = None, upstream: str = API_URL, upstream_auth: str = AUTH_URL,
+                 seed: int = None):
+        """
+        :param catalog: Tracks to serve in fake mode
+        :param latency: Seconds added to every response
+        :param jitter: Maximum random seconds added on top of latency
+        :param rate_limit: Probability of answering a request with 429
+        :param rate_limit_every: Answer every Nth request with 429, 0 to disable
+        :param retry_after: Value of the Retry-After header sent with 429 responses
+        :param record: Directory to save fixtures to, forwarding requests upstream
+        :param replay: Directory to serve fixtures from
+        :param upstream: API the recorder forwards to
+        :param upstream_auth: Token endpoint the recorder forwards to
+        :param seed: Seed for latency jitter and 429 injection
+        """
+        super().__init__((host, port), FakeSpotifyHandler)
+        if record and replay:
+            raise ValueError("Cannot record and replay at the same time")
+        self.catalog = catalog or FakeCatalog()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.record = Path(record) if record else None
+        self.replay = Path(replay) if replay else None
+        self.upstream = upstream.rstrip("/")
+        self.upstream_auth = upstream_auth
+        self.random = random.Random(seed)
+        self.upstream_session = requests.Session()
+
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.endpoint_counts = {}
+        self._thread = None
+
+        if self.record:
+            self.record.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def auth_url(self) -> str:
+        return f"{self.base_url}/api/token"
+
+    def start(self) -> "FakeSpotifyServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="FakeSpotifyServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def count_request(self, endpoint: str) -> bool:
+        """
+        Count a request and decide if it gets rate limited
+        :return bool: True if the request should be answered with 429
+        """
+        with self._lock:
+            self.request_count += 1
+            self.endpoint_counts[endpoint] = self.endpoint_counts.get(endpoint, 0) + 1
+            limited = bool(self.rate_limit_every and self.request_count % self.rate_limit_every == 0)
+            limited = limited or (self.rate_limit > 0 and self.random.random() < self.rate_limit)
+            if limited:
+                self.rate_limited_count += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        return limited
+
+    def fixture_path(self, method: str, path: str, query: list[tuple[str, str]]) -> Path:
+        directory = self.record or self.replay
+        return directory / f"{fixture_key(method, path, query)}.json"
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    server: FakeSpotifyServer
+
+    def log_message(self, format, *args):
+        logging.debug(f"FakeSpotify: {format % args}")
+
+    def _send_json(self, status: int, body, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str):
+        self._send_json(status, {"error": {"status": status, "message": message}})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        form = self.rfile.read(length)
+        if path != "/api/token":
+            return self._error(404, "Not found")
+        if self.server.record:  # Tokens are forwarded but never recorded
+            resp = self.server.upstream_session.post(
+                self.server.upstream_auth, data=form,
+                headers={"Content-Type": self.headers.get("Content-Type", "application/x-www-form-urlencoded")})
+            return self._send_json(resp.status_code, resp.json())
+        self._send_json(200, {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 3600})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qsl(url.query)
+        parts = url.path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "v1":
+            return self._error(404, "Not found")
+        endpoint = parts[1]
+
+        if self.server.count_request(endpoint):
+            return self._send_json(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                                   {"Retry-After": str(self.server.retry_after)})
+
+        if self.server.record:
+            return self._forward(url.path, query)
+        if self.server.replay:
+            return self._replay(url.path, query)
+        self._fake(endpoint, parts[2:], dict(query))
+
+    def _fake(self, endpoint: str, args: list[str], query: dict):
+        catalog = self.server.catalog
+        if endpoint == "search":
+            items = catalog.search(query.get("q", ""), int(query.get("limit", 20)))
+            return self._send_json(200, {"tracks": {"items": items, "total": len(items)}})
+        if not args:
+            return self._error(400, "Missing id")
+        if endpoint == "tracks":
+            return self._send_json(200, catalog.track(args[0]))
+        if endpoint == "artists":
+            return self._send_json(200, catalog.artist(args[0]))
+        if endpoint == "audio-analysis":
+            return self._send_json(200, catalog.audio_analysis(args[0]))
+        self._error(404, "Not found")
+
+    def _forward(self, path: str, query: list[tuple[str, str]]):
+        upstream_path = path[len("/v1"):]
+        resp = self.server.upstream_session.get(f"{self.server.upstream}{upstream_path}", params=query,
+                                                headers={"Authorization": self.headers.get("Authorization", "")},
+                                                timeout=20)
+        body = resp.json() if resp.content else None
+        headers = {"Retry-After": resp.headers["Retry-After"]} if "Retry-After" in resp.headers else {}
+        if resp.status_code != 429:  # Rate limits are injected on replay instead
+            fixture = {"method": "GET", "path": path, "query": query, "status": resp.status_code,
+                       "headers": headers, "body": body}
+            with open(self.server.fixture_path("GET", path, query), "w", encoding="utf-8") as f:
+                json.dump(fixture, f)
+        self._send_json(resp.status_code, body, headers)
+
+    def _replay(self, path: str, query: list[tuple[str, str]]):
+        try:
+            with open(self.server.fixture_path("GET", path, query), "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            return self._error(404, f"No recorded fixture for {path}")
+        self._send_json(fixture["status"], fixture["body"], fixture.get("headers"))
+
+
+def main():
+    arg_parser = ArgumentParser(description="Local stand-in for the Spotify Web API")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8777)
+    arg_parser.add_argument("--catalog", type=Path, help="JSON list of Spotify track objects to serve")
+    arg_parser.add_argument("--latency", type=float, default=0, help="Seconds added to every response")
+    arg_parser.add_argument("--jitter", type=float, default=0, help="Maximum random seconds added to latency")
+    arg_parser.add_argument("--rate-limit", type=float, default=0, help="Probability of a 429 response")
+    arg_parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    arg_parser.add_argument("--retry-after", type=int, default=1, help="Retry-After header of 429 responses")
+    arg_parser.add_argument("--seed", type=int, help="Seed for jitter and 429 injection")
+    mode = arg_parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", type=Path, metavar="DIR", help="Forward to the real API and save fixtures")
+    mode.add_argument("--replay", type=Path, metavar="DIR", help="Serve previously recorded fixtures")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    catalog = FakeCatalog.load(args.catalog) if args.catalog else None
+    server = FakeSpotifyServer(args.host, args.port, catalog, args.latency, args.jitter, args.rate_limit,
+                               args.rate_limit_every, args.retry_after, args.record, args.replay, seed=args.seed)
+    print(f"Serving on {server.base_url}: --spotify-url {server.api_url} --spotify-auth-url {server.auth_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"{server.request_count} requests, {server.rate_limited_count} rate limited")
+
+
+if __name__ == "__main__":
+    main()
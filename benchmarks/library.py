@@ -0,0 +1,256 @@
+"""
+Synthetic music library generator for benchmarks.
+
+Files are tiny but valid MP3, FLAC, M4A and OGG Vorbis containers built by hand, then tagged through mutagen with
+realistic metadata and embedded cover art, so MPORG reads and writes them exactly like real downloads.
+
+Usage:
+    python -m benchmarks.library OUT_DIR --size 1000 --formats mp3=0.6 flac=0.2 m4a=0.1 ogg=0.1
+"""
+import base64
+import os
+import random
+import struct
+import zlib
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from pathlib import Path
+
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import ID3, APIC, COMM, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TRCK
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.ogg import OggPage
+from mutagen.oggvorbis import OggVorbis
+from mutagen._vorbis import VCommentDict
+
+DEFAULT_FORMATS = {"mp3": 0.6, "flac": 0.2, "m4a": 0.1, "ogg": 0.1}
+GENRES = ["Rock", "Pop", "Jazz", "Electronic", "Hip-Hop", "Classical", "Folk", "Metal"]
+WORDS = ["Blue", "Night", "Echo", "Golden", "River", "Static", "Paper", "Neon", "Velvet", "Hollow", "Summer",
+         "Signal", "Glass", "Wild", "Silent", "Electric", "Dust", "Ocean", "Fire", "Midnight", "Lost", "Northern"]
+
+
+@dataclass
+class TrackSpec:
+    """
+    Metadata written to a generated file
+    """
+    title: str = None
+    artist: str = None
+    album: str = None
+    album_artist: str = None
+    date: str = None
+    track_number: int = None
+    total_tracks: int = None
+    genre: str = None
+    spotify_url: str = None
+
+
+def make_png(width: int, height: int, rng: random.Random) -> bytes:
+    """
+    Build a valid RGB PNG filled with noise, so it compresses about as badly as real cover art
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def _write_mp3(path: Path, spec: TrackSpec, art: bytes, seconds: float):
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417 byte frames of 1152 samples
+    frame = b"\xff\xfb\x90\x00" + b"\x00" * 413
+    with open(path, "wb") as f:
+        f.write(frame * max(1, int(seconds * 44100 / 1152)))
+
+    tags = ID3()
+    for frame_type, value in ((TIT2, spec.title), (TPE1, spec.artist), (TALB, spec.album), (TPE2, spec.album_artist),
+                              (TDRC, spec.date), (TCON, spec.genre)):
+        if value:
+            tags.add(frame_type(encoding=3, text=value))
+    if spec.track_number:
+        tags.add(TRCK(encoding=3, text=f"{spec.track_number}/{spec.total_tracks}"))
+    if spec.spotify_url:
+        tags.add(COMM(encoding=3, lang="XXX", desc="Spotify URL", text=[spec.spotify_url]))
+    if art:
+        tags.add(APIC(encoding=3, mime="image/png", type=3, desc="Cover", data=art))
+    tags.save(path)
+
+
+def _vorbis_fields(spec: TrackSpec) -> dict:
+    fields = {"TITLE": spec.title, "ARTIST": spec.artist, "ALBUM": spec.album, "ALBUMARTIST": spec.album_artist,
+              "DATE": spec.date, "GENRE": spec.genre, "COMMENT": spec.spotify_url,
+              "TRACKNUMBER": str(spec.track_number) if spec.track_number else None}
+    return {key: value for key, value in fields.items() if value}
+
+
+def _picture(art: bytes) -> Picture:
+    picture = Picture()
+    picture.data = art
+    picture.type = 3
+    picture.mime = "image/png"
+    picture.desc = "Cover"
+    return picture
+
+
+def _write_flac(path: Path, spec: TrackSpec, art: bytes, seconds: float):
+    samples = int(seconds * 44100)
+    info = struct.pack(">HH", 4096, 4096) + (0).to_bytes(3, "big") * 2  # Block sizes, unknown frame sizes
+    info += ((44100 << 44) | (1 << 41) | (15 << 36) | samples).to_bytes(8, "big")  # 44.1 kHz, stereo, 16 bit
+    info += b"\x00" * 16  # MD5 of the (absent) audio
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + b"\x80" + len(info).to_bytes(3, "big") + info)  # Last block: STREAMINFO
+
+    audio = FLAC(path)
+    audio.update(_vorbis_fields(spec))
+    if art:
+        audio.add_picture(_picture(art))
+    audio.save()
+
+
+def _write_ogg(path: Path, spec: TrackSpec, art: bytes, seconds: float):
+    ident = b"\x01vorbis" + struct.pack("<IBIiiiBB", 0, 2, 44100, 0, 128000, 0, 0xB8, 1)
+    comment = b"\x03vorbis" + VCommentDict().write()
+    setup = b"\x05vorbis" + b"\x00" * 8
+
+    pages = []
+    for sequence, packets in enumerate(([ident], [comment, setup], [b"\x00" * 32])):
+        page = OggPage()
+        page.serial = 1
+        page.sequence = sequence
+        page.packets = packets
+        pages.append(page)
+    pages[0].first = True
+    pages[-1].last = True
+    pages[-1].position = int(seconds * 44100)
+    with open(path, "wb") as f:
+        f.write(b"".join(page.write() for page in pages))
+
+    audio = OggVorbis(path)
+    audio.update(_vorbis_fields(spec))
+    if art:
+        audio["METADATA_BLOCK_PICTURE"] = base64.b64encode(_picture(art).write()).decode("ascii")
+    audio.save()
+
+
+def _atom(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data) + 8) + kind + data
+
+
+def _write_m4a(path: Path, spec: TrackSpec, art: bytes, seconds: float):
+    ftyp = _atom(b"ftyp", b"M4A " + struct.pack(">I", 0) + b"M4A mp42isom")
+    mvhd = _atom(b"mvhd", struct.pack(">BxxxIIII", 0, 0, 0, 1000, int(seconds * 1000)) + b"\x00" * 80)
+    mdhd = _atom(b"mdhd", struct.pack(">BxxxIIIIHH", 0, 0, 0, 44100, int(seconds * 44100), 0x55C4, 0))
+    hdlr = _atom(b"hdlr", struct.pack(">BxxxI", 0, 0) + b"soun" + b"\x00" * 12 + b"SoundHandler\x00")
+    moov = _atom(b"moov", mvhd + _atom(b"trak", _atom(b"mdia", mdhd + hdlr)))
+    with open(path, "wb") as f:
+        f.write(ftyp + moov + _atom(b"mdat", b"\x00" * 64))
+
+    audio = MP4(path)
+    for key, value in (("\xa9nam", spec.title), ("\xa9ART", spec.artist), ("\xa9alb", spec.album),
+                       ("aART", spec.album_artist), ("\xa9day", spec.date), ("\xa9gen", spec.genre),
+                       ("\xa9cmt", spec.spotify_url)):
+        if value:
+            audio[key] = [value]
+    if spec.track_number:
+        audio["trkn"] = [(spec.track_number, spec.total_tracks or 0)]
+    if art:
+        audio["covr"] = [MP4Cover(art, MP4Cover.FORMAT_PNG)]
+    audio.save()
+
+
+WRITERS = {"mp3": _write_mp3, "flac": _write_flac, "ogg": _write_ogg, "m4a": _write_m4a}
+
+
+def write_file(path: Path, spec: TrackSpec, art: bytes = None, seconds: float = 1.0):
+    """
+    Write a valid, tagged audio file. The format is taken from the extension of path
+    """
+    WRITERS[path.suffix.lower().lstrip(".")](path, spec, art, seconds)
+
+
+def _name(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_library(root: Path, size: int, formats: dict = None, album_size: int = 10, untagged: float = 0.1,
+                     spotify_urls: float = 0.2, art_size: int = 64, seed: int = 0) -> list[Path]:
+    """
+    Generate a synthetic library laid out like a download folder, one directory per album
+    :param root: Directory to write to
+    :param size: Number of files
+    :param formats: Mapping of extension to share of files, DEFAULT_FORMATS if None
+    :param album_size: Tracks per album
+    :param untagged: Share of files without any tags, which need fingerprinting
+    :param spotify_urls: Share of tagged files carrying a Spotify URL comment
+    :param art_size: Width and height of the embedded cover art, 0 for none
+    :param seed: Seed for names and tags
+    :return: Paths of the generated files
+    """
+    rng = random.Random(seed)
+    formats = formats or DEFAULT_FORMATS
+    extensions, weights = zip(*formats.items())
+    paths = []
+
+    album_count = (size + album_size - 1) // album_size
+    for album_index in range(album_count):
+        artist = f"{_name(rng, 2)} {album_index}"
+        album = _name(rng, rng.randint(1, 3))
+        year = str(rng.randint(1965, 2024))
+        genre = rng.choice(GENRES)
+        art = make_png(art_size, art_size, rng) if art_size else None
+        extension = rng.choices(extensions, weights)[0]  # Albums usually come in one format
+        album_dir = root / f"{artist} - {album}"
+        album_dir.mkdir(parents=True, exist_ok=True)
+
+        tracks = min(album_size, size - len(paths))
+        for number in range(1, tracks + 1):
+            title = _name(rng, rng.randint(1, 4))
+            path = album_dir / f"{number:02d} {title}.{extension}"
+            if rng.random() < untagged:
+                spec = TrackSpec()
+            else:
+                url = None
+                if rng.random() < spotify_urls:
+                    url = f"https://open.spotify.com/track/{rng.randbytes(11).hex()}"
+                spec = TrackSpec(title=title, artist=artist, album=album, album_artist=artist, date=year,
+                                 track_number=number, total_tracks=tracks, genre=genre, spotify_url=url)
+            write_file(path, spec, art)
+            paths.append(path)
+    return paths
+
+
+def parse_formats(values: list[str]) -> dict:
+    """
+    Parse ["mp3=0.5", "flac=0.5"] into {"mp3": 0.5, "flac": 0.5}
+    """
+    formats = {}
+    for value in values:
+        extension, _, weight = value.partition("=")
+        if extension not in WRITERS:
+            raise ValueError(f"Unsupported format {extension}, choose from {', '.join(WRITERS)}")
+        formats[extension] = float(weight or 1)
+    return formats
+
+
+def main():
+    arg_parser = ArgumentParser(description="Generate a synthetic music library")
+    arg_parser.add_argument("out", type=Path, help="Directory to write the library to")
+    arg_parser.add_argument("-n", "--size", type=int, default=1000, help="Number of files")
+    arg_parser.add_argument("--formats", nargs="+", default=[f"{k}={v}" for k, v in DEFAULT_FORMATS.items()],
+                            metavar="EXT=SHARE", help="Format mix")
+    arg_parser.add_argument("--album-size", type=int, default=10)
+    arg_parser.add_argument("--untagged", type=float, default=0.1, help="Share of files without tags")
+    arg_parser.add_argument("--spotify-urls", type=float, default=0.2, help="Share of files with a Spotify URL")
+    arg_parser.add_argument("--art-size", type=int, default=64, help="Cover art width/height in pixels, 0 for none")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    paths = generate_library(args.out, args.size, parse_formats(args.formats), args.album_size, args.untagged,
+                             args.spotify_urls, args.art_size, args.seed)
+    total = sum(os.path.getsize(p) for p in paths)
+    print(f"Generated {len(paths)} files ({total / 1024 / 1024:.1f} MiB) in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Stand-ins for SpotifySearcher and fingerprinter plugins with simulated latency, so benchmarks measure MPORG itself
+"""
+import hashlib
+import random
+import threading
+import time
+
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.types import Track
+
+
+def _track_id(*parts) -> str:
+    return hashlib.md5("-".join(str(p) for p in parts).encode()).hexdigest()[:22]
+
+
+class StubSearcher:
+    """
+    Resolves every tagged file to a Track built from its own tags, after sleeping for latency seconds
+    """
+    def __init__(self, latency: float = 0, miss_rate: float = 0, seed: int = 0):
+        self.latency = latency
+        self.miss_rate = miss_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def search(self, name: str = None, artist: str = None, spot_id: str = None) -> Track | None:
+        with self._lock:
+            self.calls += 1
+            miss = self.random.random() < self.miss_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if miss:
+            return None
+
+        if spot_id:
+            name, artist = f"Track {spot_id[:6]}", f"Artist {spot_id[6:10]}"
+        artist = artist[0] if isinstance(artist, list) else artist
+        track_id = spot_id or _track_id(name, artist)
+        return Track(
+            track_name=name,
+            track_number=int(track_id, 16) % 12 + 1 if not spot_id else 1,
+            track_year="2020",
+            track_disk=1,
+            track_artists=(artist,),
+            track_bpm="120",
+            track_key="C",
+            album_name=f"{artist} Album",
+            album_year="2020",
+            album_size=12,
+            album_artists=(artist,),
+            album_genres="Rock",
+            track_url=f"https://open.spotify.com/track/{track_id}",
+            track_id=track_id,
+        )
+
+
+class StubFingerprinter(Fingerprinter):
+    """
+    Identifies every file as a Track derived from its path, after sleeping for latency seconds
+    """
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    def fingerprint(self, path_to_fingerprint) -> FingerprintResult:
+        if self.latency:
+            time.sleep(self.latency)
+        track_id = _track_id(path_to_fingerprint)
+        return FingerprintResult(code=0, type="track", results=Track(
+            track_name=f"Fingerprinted {track_id[:8]}",
+            track_year="2019",
+            track_artists=(f"Artist {track_id[8:12]}",),
+            album_artists=(f"Artist {track_id[8:12]}",),
+            album_name=f"Album {track_id[12:16]}",
+            album_genres="Electronic",
+            track_id=track_id,
+        ))
@@ -0,0 +1,159 @@
+"""
+End-to-end throughput benchmark for MPORG.organize.
+
+A synthetic library (see benchmarks/library.py) is organized with stub searchers and fingerprinters for every
+combination of library size and thread count. Each run happens in a fresh process so peak RSS is per run.
+
+Usage:
+    python -m benchmarks.throughput --sizes 200 1000 --threads 1 4 16 --latency 0.02 --json results.json
+    python -m benchmarks.throughput --compare results.json  # Compare against an earlier run
+"""
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks.library import DEFAULT_FORMATS, generate_library, parse_formats
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KiB elsewhere
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def run_once(library: Path, threads: int, latency: float, fingerprint_latency: float) -> dict:
+    """
+    Organize library once and measure it. Meant to run in its own process.
+    """
+    os.environ["TQDM_DISABLE"] = "1"
+    logging.basicConfig(level=logging.CRITICAL)
+    if not hasattr(logging, "TOP"):
+        from mporg.logging_utils.logging_setup import add_logging_level
+        add_logging_level("TOP", logging.CRITICAL - 1)
+
+    from benchmarks.stubs import StubSearcher, StubFingerprinter
+    from mporg.organizer import MPORG
+
+    store = Path(tempfile.mkdtemp(prefix="mporg-bench-store-"))
+    try:
+        org = MPORG(store, library, StubSearcher(latency), [StubFingerprinter(fingerprint_latency)], [], False,
+                    workers=threads)
+        durations = []
+        failures = []
+        process_file = org.process_file
+
+        def timed(args):
+            start = time.perf_counter()
+            try:
+                result = process_file(args)
+                if result:
+                    failures.append(result)
+                return result
+            finally:
+                durations.append(time.perf_counter() - start)
+
+        org.process_file = timed
+        start = time.perf_counter()
+        org.organize()
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+
+    return {
+        "files": len(durations),
+        "failed": len(failures),
+        "threads": threads,
+        "seconds": wall,
+        "files_per_sec": len(durations) / wall if wall else 0.0,
+        "p50_ms": _percentile(durations, 50) * 1000,
+        "p99_ms": _percentile(durations, 99) * 1000,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_benchmarks(sizes: list[int], threads: list[int], formats: dict, latency: float, fingerprint_latency: float,
+                   repeat: int = 1, library_dir: Path = None) -> list[dict]:
+    results = []
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="mporg-bench-") as tmp:
+        for size in sizes:
+            library = (library_dir or Path(tmp)) / f"library_{size}"
+            if not library.exists():
+                generate_library(library, size, formats)
+            for thread_count in threads:
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(run_once, library, thread_count, latency,
+                                                 fingerprint_latency).result()
+                    result["size"] = size
+                    results.append(result)
+                    print(format_result(result), flush=True)
+    return results
+
+
+def format_result(result: dict, baseline: dict = None) -> str:
+    rss = f"{result['peak_rss_mb']:.0f} MiB" if result.get("peak_rss_mb") is not None else "n/a"
+    line = (f"size={result['size']:>6} threads={result['threads']:>3} "
+            f"{result['files_per_sec']:>8.1f} files/s  p50={result['p50_ms']:>7.1f} ms  "
+            f"p99={result['p99_ms']:>7.1f} ms  peak RSS={rss}  failed={result.get('failed', 0)}")
+    if baseline:
+        change = (result["files_per_sec"] / baseline["files_per_sec"] - 1) * 100
+        line += f"  ({change:+.1f}% files/s vs baseline)"
+    return line
+
+
+def compare(results: list[dict], baseline_results: list[dict]):
+    baseline = {(r["size"], r["threads"]): r for r in baseline_results}
+    print("\nComparison with baseline:")
+    for result in results:
+        print(format_result(result, baseline.get((result["size"], result["threads"]))))
+
+
+def main():
+    arg_parser = ArgumentParser(description="Measure MPORG.organize throughput on synthetic libraries")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000], help="Library sizes")
+    arg_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16], help="Worker thread counts")
+    arg_parser.add_argument("--formats", nargs="+", default=[f"{k}={v}" for k, v in DEFAULT_FORMATS.items()],
+                            metavar="EXT=SHARE", help="Format mix of the library")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Simulated Spotify latency in seconds")
+    arg_parser.add_argument("--fingerprint-latency", type=float, default=0.0,
+                            help="Simulated fingerprinter latency in seconds")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="Runs per configuration")
+    arg_parser.add_argument("--library-dir", type=Path, help="Keep and reuse generated libraries here")
+    arg_parser.add_argument("--json", type=Path, help="Write results to this file")
+    arg_parser.add_argument("--compare", type=Path, help="Results file of an earlier run to compare against")
+    args = arg_parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.threads, parse_formats(args.formats), args.latency,
+                             args.fingerprint_latency, args.repeat, args.library_dir)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,3 +3,6 @@ VERSION = "0.2a3"
 
 CONFIG_DIR = Path.home() / ".MP3ORG"
 LOG_DIR = CONFIG_DIR / "Logs"
+
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_AUTH_URL = "https://accounts.spotify.com/api/token"
@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+
+from mporg import CONFIG_DIR
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+DIGEST_DIR = CONFIG_DIR / "audiodigests"
+DIGEST_PREFIX = "blake2b:"  # Marks content keys, fingerprint results cached by older versions are keyed by path
+SAMPLE_SIZE = 64 * 1024  # Bytes hashed at each sampled offset
+SAMPLE_COUNT = 8  # Offsets sampled, spread evenly from the start to the end of the audio data
+TAGS_EXCLUDED = (".mp3", ".flac")  # File types whose tags audio_region leaves out, so tagging keeps their digest
+
+ID3V1_SIZE = 128
+APE_FOOTER_SIZE = 32
+
+
+def _id3v2_size(header: bytes) -> int:
+    """
+    Size of an ID3v2 tag including its header and footer, or 0 if header does not start one
+    """
+    if len(header) < 10 or header[:3] != b"ID3" or any(b & 0x80 for b in header[6:10]):
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]  # Synchsafe integer
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def audio_region(path: Path) -> tuple[int, int]:
+    """
+    Find the audio data in a file by skipping the tags MPORG and other taggers rewrite:
+    leading ID3v2 tags, FLAC metadata blocks, and trailing APEv2 and ID3v1 tags.
+    Other containers (MP4, Ogg) keep their tags inside and are hashed whole.
+    :param Path path: Audio file
+    :return: (start, end) byte offsets of the audio data
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        start = 0
+
+        while True:  # Files may carry several ID3v2 tags, one after another
+            f.seek(start)
+            size = _id3v2_size(f.read(10))
+            if not size:
+                break
+            start += size
+
+        f.seek(start)
+        if f.read(4) == b"fLaC":
+            start += 4
+            last = False
+            while not last and start < end:
+                f.seek(start)
+                block = f.read(4)
+                if len(block) < 4:
+                    break
+                last = bool(block[0] & 0x80)
+                start += 4 + int.from_bytes(block[1:4], "big")
+
+        if end - start >= ID3V1_SIZE:
+            f.seek(end - ID3V1_SIZE)
+            if f.read(3) == b"TAG":
+                end -= ID3V1_SIZE
+
+        if end - start >= APE_FOOTER_SIZE:
+            f.seek(end - APE_FOOTER_SIZE)
+            footer = f.read(APE_FOOTER_SIZE)
+            if footer[:8] == b"APETAGEX":
+                size, _, flags = struct.unpack("<III", footer[12:24])
+                size += APE_FOOTER_SIZE if flags & 0x80000000 else 0  # Size excludes the optional header
+                if size <= end - start:
+                    end -= size
+
+    return start, max(start, end)
+
+
+def audio_digest(path: Path) -> str:
+    """
+    Hash the audio data of a file, so the same recording has the same digest wherever it is and however it is tagged.
+    Only the length of the audio data and SAMPLE_COUNT chunks of SAMPLE_SIZE bytes at fixed offsets are hashed, at
+    most 512 KiB however large the file. Encoded audio differs throughout, so different recordings or encodings of
+    the same length still differ in the samples.
+    :param Path path: Audio file
+    :return: Digest, prefixed with DIGEST_PREFIX
+    """
+    start, end = audio_region(path)
+    length = end - start
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(struct.pack("<Q", length))
+    if length <= SAMPLE_SIZE * SAMPLE_COUNT:
+        offsets = [start]
+        size = length
+    else:
+        offsets = [start + (length - SAMPLE_SIZE) * i // (SAMPLE_COUNT - 1) for i in range(SAMPLE_COUNT)]
+        size = SAMPLE_SIZE
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(size))
+    return DIGEST_PREFIX + digest.hexdigest()
+
+
+class DigestIndex:
+    """
+    Remembers the digest of each file by path, size and modification time, so unchanged files are not hashed again
+    """
+    def __init__(self, cache=None):
+        if cache is None:
+            import diskcache
+            from mporg.cache import TieredCache
+            cache = TieredCache(diskcache.Cache(directory=str(DIGEST_DIR)))
+        self.cache = cache
+        self.hashed = 0
+
+    def digest(self, path: Path) -> str:
+        """
+        :param Path path: Audio file
+        :return: Digest of its audio data
+        :raises OSError: The file cannot be read
+        """
+        path = Path(path).absolute()
+        stat = path.stat()
+        key = str(path)
+        entry = self.cache.get(key)
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+
+        digest = audio_digest(path)
+        self.hashed += 1
+        self.cache.set(key, (stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def cached(self, path: Path) -> str | None:
+        """
+        :param Path path: Audio file
+        :return: Digest of its audio data if it was hashed since it last changed, else None. The file is not read
+        """
+        path = Path(path).absolute()
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        entry = self.cache.get(str(path))
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def digest_index() -> DigestIndex:
+    """
+    The DigestIndex shared by all fingerprinters, so a file is hashed at most once per run
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DigestIndex()
+        return _index
+
+
+def content_key(path: Path) -> str:
+    """
+    Cache key for a fingerprint result, the digest of the file's audio data
+    :param Path path: Audio file
+    :return: Digest, or the path if the file cannot be read
+    """
+    try:
+        return digest_index().digest(path)
+    except OSError as e:
+        logging.debug(f"Cannot hash {path}, keying its fingerprint by path: {e}")
+        return str(path)
@@ -1,18 +1,49 @@
+import atexit
 import logging
+import multiprocessing
+import os
+import threading
 from abc import abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from pathlib import Path
 
+from mporg.audio_digest import content_key
 from mporg.types import Track
 
 logging.getLogger("__main." + __name__)
 logging.propagate = True
 
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
 
 class Fingerprinter:
     """
     Abstract class for fingerprinting audio files
     """
+    offline = False  # When True, only answer from cached results and never make requests
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def cached_result(self, path_to_fingerprint: Path) -> tuple[str, "FingerprintResult | None"]:
+        """
+        Look up a file's result in self.cache by the digest of its audio, so moved, renamed or copied files
+        reuse it. Results cached by path by older versions are moved to the digest.
+        :param Path path_to_fingerprint: Audio file
+        :return: (cache key to store a new result under, cached result or None)
+        """
+        cache_key = content_key(path_to_fingerprint)
+        result = self.cache.get(cache_key)
+        if result is None and cache_key != str(path_to_fingerprint):
+            result = self.cache.get(str(path_to_fingerprint))
+            if result is not None:
+                self.cache.set(cache_key, result)
+                self.cache.delete(str(path_to_fingerprint))
+        return cache_key, result
 
     @abstractmethod
     def fingerprint(self, path_to_fingerprint: Path) -> "FingerprintResult":
@@ -24,3 +55,46 @@ class FingerprintResult:
     code: int = None # 0 - success
     type: str = None # "track" - information on the track, "spotify" - spotify id, "fail" - failed to fingerprint
     results: Track | dict = None # Track object or dict with spotify id
+
+
+def cpu_pool() -> ProcessPoolExecutor | None:
+    """
+    Process pool shared by fingerprinters for CPU heavy work such as decoding audio, sized to the cores so it scales
+    independently of the organizer threads waiting on the network. Workers are started by a fork server (or spawned
+    where there is none) rather than forked, as forking a process with running threads can copy their held locks
+    :return: ProcessPoolExecutor, or None if processes cannot be started here
+    """
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            try:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _cpu_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                mp_context=multiprocessing.get_context(method))
+            except (OSError, NotImplementedError) as e:
+                logging.warning(f"Cannot start a process pool, fingerprints are computed in the organizer threads: {e}")
+                _cpu_pool = False
+            else:
+                atexit.register(_cpu_pool.shutdown, cancel_futures=True)
+        return _cpu_pool or None
+
+
+def run_cpu_bound(func, *args):
+    """
+    Run func(*args) in the shared process pool and wait for the result, or in this thread if there is no pool.
+    func and its arguments must be picklable, a module level function
+    :return: func's result
+    :raises: Whatever func raises
+    """
+    pool = cpu_pool()
+    if pool is not None:
+        try:
+            future = pool.submit(func, *args)
+        except (OSError, RuntimeError) as e:  # Workers cannot be started, or the pool was shut down at exit
+            logging.debug(f"Cannot use the fingerprint process pool, computing in this thread: {e}")
+        else:
+            try:
+                return future.result()
+            except BrokenProcessPool as e:
+                logging.warning(f"Fingerprint process pool broke, computing in this thread: {e}")
+    return func(*args)
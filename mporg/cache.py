@@ -0,0 +1,364 @@
+import atexit
+import gzip
+import json
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import diskcache
+
+from mporg import CONFIG_DIR, VERSION
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MiB
+
+MISSING = object()  # Sentinel for "not cached", as None is a valid cached value
+
+# Disk caches shared between runs, by the name used on the command line
+CACHE_DIRS = {
+    "spotify": CONFIG_DIR / "spotifycache",
+    "acrcloud": CONFIG_DIR / "audiocache_A",
+    "musicbrainz": CONFIG_DIR / "audiocache_M",
+    "mbrecordings": CONFIG_DIR / "mbrecordings",
+    "lyrics": CONFIG_DIR / "lyricscache",
+}
+STATS_PATH = CONFIG_DIR / "cache_stats.json"
+EXPORT_FORMAT = "mporg-cache"
+EXPORT_VERSION = 1
+
+_stats_file_lock = threading.Lock()
+
+
+def _pickle(value) -> bytes | None:
+    try:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+
+class LRUCache:
+    """
+    Thread safe in-memory LRU cache bounded by both entry count and approximate size in bytes.
+    Values are kept pickled, like in the disk tier, so every get returns a copy that callers may modify without
+    changing the cached value or the results of other threads
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._data = OrderedDict()  # key -> (pickled value, size, expire_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            data, size, expire_at = entry
+            if expire_at is not None and expire_at <= time.time():
+                del self._data[key]
+                self.current_bytes -= size
+                return default
+            self._data.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, expire: float = None, size: int = None):
+        """
+        Store a value, evicting the least recently used entries until both limits are respected
+        :param key: Cache key
+        :param value: Value to store
+        :param expire: Seconds until the entry expires, None to never expire
+        :param size: Size in bytes to account for, the pickled size if not given
+        :return: None
+        """
+        data = _pickle(value)
+        if size is None:
+            size = len(data) if data is not None else 0
+        if data is None or size > self.max_bytes or self.max_entries <= 0:
+            self.discard(key)  # Too large or not picklable, but never keep a stale copy around
+            return
+        expire_at = time.time() + expire if expire is not None else None
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._data[key] = (data, size, expire_at)
+            self.current_bytes += size
+
+            while len(self._data) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def discard(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    Disk cache (diskcache.Cache) fronted by an in-process LRU tier.
+    Reads are served from memory when possible, writes go through to the disk tier.
+    If a name is given, hit and miss counts are added to the persistent statistics at exit.
+    """
+    def __init__(self, disk, memory: LRUCache = None, name: str = None):
+        self.disk = disk
+        self.memory = memory if memory is not None else LRUCache()
+        self.name = name
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if name:
+            atexit.register(self.persist_stats)
+
+    def _count(self, attr: str):
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count("memory_hits")
+            return value
+
+        value, expire_at = self.disk.get(key, default=MISSING, expire_time=True)
+        if value is MISSING:
+            self._count("misses")
+            return default
+
+        self._count("disk_hits")
+        expire = expire_at - time.time() if expire_at is not None else None
+        self.memory.set(key, value, expire=expire)
+        return value
+
+    def set(self, key, value, expire: float = None, **kwargs):
+        self.disk.set(key, value, expire=expire, **kwargs)
+        self.memory.set(key, value, expire=expire)
+        return True
+
+    def delete(self, key):
+        self.memory.discard(key)
+        return self.disk.delete(key)
+
+    def expire(self, *args, **kwargs):
+        """Remove expired items from the disk tier"""
+        return self.disk.expire(*args, **kwargs)
+
+    def clear(self):
+        self.memory.clear()
+        return self.disk.clear()
+
+    def close(self):
+        self.disk.close()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else None,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.current_bytes,
+            }
+
+    def persist_stats(self):
+        """
+        Add this instance's hit and miss counts to the persistent statistics file, then reset them
+        :return: None
+        """
+        with self._stats_lock:
+            counts = {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses}
+            self.memory_hits = self.disk_hits = self.misses = 0
+        if not self.name or not any(counts.values()):
+            return
+        record_stats(self.name, counts)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.memory.discard(key)
+        del self.disk[key]
+
+    def __len__(self):
+        return len(self.disk)
+
+
+def open_cache(name: str):
+    """
+    Open one of the shared disk caches by name
+    :param str name: Key of CACHE_DIRS
+    :return: diskcache.Cache
+    """
+    return diskcache.Cache(directory=str(CACHE_DIRS[name]))
+
+
+def load_stats() -> dict:
+    try:
+        with open(STATS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_stats(name: str, counts: dict):
+    """
+    Accumulate hit/miss counts for a cache into the persistent statistics file
+    :param str name: Cache name
+    :param dict counts: Counts to add
+    :return: None
+    """
+    with _stats_file_lock:
+        stats = load_stats()
+        entry = stats.setdefault(name, {})
+        for key, value in counts.items():
+            entry[key] = entry.get(key, 0) + value
+        try:
+            with open(STATS_PATH, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not save cache statistics: {e}")
+
+
+def cache_stats(names: list[str] = None) -> dict:
+    """
+    Report size and hit statistics for the shared disk caches
+    :param names: Names of caches to report, all if None
+    :return: Dict of cache name to statistics
+    """
+    persisted = load_stats()
+    report = {}
+    for name in names or CACHE_DIRS:
+        if not CACHE_DIRS[name].exists():
+            continue
+        with open_cache(name) as cache:
+            counts = persisted.get(name, {})
+            lookups = sum(counts.get(k, 0) for k in ("memory_hits", "disk_hits", "misses"))
+            hits = counts.get("memory_hits", 0) + counts.get("disk_hits", 0)
+            report[name] = {
+                "entries": len(cache),
+                "bytes": cache.volume(),
+                **counts,
+                "hit_rate": hits / lookups if lookups else None,
+            }
+    return report
+
+
+def export_caches(destination: Path, names: list[str] = None) -> dict:
+    """
+    Dump the shared disk caches into a single gzip compressed file
+    :param Path destination: File to write
+    :param names: Names of caches to export, all if None
+    :return: Dict of cache name to number of exported entries
+    """
+    exported = {}
+    with gzip.open(destination, "wb") as f:
+        pickle.dump({"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "mporg": VERSION, "created": time.time()}, f)
+        for name in names or CACHE_DIRS:
+            if not CACHE_DIRS[name].exists():
+                logging.info(f"Cache {name} does not exist, skipping")
+                continue
+            count = 0
+            with open_cache(name) as cache:
+                for key in cache.iterkeys():
+                    value, expire_time = cache.get(key, default=MISSING, expire_time=True)
+                    if value is MISSING:  # Expired or removed while iterating
+                        continue
+                    pickle.dump((name, key, value, expire_time), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    count += 1
+            exported[name] = count
+            logging.info(f"Exported {count} entries from {name}")
+        pickle.dump(None, f)  # End marker
+    return exported
+
+
+def import_caches(source: Path, overwrite: bool = False) -> dict:
+    """
+    Merge a file written by export_caches into the shared disk caches.
+    Only import files from trusted sources, as entries are unpickled.
+    :param Path source: File to read
+    :param bool overwrite: Replace entries that already exist locally
+    :return: Dict of cache name to number of imported entries
+    :raises ValueError: The file is not a cache export
+    """
+    imported = {}
+    caches = {}
+    now = time.time()
+    try:
+        with gzip.open(source, "rb") as f:
+            header = pickle.load(f)
+            if not isinstance(header, dict) or header.get("format") != EXPORT_FORMAT:
+                raise ValueError(f"{source} is not an MPORG cache export")
+            if header.get("version", 0) > EXPORT_VERSION:
+                raise ValueError(f"{source} was written by a newer version of MPORG ({header.get('mporg')})")
+
+            while (record := pickle.load(f)) is not None:
+                name, key, value, expire_time = record
+                if name not in CACHE_DIRS:
+                    logging.warning(f"Unknown cache {name} in export, skipping entry")
+                    continue
+                if expire_time is not None and expire_time <= now:
+                    continue
+                if name not in caches:
+                    caches[name] = open_cache(name)
+                    imported[name] = 0
+                cache = caches[name]
+                if not overwrite and key in cache:
+                    continue
+                cache.set(key, value, expire=expire_time - now if expire_time is not None else None)
+                imported[name] += 1
+    finally:
+        for cache in caches.values():
+            cache.close()
+    return imported
+
+
+def warm_spotify(searcher, spotify_ids, workers: int = 4) -> int:
+    """
+    Pre-warm the Spotify cache by looking up track IDs
+    :param searcher: SpotifySearcher to use
+    :param spotify_ids: Iterable of Spotify track IDs
+    :param int workers: Number of concurrent lookups
+    :return int: Number of IDs that resolved
+    """
+    def lookup(spot_id):
+        try:
+            return searcher.search(spot_id=spot_id) is not None
+        except Exception as e:
+            logging.warning(f"Could not warm {spot_id}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(lookup, dict.fromkeys(spotify_ids)))
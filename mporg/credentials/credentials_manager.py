@@ -40,6 +40,14 @@ class CredentialManager:
 
         return credentials
 
+    def get_saved_credentials(self):
+        """
+        Get credentials as saved on disk, without verifying them or asking the user.
+        Used when running offline.
+        :return: dict of provider name to credentials, empty if none are saved
+        """
+        return {provider.PNAME: provider._load_from_file() for provider in self.credential_providers}
+
 
 if __name__ == "__main__":
     manager = CredentialManager()
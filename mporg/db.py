@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Database:
+    """
+    SQLite database opened by several threads, each with its own connection
+    """
+    def __init__(self, path: Path, schema: str, wal: bool = True, timeout: float = 60):
+        """
+        :param Path path: Database file, created if missing
+        :param str schema: Statements creating the tables if they do not exist
+        :param bool wal: Use write-ahead logging. Needs all processes on one host or a filesystem with shared memory
+                         support, turn it off for databases on network filesystems
+        :param float timeout: Seconds to wait for another connection's write lock
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = self._connection()
+        if wal:
+            db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(schema)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run the enclosed statements in one write transaction, taking the write lock up front so concurrent
+        read-modify-write transactions cannot interleave
+        """
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def close(self):
+        """
+        Close the calling thread's connection
+        """
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
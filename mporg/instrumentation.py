@@ -0,0 +1,309 @@
+import json
+import logging
+import threading
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+from mporg import VERSION
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+# Upper bounds in seconds, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TRACE_FLUSH_EVENTS = 10000
+
+
+class Tracer:
+    """
+    Records spans as Chrome trace events (chrome://tracing, https://ui.perfetto.dev).
+    Does nothing until started, so spans can stay in hot paths. Events are streamed to the file in batches.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._events = []
+        self._written = 0
+        self._threads = {}
+        self._origin = 0
+        self.path = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def start(self, path: Path):
+        """
+        Start recording to path
+        :param Path path: Trace file to write
+        """
+        with self._lock:
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.write("[\n")
+            self._events = []
+            self._written = 0
+            self._threads = {}
+            self._origin = time.perf_counter_ns()
+            self.path = path
+
+    def stop(self):
+        """
+        Write the remaining events and close the trace file
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            pid = os.getpid()
+            for tid, name in self._threads.items():
+                self._events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+            self._flush()
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+        logging.info(f"Trace written to {self.path}")
+
+    def _flush(self):
+        if not self._events:
+            return
+        if self._written:
+            self._file.write(",\n")
+        self._file.write(",\n".join(json.dumps(event, default=str) for event in self._events))
+        self._written += len(self._events)
+        self._events = []
+
+    def add_complete(self, name: str, category: str, start: int, end: int, args: dict = None):
+        """
+        Record a finished span
+        :param name: Span name
+        :param category: Trace category, such as stage, http or lock
+        :param start: Start time from time.perf_counter_ns
+        :param end: End time from time.perf_counter_ns
+        :param args: Extra values shown with the span
+        """
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": (start - self._origin) / 1000, "dur": (end - start) / 1000}
+        if args:
+            event["args"] = args
+        with self._lock:
+            if self._file is None:
+                return
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+            if len(self._events) >= TRACE_FLUSH_EVENTS:
+                self._flush()
+
+    def span(self, name: str, category: str, **args):
+        """
+        Context manager recording the enclosed block. It yields the args dict, so values known only at the end
+        (like a status code) can still be added.
+        """
+        if self._file is None:
+            return nullcontext(args)
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name: str, category: str, args: dict):
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            self.add_complete(name, category, start, time.perf_counter_ns(), args)
+
+
+tracer = Tracer()
+
+
+class Histogram:
+    """
+    Fixed bucket latency histogram. Not thread safe on its own, RunStats guards it.
+    """
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate a percentile by interpolating within the bucket it falls in
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> dict:
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class RunStats:
+    """
+    Collects per-stage timings and per-file outcomes of an organize run
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.in_flight = {}
+        self.waiting = {}
+        self.outcomes = {}
+        self.failures = {}
+        self.discovered = 0
+        self.skipped = 0
+        self.bytes_copied = 0
+        self.lock_waits = Histogram()
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = datetime.now()
+
+    def finish(self):
+        self.finished = datetime.now()
+
+    @contextmanager
+    def stage(self, name: str, category: str = "stage"):
+        """
+        Time the enclosed block as one execution of a stage, and trace it if tracing is on
+        :param str name: Stage name
+        :param str category: Trace category of the span
+        """
+        with self._lock:
+            self.in_flight[name] = self.in_flight.get(name, 0) + 1
+        start = time.perf_counter()
+        try:
+            with tracer.span(name, category):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.in_flight[name] -= 1
+                self.stages.setdefault(name, Histogram()).observe(elapsed)
+
+    @property
+    def failed(self) -> int:
+        return sum(self.failures.values())
+
+    @property
+    def queued(self) -> int:
+        """
+        Files submitted for processing that no worker has picked up yet
+        """
+        return self.discovered - self.skipped - sum(self.outcomes.values()) - self.in_flight.get("file", 0)
+
+    def count_waiting(self, name: str, delta: int = 1):
+        """
+        Adjust the depth of queue name
+        """
+        with self._lock:
+            self.waiting[name] = self.waiting.get(name, 0) + delta
+
+    def count_discovered(self, skipped: bool = False):
+        with self._lock:
+            self.discovered += 1
+            if skipped:
+                self.skipped += 1
+
+    def count_bytes_copied(self, size: int):
+        with self._lock:
+            self.bytes_copied += size
+
+    def record_lock_wait(self, seconds: float):
+        with self._lock:
+            self.lock_waits.observe(seconds)
+
+    def file_started(self):
+        with self._lock:
+            self.in_flight["file"] = self.in_flight.get("file", 0) + 1
+
+    def record_file(self, tag_source: str | None, error: bool = False, seconds: float = None):
+        """
+        Record the outcome of a processed file
+        :param tag_source: Name of the TagType used, None if it was never determined
+        :param error: The file failed to process
+        :param seconds: Time spent on the file, recorded as the "file" stage
+        """
+        tag_source = tag_source or "UNKNOWN"
+        with self._lock:
+            if error:
+                self.failures[tag_source] = self.failures.get(tag_source, 0) + 1
+            self.outcomes[tag_source] = self.outcomes.get(tag_source, 0) + 1
+            if self.in_flight.get("file"):
+                self.in_flight["file"] -= 1
+            if seconds is not None:
+                self.stages.setdefault("file", Histogram()).observe(seconds)
+
+    def summary(self, **extra) -> dict:
+        """
+        Build a JSON serializable summary of the run
+        :param extra: Additional sections to include, such as searcher statistics
+        :return: dict
+        """
+        finished = self.finished or datetime.now()
+        wall = (finished - self.started).total_seconds() if self.started else 0.0
+        with self._lock:
+            processed = sum(self.outcomes.values())
+            summary = {
+                "mporg": VERSION,
+                "started": self.started.isoformat() if self.started else None,
+                "finished": finished.isoformat(),
+                "wall_seconds": round(wall, 3),
+                "files": {
+                    "discovered": self.discovered,
+                    "skipped": self.skipped,
+                    "processed": processed,
+                    "failed": self.failed,
+                    "by_tag_source": dict(self.outcomes),
+                    "failed_by_tag_source": dict(self.failures),
+                },
+                "files_per_second": round(processed / wall, 3) if wall else None,
+                "bytes_copied": self.bytes_copied,
+                "in_flight": dict(self.in_flight),
+                "queues": {"files": self.queued, **self.waiting},
+                "lock_wait": self.lock_waits.to_dict(),
+                "stages": {name: histogram.to_dict() for name, histogram in self.stages.items()},
+            }
+        summary.update(extra)
+        return summary
+
+    def write(self, path: Path, **extra):
+        """
+        Write the summary as JSON
+        :param Path path: File to write
+        :param extra: Additional sections to include
+        :return: None
+        """
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.summary(**extra), f, indent=2, default=str)
+            logging.info(f"Run summary written to {path}")
+        except OSError as e:
+            logging.warning(f"Could not write run summary to {path}: {e}")
@@ -1,7 +1,8 @@
+import copy
 import logging
 import sys
-
-import tqdm
+import threading
+import time
 
 
 class ColoredFormatter(logging.Formatter):
@@ -10,6 +11,7 @@ class ColoredFormatter(logging.Formatter):
     """
 
     def format(self, record):
+        record = copy.copy(record)  # Handlers share records, keep the color out of the others' output
         if record.levelno == logging.DEBUG:
             record.levelname = f"\033[34m{record.levelname}\033[0m"
         elif record.levelno == logging.INFO:
@@ -40,6 +42,8 @@ class ColorHandler(logging.StreamHandler):
             logging.ERROR: self.RED,
         }
 
+        import tqdm  # Only loaded once something is logged to the console
+
         csi = f"{chr(27)}["  # control sequence introducer
         color = level_color_map.get(record.levelno, self.WHITE)
         try:
@@ -47,3 +51,31 @@ class ColorHandler(logging.StreamHandler):
             self.flush()
         except Exception:
             self.handleError(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through at most rate INFO and lower records per second, counting the rest. Warnings and above always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(rate, 1.0)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.suppressed += 1
+            return False
@@ -1,9 +1,11 @@
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from mporg import CONFIG_DIR, LOG_DIR
-from mporg.logging_utils.custom_handlers import ColoredFormatter, ColorHandler
+from mporg.logging_utils.custom_handlers import ColoredFormatter, ColorHandler, SamplingFilter
 
 LOG_LEVEL_MAPPING = {
     1: logging.DEBUG,
@@ -13,6 +15,10 @@ LOG_LEVEL_MAPPING = {
     5: logging.CRITICAL,
 }
 
+_listener = None
+_queue_handler = None
+_sampler = None
+
 
 def add_logging_level(level_name, level_num, method_name=None):
     """
@@ -66,8 +72,16 @@ def add_logging_level(level_name, level_num, method_name=None):
     setattr(logging, method_name, log_to_root)
 
 
-def setup_logging(log_lvl_input: int):
-    # Set up logging
+def setup_logging(log_lvl_input: int, sample_rate: float = None):
+    """
+    Log to the console and a rotating file. Records are handed to a queue and written by a listener thread, so
+    worker threads never wait on the terminal or the disk.
+    :param int log_lvl_input: Console level, 1 (debug) to 5 (critical)
+    :param float sample_rate: If set, show at most this many INFO messages per second on the console. The log file
+                              keeps every message
+    :return: None
+    """
+    stop_logging()
     logger = logging.getLogger()
 
     if log_lvl_input < 1:
@@ -76,7 +90,6 @@ def setup_logging(log_lvl_input: int):
         log_level_input = 5
 
     log_lvl = log_lvl_input * 10
-    logger.setLevel(1)
 
     if not CONFIG_DIR.exists():
         os.mkdir(CONFIG_DIR)
@@ -84,7 +97,8 @@ def setup_logging(log_lvl_input: int):
     if not LOG_DIR.exists():
         LOG_DIR.mkdir()
 
-    add_logging_level("TOP", logging.CRITICAL - 1)
+    if not hasattr(logging, "TOP"):  # setup_logging may run more than once in a process
+        add_logging_level("TOP", logging.CRITICAL - 1)
     # Create a formatter
     c_formatter = ColoredFormatter(
         "%(asctime)s - %(module)s - %(levelname)s - %(message)s"
@@ -104,7 +118,41 @@ def setup_logging(log_lvl_input: int):
     # console_handler.stream = sys.stderr
     console_handler.setLevel(log_lvl)
     console_handler.setFormatter(c_formatter)
+    global _listener, _queue_handler, _sampler
+    if sample_rate:
+        _sampler = SamplingFilter(sample_rate)
+        console_handler.addFilter(_sampler)
+
+    # Nothing below the lowest handler level is wanted, so don't even create those records
+    logger.setLevel(max(1, min(file_handler.level, console_handler.level)))
 
-    # Add both handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    _listener = QueueListener(_queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+
+
+def stop_logging():
+    """
+    Write out queued records and stop the listener thread started by setup_logging
+    :return: None
+    """
+    global _listener, _queue_handler, _sampler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    # The sampler runs in the listener thread, so its count is final once the queue is drained
+    if _sampler is not None and _sampler.suppressed:
+        record = logging.getLogger().makeRecord(
+            "root", logging.WARNING, __file__, 0,
+            f"{_sampler.suppressed} INFO messages were not shown on the console by log sampling", (), None)
+        for handler in _listener.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = _sampler = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,316 @@
+import hashlib
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from mporg import CONFIG_DIR
+from mporg.instrumentation import RunStats
+from mporg.types import Track
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+LYRICS_CACHE_DIR = CONFIG_DIR / "lyricscache"
+LYRICS_INDEX_DIR = CONFIG_DIR / "lyricsindex"
+NO_LYRICS = (None, None)  # Cached for tracks known to have no lyrics, like instrumentals
+FOUND_EXPIRE = 60 * 60 * 24 * 90  # Found lyrics are searched again after 90 days, synced versions may appear
+NOT_FOUND_EXPIRE = 60 * 60 * 24 * 14  # Tracks without lyrics are searched again after 14 days
+DEFAULT_WORKERS = 5
+DEFAULT_RETRIES = 5
+DEFAULT_RETRY_DELAY = 2  # Seconds before the first retry, doubling after each
+
+
+def _join(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return ";".join(str(v) for v in value)
+    return str(value or "")
+
+
+def lyrics_key(results: Track | None, source: str, metadata=None) -> str | None:
+    """
+    Identify a track for the lyrics cache: by the ID of its tag source if it has one, else by artist and title
+    :param results: Track the file was tagged from, None if it kept its own tags
+    :param str source: Name of the tag source
+    :param metadata: Tagger or dict with the file's own tags
+    :return: Cache key, or None if the track cannot be identified
+    """
+    if results is not None and results.track_id:
+        return f"{source.lower()}:{results.track_id}"
+    if results is not None:
+        artist, title = _join(results.track_artists), _join(results.track_name)
+    elif metadata:
+        artist, title = _join(metadata.get("artist", "")), _join(metadata.get("title", ""))
+    else:
+        return None
+    if not artist or not title:
+        return None
+    return f"track:{artist.strip().lower()}|{title.strip().lower()}"
+
+
+def lyrics_digest(lyrics: str) -> str:
+    return hashlib.sha256(lyrics.encode("utf-8")).hexdigest()
+
+
+class SidecarIndex:
+    """
+    Records the lyrics file written next to each organized file: where its lyrics came from, their digest, when they
+    were fetched, and the file's size and modification time. A file whose lyrics file is unchanged since then needs
+    neither a search nor a comparison.
+    """
+    def __init__(self, cache=None):
+        if cache is None:
+            import diskcache
+            from mporg.cache import TieredCache
+            cache = TieredCache(diskcache.Cache(directory=str(LYRICS_INDEX_DIR)))
+        self.cache = cache
+
+    def get(self, location: Path) -> dict | None:
+        return self.cache.get(str(location))
+
+    def record(self, location: Path, lyric_type: str, source: str | None, digest: str, fetched: float = None):
+        """
+        Remember the lyrics file just written for location
+        """
+        sidecar = location.with_suffix("." + lyric_type)
+        try:
+            stat = sidecar.stat()
+        except OSError:
+            self.cache.delete(str(location))
+            return
+        self.cache.set(str(location), {
+            "type": lyric_type,
+            "source": source,
+            "digest": digest,
+            "fetched": fetched if fetched is not None else time.time(),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        })
+
+    def move(self, location: Path, new_location: Path):
+        """
+        Carry the entry of location over to the file it was renamed to
+        """
+        entry = self.get(location)
+        if entry is not None:
+            self.cache.set(str(new_location), entry)
+            self.cache.delete(str(location))
+
+    @staticmethod
+    def sidecar_unchanged(location: Path, entry: dict) -> bool:
+        try:
+            stat = location.with_suffix("." + entry["type"]).stat()
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"])
+
+    def current(self, location: Path, source: str | None, max_age: float = FOUND_EXPIRE) -> bool:
+        """
+        Whether the lyrics file of location was written from source, is younger than max_age seconds and was not
+        modified since
+        """
+        entry = self.get(location)
+        if entry is None or entry["source"] != source or time.time() - entry["fetched"] > max_age:
+            return False
+        return self.sidecar_unchanged(location, entry)
+
+
+class LyricsStage:
+    """
+    Searches for lyrics in the background, so organizer threads never wait on lyric providers.
+    Results, including tracks without lyrics, are cached by track. Failed searches are retried later by a scheduler
+    thread instead of sleeping in a worker.
+    """
+    def __init__(self, writer, workers: int = DEFAULT_WORKERS, offline: bool = False, stats: RunStats = None,
+                 cache=None, retries: int = DEFAULT_RETRIES, retry_delay: float = DEFAULT_RETRY_DELAY, search=None,
+                 index: SidecarIndex = None):
+        """
+        :param writer: Called with (location, lyric type, lyrics) for every file lyrics are found for
+        :param int workers: Number of concurrent searches
+        :param bool offline: Only use cached lyrics
+        :param stats: RunStats to time searches and report the queue in
+        :param cache: Cache to use, the persistent lyrics cache if None
+        :param int retries: Attempts per file before giving up
+        :param float retry_delay: Seconds before the first retry
+        :param search: Called with a file's path, returns (lyric type, lyrics). lyrics_searcher if None
+        :param index: SidecarIndex of written lyrics files, the persistent one if None
+        """
+        self.writer = writer
+        self.search = search
+        self.offline = offline
+        self.run_stats = stats or RunStats()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lyrics")
+        self._cache = cache
+        self._index = index
+        self._cache_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._retry_queue = []  # Heap of (due, sequence, location, key, attempt)
+        self._sequence = itertools.count()
+        self._scheduler = None
+        self._counts_lock = threading.Lock()
+        self.counts = {"cache_hits": 0, "searched": 0, "found": 0, "not_found": 0, "retries": 0, "failed": 0,
+                       "current": 0, "unchanged": 0}
+
+    @property
+    def cache(self):
+        with self._cache_lock:
+            if self._cache is None:
+                import diskcache
+                from mporg.cache import TieredCache
+                self._cache = TieredCache(diskcache.Cache(directory=str(LYRICS_CACHE_DIR)), name="lyrics")
+            return self._cache
+
+    @property
+    def index(self) -> SidecarIndex:
+        with self._cache_lock:
+            if self._index is None:
+                self._index = SidecarIndex()
+            return self._index
+
+    def _count(self, name: str):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def submit(self, location: Path, key: str = None):
+        """
+        Queue a file for a lyrics search
+        :param Path location: Organized file
+        :param key: Track identity from lyrics_key, None to search without caching
+        """
+        with self._condition:
+            self._pending += 1
+        self._enqueue(location, key, 0)
+
+    def _enqueue(self, location: Path, key: str | None, attempt: int):
+        self.run_stats.count_waiting("lyrics")
+        self.executor.submit(self._attempt, location, key, attempt)
+
+    def _attempt(self, location: Path, key: str | None, attempt: int):
+        self.run_stats.count_waiting("lyrics", -1)
+        finished = True
+        try:
+            with self.run_stats.stage("lyrics"):
+                finished = self._search(location, key, attempt)
+        except Exception as e:
+            logging.exception("Error saving lyrics for %s: %s", location, e)
+        if finished:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def _search(self, location: Path, key: str | None, attempt: int) -> bool:
+        """
+        :return: False if a retry was scheduled
+        """
+        if self.index.current(location, key):
+            logging.debug("Lyrics file of %s is current", location)
+            self._count("current")
+            return True
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("cache_hits")
+                lyric_type, lyrics = cached
+                if lyrics:
+                    self._write(location, key, lyric_type, lyrics)
+                else:
+                    logging.debug("No lyrics for %s, cached", location)
+                return True
+        if self.offline:
+            return True
+
+        try:
+            logging.info("Searching for lyrics for %s", location)
+            lyric_type, lyrics = self._search_file(location)
+        except Exception as e:
+            if attempt + 1 < self.retries:
+                delay = self.retry_delay * 2 ** attempt
+                logging.info("Lyrics search for %s failed (%s), retrying in %ss", location, e, delay)
+                self._count("retries")
+                self._schedule(location, key, attempt + 1, delay)
+                return False
+            logging.warning("Lyrics search for %s failed %d times: %s", location, self.retries, e)
+            self._count("failed")
+            return True
+
+        self._count("searched")
+        self._count("found" if lyrics else "not_found")
+        if key is not None:
+            if lyrics:
+                self.cache.set(key, (lyric_type, lyrics), expire=FOUND_EXPIRE)
+            else:
+                self.cache.set(key, NO_LYRICS, expire=NOT_FOUND_EXPIRE)
+        if lyrics:
+            self._write(location, key, lyric_type, lyrics)
+        return True
+
+    def _write(self, location: Path, key: str | None, lyric_type: str, lyrics: str):
+        """
+        Write a lyrics file unless the index shows the existing one already holds these lyrics
+        """
+        digest = lyrics_digest(lyrics)
+        entry = self.index.get(location)
+        if (entry is not None and entry["type"] == lyric_type and entry["digest"] == digest
+                and self.index.sidecar_unchanged(location, entry)):
+            logging.debug("Lyrics file of %s is unchanged", location)
+            self._count("unchanged")
+        else:
+            self.writer(location, lyric_type, lyrics)
+        self.index.record(location, lyric_type, key, digest)
+
+    def _search_file(self, location: Path) -> tuple[str, str]:
+        if self.search is not None:
+            return self.search(location)
+        from lyrics_searcher.api import search_lyrics_by_file
+        return search_lyrics_by_file(location, lrc=True)
+
+    def _schedule(self, location: Path, key: str | None, attempt: int, delay: float):
+        with self._condition:
+            heapq.heappush(self._retry_queue, (time.monotonic() + delay, next(self._sequence), location, key, attempt))
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._run_scheduler, name="lyrics-retries", daemon=True)
+                self._scheduler.start()
+            self._condition.notify_all()
+
+    def _run_scheduler(self):
+        with self._condition:
+            while True:
+                if not self._retry_queue:
+                    self._condition.wait()
+                    continue
+                wait = self._retry_queue[0][0] - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                _, _, location, key, attempt = heapq.heappop(self._retry_queue)
+                try:
+                    self._enqueue(location, key, attempt)
+                except RuntimeError:  # The interpreter is shutting down, drop the remaining retries
+                    return
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return self._pending
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Wait for every submitted file, including scheduled retries
+        :return: False if the timeout passed first
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            counts = dict(self.counts)
+        counts["pending"] = self.pending
+        if self._cache is not None and callable(getattr(self._cache, "stats", None)):
+            counts["cache"] = self._cache.stats()
+        return counts
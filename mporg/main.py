@@ -1,22 +1,169 @@
+import json
 import logging
 import os
 import sys
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import rich
-
-from mporg import VERSION, CONFIG_DIR
-from mporg.credentials.credentials_manager import CredentialManager
+from mporg import VERSION, CONFIG_DIR, LOG_DIR, SPOTIFY_API_URL as API_URL, SPOTIFY_AUTH_URL as AUTH_URL
 from mporg.logging_utils.logging_setup import setup_logging
-from mporg.organizer import MPORG
-from mporg.plugins.plugin_loader import PluginLoader
-from mporg.plugins.util import PluginType, setup_and_check_plugins, install_plugin
-from mporg.spotify_searcher import SpotifySearcher
 
+# Everything else is imported where it is used, so --help, --version and subcommands start quickly.
+# tests/test_import_time.py checks that heavy modules stay out of startup.
+if TYPE_CHECKING:
+    from mporg.organizer import MPORG
+    from mporg.spotify_searcher import SpotifySearcher
 
-def main():
-    arg_parser = ArgumentParser()
+MANIFEST_PATH = CONFIG_DIR / "last_run_manifest.jsonl"
+SUMMARY_PATH = LOG_DIR / "run_summary.json"
+
+
+def get_spotify_searcher(credentials: dict = None, offline: bool = False, api_url: str = API_URL,
+                         auth_url: str = AUTH_URL) -> "SpotifySearcher":
+    """
+    Create a SpotifySearcher, asking for credentials if they are not provided
+    :param credentials: Credentials returned by a CredentialManager, these are fetched if None
+    :param offline: Only answer from the cache
+    :param api_url: Base URL of the Spotify Web API
+    :param auth_url: URL of the Spotify token endpoint
+    :return: SpotifySearcher
+    """
+    from mporg.credentials.credentials_manager import CredentialManager
+    from mporg.spotify_searcher import SpotifySearcher
+
+    if credentials is None:
+        credentials = CredentialManager().get_credentials()
+    spotify_creds = credentials.pop("Spotify")
+    return SpotifySearcher(spotify_creds.get("cid"), spotify_creds.get("secret"), offline=offline,
+                           api_url=api_url, auth_url=auth_url)
+
+
+def read_spotify_ids(ids_file: Path = None, manifest: Path = None) -> list[str]:
+    """
+    Collect Spotify track IDs from a file of IDs or URLs (one per line) and/or a run manifest
+    :param ids_file: File with one Spotify ID or track URL per line
+    :param manifest: Manifest written by a previous run
+    :return: List of Spotify track IDs
+    """
+    from mporg.organizer import get_valid_spotify_url
+
+    ids = []
+    if ids_file:
+        with open(ids_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                ids.append(get_valid_spotify_url([line]) or line)
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() and (spot_id := json.loads(line).get("spotify_id")):
+                    ids.append(spot_id)
+    return ids
+
+
+def cache_main(argv: list[str]):
+    """
+    Entry point for `mporg cache`, used to move caches between machines and inspect them
+    :param argv: Arguments following `cache`
+    :return: None
+    """
+    import rich
+    from mporg import cache
+
+    arg_parser = ArgumentParser(prog="mporg cache", description="Manage MPORG's local caches")
+    arg_parser.add_argument(
+        "-l",
+        "--log_level",
+        help="Logging level for the console screen",
+        type=int,
+        default=3,
+    )
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Dump caches to a portable compressed file")
+    export_parser.add_argument("file", type=Path, help="File to write")
+    export_parser.add_argument(
+        "-c",
+        "--caches",
+        nargs="+",
+        choices=list(cache.CACHE_DIRS),
+        help="Caches to export, default all",
+    )
+
+    import_parser = commands.add_parser("import", help="Merge entries from an exported file. Only import trusted files")
+    import_parser.add_argument("file", type=Path, help="File written by `mporg cache export`")
+    import_parser.add_argument(
+        "--overwrite",
+        help="Replace entries that already exist locally",
+        action="store_true",
+    )
+
+    commands.add_parser("stats", help="Show cache sizes and hit statistics")
+
+    warm_parser = commands.add_parser("warm", help="Pre-warm the Spotify cache")
+    warm_parser.add_argument("--ids", type=Path, help="File with one Spotify track ID or URL per line")
+    warm_parser.add_argument(
+        "--manifest",
+        type=Path,
+        nargs="?",
+        const=MANIFEST_PATH,
+        help=f"Manifest of a previous run, default {MANIFEST_PATH}",
+    )
+    warm_parser.add_argument("-w", "--workers", type=int, default=4, help="Concurrent lookups")
+
+    args = arg_parser.parse_args(argv)
+
+    setup_logging(args.log_level)
+    logging.debug(args)
+
+    if args.command == "export":
+        exported = cache.export_caches(args.file, args.caches)
+        rich.print(f"Exported {sum(exported.values())} entries to {args.file}")
+    elif args.command == "import":
+        imported = cache.import_caches(args.file, args.overwrite)
+        for name, count in imported.items():
+            rich.print(f"{name}: {count} entries imported")
+    elif args.command == "stats":
+        for name, stats in cache.cache_stats().items():
+            hit_rate = f"{stats['hit_rate']:.1%}" if stats["hit_rate"] is not None else "n/a"
+            rich.print(
+                f"[bold]{name}[/bold]: {stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MiB, "
+                f"{stats.get('memory_hits', 0)} memory hits, {stats.get('disk_hits', 0)} disk hits, "
+                f"{stats.get('misses', 0)} misses, hit rate {hit_rate}"
+            )
+    elif args.command == "warm":
+        if not args.ids and not args.manifest:
+            arg_parser.error("warm requires --ids and/or --manifest")
+        ids = read_spotify_ids(args.ids, args.manifest)
+        resolved = cache.warm_spotify(get_spotify_searcher(), ids, args.workers)
+        rich.print(f"{resolved} of {len(set(ids))} tracks cached")
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a shard given as K/N
+    :return: (K, N)
+    """
+    try:
+        shard, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ArgumentTypeError(f"{value!r} is not of the form K/N")
+    if not 1 <= shard <= count:
+        raise ArgumentTypeError(f"shard {shard} is not between 1 and {count}")
+    return shard, count
+
+
+def build_arg_parser(search_path: bool = True, **kwargs) -> ArgumentParser:
+    """
+    Create the parser for the options shared by organizing, watching and workers
+    :param bool search_path: Take a search path after the store path
+    :param kwargs: Passed to ArgumentParser
+    :return: ArgumentParser
+    """
+    arg_parser = ArgumentParser(**kwargs)
     arg_parser.add_argument(
         "-v",
         "--version",
@@ -30,6 +177,13 @@ def main():
         type=int,
         default=3,
     )
+    arg_parser.add_argument(
+        "--log-sample-rate",
+        help="Show at most this many INFO log messages per second on the console. The log file keeps every message "
+             "and warnings are always shown",
+        type=float,
+        metavar="N",
+    )
 
     arg_parser.add_argument(
         "-f",
@@ -61,6 +215,99 @@ def main():
         action="store_true",
     )
 
+    arg_parser.add_argument(
+        "--lyrics-workers",
+        help="Number of lyrics searches to run at once, in the background. Default 5",
+        type=int,
+        default=5,
+        metavar="N",
+    )
+
+    arg_parser.add_argument(
+        "-t",
+        "--threads",
+        help="Number of files to process at once. Defaults to Python's thread pool default",
+        type=int,
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--prioritize",
+        help="Read each file's tags first and organize files with a Spotify URL before ones that need a search, "
+             "and those before ones that need fingerprinting",
+        action="store_true",
+    )
+    arg_parser.add_argument(
+        "--fingerprint-threads",
+        help="With --prioritize, the most files to fingerprint at once. Default half of --threads",
+        type=int,
+        metavar="N",
+    )
+    arg_parser.add_argument(
+        "--hedge-delay",
+        help="Query fingerprinters concurrently: start the next fingerprinter after this many seconds without a "
+             "match, 0 to start all at once. By default they are tried one after another",
+        type=float,
+        metavar="SECONDS",
+    )
+    arg_parser.add_argument(
+        "--shard",
+        help="Only organize shard K of N, to split a run over N machines. Files are assigned by a hash of their "
+             "directory relative to the search path, so albums stay on one machine",
+        type=parse_shard,
+        metavar="K/N",
+    )
+    arg_parser.add_argument(
+        "--shard-by",
+        help="Assign files to shards by their directory (default) or by their relative path, for flat directories",
+        choices=["album", "path"],
+        default="album",
+    )
+    arg_parser.add_argument(
+        "--no-store-index",
+        help="Do not keep an index of the files in the store",
+        action="store_true",
+    )
+    arg_parser.add_argument(
+        "--offline",
+        help="Only use cached Spotify and fingerprinter results, never connect to the network",
+        action="store_true",
+    )
+
+    arg_parser.add_argument(
+        "--summary",
+        help=f"Write per-stage timings and request counts of the run to this JSON file. Default {SUMMARY_PATH}",
+        type=Path,
+        default=SUMMARY_PATH,
+        metavar="FILE",
+    )
+
+    arg_parser.add_argument(
+        "--trace",
+        help="Record every stage, HTTP request, fingerprinter call and lock wait as Chrome trace events in this file",
+        type=Path,
+        metavar="FILE",
+    )
+
+    arg_parser.add_argument(
+        "--metrics-port",
+        help="Serve live counters and gauges in the Prometheus text format at http://127.0.0.1:PORT/metrics",
+        type=int,
+        metavar="PORT",
+    )
+
+    arg_parser.add_argument(
+        "--spotify-url",
+        help=f"Base URL of the Spotify Web API, for use with a stand-in server. Default {API_URL}",
+        default=API_URL,
+        metavar="URL",
+    )
+    arg_parser.add_argument(
+        "--spotify-auth-url",
+        help=f"URL of the Spotify token endpoint, for use with a stand-in server. Default {AUTH_URL}",
+        default=AUTH_URL,
+        metavar="URL",
+    )
+
     arg_parser.add_argument(
         "--install-plugins",
         nargs="+",
@@ -74,31 +321,59 @@ def main():
         help="Root of area to store organized files",
         nargs="?",
     )
-    arg_parser.add_argument(
-        "search_path",
-        default=Path.cwd(),
-        help="Source dir to look for music files in.",
-        nargs="?",
-    )
+    if search_path:
+        arg_parser.add_argument(
+            "search_path",
+            default=Path.cwd(),
+            help="Source dir to look for music files in.",
+            nargs="?",
+        )
 
-    args = arg_parser.parse_args()
+    return arg_parser
 
-    setup_logging(args.log_level)
-    logging.debug(args)
+
+def parse_organize_args(arg_parser: ArgumentParser, argv: list[str] = None):
+    """
+    Parse arguments and handle the options that exit early: --version and --install-plugins
+    :param ArgumentParser arg_parser: Parser from build_arg_parser
+    :param argv: Arguments to parse, sys.argv if None
+    :return: Parsed arguments
+    """
+    args = arg_parser.parse_args(argv)
 
     if args.version:
         print(VERSION)
         sys.exit(0)
 
+    setup_logging(args.log_level, args.log_sample_rate)
+    logging.debug(args)
+
     if args.install_plugins:
+        import rich
+        from mporg.plugins.util import install_plugin
+
         installed = 0
         for plugin_url in args.install_plugins:
             if install_plugin(plugin_url):
                 installed += 1
         rich.print(f"{installed} Plugin{'' if installed == 1 else 's'} installed, exiting")
         sys.exit(0)
+    return args
+
 
-    setup_and_check_plugins()
+def create_organizer(args) -> "MPORG":
+    """
+    Load the requested plugins, get credentials and create the organizer
+    :param args: Arguments from parse_organize_args
+    :return: MPORG
+    """
+    from mporg.credentials.credentials_manager import CredentialManager
+    from mporg.organizer import MPORG
+    from mporg.plugins.plugin_loader import PluginLoader
+    from mporg.plugins.util import PluginType, setup_and_check_plugins
+
+    if not args.offline:
+        setup_and_check_plugins()
     loader = PluginLoader()
     if args.all_fingerprint:
         loader.load_all_fingerprinters()
@@ -111,35 +386,399 @@ def main():
             ) as e:  # Catch any uncaught exceptions loading Plugins Log and ignore
                 logging.error(f"Error loading plugin. {e}")
 
+    # Plugins with saved credentials stay unimported until a file needs them, their credentials are verified then
     cred_manager = CredentialManager()
-    for plugin in loader.fingerprinters.values():
-        cred_manager.credential_providers.append(
-            plugin.provider(CONFIG_DIR / plugin.provider.CONFIG_NAME)
-        )
-
-    credentials = cred_manager.get_credentials()
-    spotify_creds = credentials.pop("Spotify")
+    plugin_credentials = {}
+    for name, plugin in list(loader.fingerprinters.items()):
+        saved = plugin.saved_credentials()
+        if saved is not None or args.offline:
+            plugin_credentials[name] = saved or {}
+            continue
+        try:
+            provider = plugin.load().provider
+        except ImportError as e:
+            logging.error(f"Error loading plugin. {e}")
+            del loader.fingerprinters[name]
+            continue
+        cred_manager.credential_providers.append(provider(CONFIG_DIR / provider.CONFIG_NAME))
 
-    spotify_searcher = SpotifySearcher(spotify_creds["cid"], spotify_creds["secret"])
+    if args.offline:
+        credentials = cred_manager.get_saved_credentials()  # Verifying credentials needs the network
+    else:
+        credentials = cred_manager.get_credentials()
+    spotify_searcher = get_spotify_searcher(credentials, args.offline, args.spotify_url, args.spotify_auth_url)
 
-    # Add credentials to loaded plugins, then add list of fingerprinters to MPORG
+    # Add credentials to the plugins, then add list of fingerprinters to MPORG
     fingerprinters = []
-    for plugin in loader.fingerprinters.values():
-        if plugin.provider is not None:
-            fingerprinters.append(plugin.plugin(credentials[plugin.provider.PNAME]))
-        else:
-            fingerprinters.append(plugin.plugin())
+    for name, plugin in loader.fingerprinters.items():
+        if name in plugin_credentials:
+            fingerprinter = plugin.fingerprinter(plugin_credentials[name], args.offline)
+        else:  # Just entered and verified by the credential manager
+            fingerprinter = plugin.fingerprinter(credentials[plugin.load().provider.PNAME], args.offline, True)
+        fingerprinters.append(fingerprinter)
+
+    index = None
+    if not args.no_store_index:
+        from mporg.store_index import StoreIndex
+        index = StoreIndex(Path(args.store_path))
 
     logging.info("All good, starting Organizing")
-    org = MPORG(
+    return MPORG(
         Path(args.store_path),
-        Path(args.search_path),
+        Path(getattr(args, "search_path", Path.cwd())),
         spotify_searcher,
         fingerprinters,
         args.pattern_extension,
         args.lyrics,
+        MANIFEST_PATH,
+        args.offline,
+        args.threads,
+        args.summary,
+        args.hedge_delay,
+        args.lyrics_workers,
+        args.shard,
+        args.shard_by,
+        args.prioritize,
+        args.fingerprint_threads,
+        index,
+    )
+
+
+def run_instrumented(org: "MPORG", args, action):
+    """
+    Run action with the metrics server and trace requested in args
+    :param MPORG org: Organizer to serve metrics of
+    :param args: Arguments from parse_organize_args
+    :param action: Callable without arguments
+    :return: None
+    """
+    from mporg.instrumentation import tracer
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        from mporg.metrics import MetricsServer
+        metrics_server = MetricsServer(org, args.metrics_port).start()
+    if args.trace:
+        tracer.start(args.trace)
+    try:
+        action()
+    finally:
+        tracer.stop()
+        if metrics_server:
+            metrics_server.stop()
+
+
+def _log_result(future):
+    try:
+        if result := future.result():
+            logging.warning(result)
+    except Exception as e:
+        logging.exception("Error organizing file: %s", e)
+
+
+def watch_main(argv: list[str]):
+    """
+    Entry point for `mporg watch`, which organizes files as they appear in the search directory
+    :param argv: Arguments following `watch`
+    :return: None
+    """
+    from concurrent.futures import wait
+    from mporg import watch
+
+    arg_parser = build_arg_parser(
+        prog="mporg watch",
+        description="Organize new and modified files as they appear in the search directory, until interrupted",
+    )
+    arg_parser.add_argument(
+        "--settle",
+        help=f"Seconds a file must go unchanged before it is organized. Default {watch.DEFAULT_SETTLE:g}",
+        type=float,
+        default=watch.DEFAULT_SETTLE,
+        metavar="SECONDS",
+    )
+    arg_parser.add_argument(
+        "--poll-interval",
+        help="Look for changes by rescanning every this many seconds instead of using inotify. Used automatically "
+             f"every {watch.DEFAULT_POLL_INTERVAL:g} seconds where inotify is unavailable",
+        type=float,
+        metavar="SECONDS",
+    )
+    arg_parser.add_argument(
+        "--scan",
+        help="Organize the files already in the search directory before watching",
+        action="store_true",
+    )
+    args = parse_organize_args(arg_parser, argv)
+    org = create_organizer(args)
+    store, search = Path(args.store_path), Path(args.search_path)
+
+    futures = set()
+
+    def on_ready(path: Path):
+        if not org.in_shard(path.parent, Path(path.name)) or not org.accepts(path):
+            return
+        future = org.submit_file(path.parent, Path(path.name))
+        futures.add(future)
+        future.add_done_callback(futures.discard)
+        future.add_done_callback(_log_result)
+
+    def run():
+        from mporg.organizer import file_generator
+
+        org.start_run()  # Once, so the scanned files share the manifest and stats of the watched ones
+        try:
+            if args.scan:
+                logging.top("Organizing files already in the search directory...")
+                for root, file in file_generator(search):
+                    on_ready(root / file)
+            watch.watch(search, on_ready, args.settle, args.poll_interval,
+                        ignore=store if store.absolute().is_relative_to(search.absolute()) else None)
+        except KeyboardInterrupt:
+            logging.top("Stopping, waiting for files in progress")
+        finally:
+            wait(list(futures))
+            org.finish_run()
+
+    run_instrumented(org, args, run)
+
+
+def index_main(argv: list[str]):
+    """
+    Entry point for `mporg index`, which shows and rebuilds the index of a store
+    :param argv: Arguments following `index`
+    :return: None
+    """
+    import rich
+    from mporg.store_index import StoreIndex
+
+    arg_parser = ArgumentParser(prog="mporg index", description="Manage the index of the files in a store")
+    arg_parser.add_argument(
+        "-l",
+        "--log_level",
+        help="Logging level for the console screen",
+        type=int,
+        default=3,
+    )
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = commands.add_parser("rebuild", help="Scan the store and update the index to match it")
+    rebuild_parser.add_argument("store_path", type=Path, help="Root of the store")
+    rebuild_parser.add_argument("-w", "--workers", type=int, default=None, help="Files to scan at once")
+    rebuild_parser.add_argument(
+        "--full",
+        help="Scan every file, not only files changed since they were indexed",
+        action="store_true",
+    )
+
+    stats_parser = commands.add_parser("stats", help="Show how many files are indexed")
+    stats_parser.add_argument("store_path", type=Path, help="Root of the store")
+
+    args = arg_parser.parse_args(argv)
+
+    setup_logging(args.log_level)
+    logging.debug(args)
+
+    index = StoreIndex(args.store_path)
+    if args.command == "rebuild":
+        counts = index.rebuild(args.workers, args.full)
+        rich.print(f"{counts['scanned']} files scanned, {counts['hashed']} hashed, {counts['unchanged']} unchanged, "
+                   f"{counts['removed']} removed from the index")
+    elif args.command == "stats":
+        stats = index.stats()
+        rich.print(f"{stats['files']} files, {stats['with_spotify_id']} with a Spotify ID, "
+                   f"{stats['with_digest']} with a digest")
+        for tag_source, count in stats["tag_sources"].items():
+            rich.print(f"{tag_source}: {count}")
+
+
+def relayout_main(argv: list[str]):
+    """
+    Entry point for `mporg relayout`, which moves the files of a store to where the current layout rules put them
+    :param argv: Arguments following `relayout`
+    :return: None
+    """
+    import rich
+    from mporg.lyrics import SidecarIndex
+    from mporg.relayout import Relayout
+    from mporg.store_index import StoreIndex, index_path
+
+    arg_parser = ArgumentParser(
+        prog="mporg relayout",
+        description="Rename the files of a store, and their lyrics files, to match the current layout rules. "
+                    "Destinations come from the tags already in the files, nothing is looked up or copied",
+    )
+    arg_parser.add_argument(
+        "-l",
+        "--log_level",
+        help="Logging level for the console screen",
+        type=int,
+        default=3,
+    )
+    arg_parser.add_argument("store_path", type=Path, help="Root of the store")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None, help="Files to read tags from at once")
+    arg_parser.add_argument(
+        "--dry-run",
+        help="Only log the moves, change nothing",
+        action="store_true",
+    )
+    args = arg_parser.parse_args(argv)
+
+    setup_logging(args.log_level)
+    logging.debug(args)
+
+    if not args.store_path.is_dir():
+        arg_parser.error(f"{args.store_path} is not a directory")
+    index = StoreIndex(args.store_path) if index_path(args.store_path).exists() else None
+    sidecars = None if args.dry_run else SidecarIndex()  # Only needed when files are moved
+    counts = Relayout(args.store_path, index, sidecars, args.workers, args.dry_run).run()
+    verb = "would be moved" if args.dry_run else "moved"
+    rich.print(f"{counts['moved']} files {verb}, {counts['conflicts']} skipped as their destination exists, "
+               f"{counts['failed']} failed")
+
+
+def queue_main(argv: list[str]):
+    """
+    Entry point for `mporg queue`, which fills and inspects the work queue shared by `mporg worker` processes
+    :param argv: Arguments following `queue`
+    :return: None
+    """
+    import rich
+    from mporg.workqueue import WorkQueue
+
+    arg_parser = ArgumentParser(prog="mporg queue", description="Manage a work queue shared by mporg workers")
+    arg_parser.add_argument(
+        "-l",
+        "--log_level",
+        help="Logging level for the console screen",
+        type=int,
+        default=3,
+    )
+    arg_parser.add_argument(
+        "--no-wal",
+        help="Do not use SQLite write-ahead logging, needed for queues on network filesystems",
+        action="store_true",
+    )
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="Queue the music files in a directory")
+    add_parser.add_argument("queue", type=Path, help="Queue database, created if missing")
+    add_parser.add_argument("search_path", type=Path, help="Source dir to look for music files in")
+
+    status_parser = commands.add_parser("status", help="Show how many files are pending, leased, done and failed")
+    status_parser.add_argument("queue", type=Path, help="Queue database")
+
+    retry_parser = commands.add_parser("retry", help="Queue failed files again")
+    retry_parser.add_argument("queue", type=Path, help="Queue database")
+
+    args = arg_parser.parse_args(argv)
+
+    setup_logging(args.log_level)
+    logging.debug(args)
+
+    if args.command != "add" and not args.queue.exists():
+        arg_parser.error(f"{args.queue} does not exist")
+    queue = WorkQueue(args.queue, wal=not args.no_wal)
+    if args.command == "add":
+        from mporg.organizer import SUPPORTED_FILETYPES, file_generator
+
+        added = queue.add((root, file) for root, file in file_generator(args.search_path)
+                          if file.suffix.lower() in SUPPORTED_FILETYPES)
+        rich.print(f"{added} files added to {args.queue}")
+    elif args.command == "status":
+        rich.print(", ".join(f"{count} {state}" for state, count in queue.counts().items()))
+        for path, error in queue.failures():
+            rich.print(f"[red]{path}[/red]: {error}")
+    elif args.command == "retry":
+        rich.print(f"{queue.retry_failed()} failed files queued again")
+
+
+def worker_main(argv: list[str]):
+    """
+    Entry point for `mporg worker`, which organizes files leased from a queue filled by `mporg queue add`
+    :param argv: Arguments following `worker`
+    :return: None
+    """
+    from mporg import workqueue
+
+    arg_parser = build_arg_parser(
+        search_path=False,
+        prog="mporg worker",
+        description="Organize files from a work queue until it is finished. Any number of workers may share a queue",
+    )
+    arg_parser.add_argument(
+        "--queue",
+        help="Queue database filled by `mporg queue add`",
+        type=Path,
+        required=True,
+        metavar="FILE",
+    )
+    arg_parser.add_argument(
+        "--lease",
+        help="Seconds a file stays leased to this worker without a renewal before other workers may take it. "
+             f"Default {workqueue.DEFAULT_LEASE}",
+        type=float,
+        default=workqueue.DEFAULT_LEASE,
+        metavar="SECONDS",
+    )
+    arg_parser.add_argument(
+        "--max-attempts",
+        help=f"Leases per file before it is marked failed. Default {workqueue.DEFAULT_MAX_ATTEMPTS}",
+        type=int,
+        default=workqueue.DEFAULT_MAX_ATTEMPTS,
+        metavar="N",
+    )
+    arg_parser.add_argument(
+        "--follow",
+        help="Keep waiting for new files once the queue is finished, until interrupted",
+        action="store_true",
+    )
+    arg_parser.add_argument(
+        "--no-wal",
+        help="Do not use SQLite write-ahead logging, needed for queues on network filesystems",
+        action="store_true",
+    )
+    args = parse_organize_args(arg_parser, argv)
+    if not args.queue.exists():
+        arg_parser.error(f"{args.queue} does not exist, create it with `mporg queue add`")
+    org = create_organizer(args)
+    queue = workqueue.WorkQueue(args.queue, wal=not args.no_wal)
+    worker = workqueue.Worker(queue, org, args.threads * 2 if args.threads else None, args.lease, args.max_attempts)
+
+    def run():
+        org.start_run()
+        try:
+            counts = worker.run(args.follow)
+            logging.top("Worker finished: %d processed, %d failed, %d lost leases",
+                        counts["processed"], counts["failed"], counts["lost"])
+        except KeyboardInterrupt:
+            logging.top("Stopping, unfinished files are leased again once their leases expire")
+        finally:
+            org.finish_run()
+
+    run_instrumented(org, args, run)
+
+
+SUBCOMMANDS = {
+    "cache": cache_main,
+    "index": index_main,
+    "queue": queue_main,
+    "relayout": relayout_main,
+    "watch": watch_main,
+    "worker": worker_main,
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    arg_parser = build_arg_parser(
+        epilog="Other commands: " + ", ".join(f"mporg {name}" for name in SUBCOMMANDS) + ". Use -h on each for help."
     )
-    org.organize()
+    args = parse_organize_args(arg_parser)
+    org = create_organizer(args)
+    run_instrumented(org, args, org.organize)
 
 
 if __name__ == "__main__":
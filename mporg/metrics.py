@@ -0,0 +1,160 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+class _Family:
+    """
+    One metric with its HELP and TYPE lines and samples
+    """
+    def __init__(self, name: str, kind: str, description: str):
+        self.name = name
+        self.kind = kind
+        self.description = description
+        self.samples = []
+
+    def add(self, value, suffix: str = "", **labels):
+        self.samples.append(f"{self.name}{suffix}{_labels(labels)} {value}")
+        return self
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}", *self.samples])
+
+
+def _histogram(family: _Family, histogram: dict, **labels):
+    cumulative = 0
+    for bound, count in histogram["buckets"].items():
+        cumulative += count
+        family.add(cumulative, "_bucket", **labels, le=bound)
+    family.add(histogram["total_seconds"], "_sum", **labels)
+    family.add(histogram["count"], "_count", **labels)
+
+
+def render_metrics(summary: dict) -> str:
+    """
+    Render a run summary (see RunStats.summary and MPORG.component_stats) in the Prometheus text format
+    :param dict summary: Run summary
+    :return: Metrics text
+    """
+    files = summary["files"]
+    families = [
+        _Family("mporg_files_discovered_total", "counter", "Files found in the search directory").add(
+            files["discovered"]),
+        _Family("mporg_files_skipped_total", "counter", "Files skipped by type or pattern").add(files["skipped"]),
+    ]
+
+    processed = _Family("mporg_files_processed_total", "counter", "Files processed, by tag source")
+    for tag_source, count in files["by_tag_source"].items():
+        processed.add(count, tag_source=tag_source)
+    failed = _Family("mporg_files_failed_total", "counter", "Files that failed to process, by tag source")
+    for tag_source, count in files["failed_by_tag_source"].items():
+        failed.add(count, tag_source=tag_source)
+
+    in_flight = _Family("mporg_stage_in_flight", "gauge", "Executions of a stage currently running")
+    for stage, count in summary["in_flight"].items():
+        in_flight.add(count, stage=stage)
+    queues = _Family("mporg_queue_depth", "gauge", "Work waiting to be picked up")
+    for queue, depth in summary["queues"].items():
+        queues.add(depth, queue=queue)
+
+    durations = _Family("mporg_stage_duration_seconds", "histogram", "Time spent per execution of a stage")
+    for stage, histogram in summary["stages"].items():
+        _histogram(durations, histogram, stage=stage)
+    lock_wait = _Family("mporg_lock_wait_seconds", "histogram", "Time spent waiting for file locks")
+    _histogram(lock_wait, summary["lock_wait"])
+
+    families += [
+        processed, failed, in_flight, queues, durations, lock_wait,
+        _Family("mporg_bytes_copied_total", "counter", "Bytes copied into the store").add(summary["bytes_copied"]),
+    ]
+
+    caches = {}
+    if "spotify" in summary:
+        caches["spotify"] = summary["spotify"]["cache"]
+    for name, stats in summary.get("fingerprinters", {}).items():
+        caches[name] = stats["cache"]
+    hits = _Family("mporg_cache_hits_total", "counter", "Cache lookups answered, by tier")
+    misses = _Family("mporg_cache_misses_total", "counter", "Cache lookups not answered")
+    for name, stats in caches.items():
+        hits.add(stats["memory_hits"], cache=name, tier="memory")
+        hits.add(stats["disk_hits"], cache=name, tier="disk")
+        misses.add(stats["misses"], cache=name)
+    families += [hits, misses]
+
+    if "spotify" in summary:
+        requests = _Family("mporg_spotify_requests_total", "counter", "Spotify API requests, including retries")
+        for endpoint, count in summary["spotify"]["http_calls"].items():
+            requests.add(count, endpoint=endpoint)
+        families += [
+            requests,
+            _Family("mporg_spotify_rate_limited_total", "counter", "Spotify API responses with status 429").add(
+                summary["spotify"]["rate_limited"]),
+        ]
+
+    return "\n".join(family.render() for family in families) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        try:
+            body = render_metrics(self.server.collect()).encode("utf-8")
+        except Exception as e:
+            logging.exception(f"Error rendering metrics: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Metrics request: {format % args}")
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Serves the live statistics of an MPORG instance at /metrics for Prometheus to scrape
+    """
+    daemon_threads = True
+
+    def __init__(self, org, port: int, host: str = "127.0.0.1"):
+        super().__init__((host, port), _MetricsHandler)
+        self.org = org
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def collect(self) -> dict:
+        return self.org.stats.summary(**self.org.component_stats())
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mporg-metrics", daemon=True)
+        self._thread.start()
+        logging.info(f"Serving metrics at {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,4 +1,6 @@
 import enum
+import hashlib
+import json
 import logging
 import os
 import random
@@ -6,22 +8,31 @@ import shutil
 import sys
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, wait
-from contextlib import ExitStack, contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager, suppress
 from math import ceil
 from pathlib import Path
 from threading import Lock
 
 import mutagen
-from lyrics_searcher.api import search_lyrics_by_file
 from tqdm import tqdm
 
-from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.audio_digest import TAGS_EXCLUDED, digest_index
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult, cpu_pool
+from mporg.instrumentation import RunStats, tracer
+from mporg.lyrics import DEFAULT_WORKERS as DEFAULT_LYRICS_WORKERS, LyricsStage, lyrics_key
 from mporg.spotify_searcher import SpotifySearcher
+from mporg.store_index import StoreIndex
+from mporg.throttle import LaneScheduler
 from mporg.types import Track, Tagger
 
 INVALID_PATH_CHARS = ["<", ">", ":", '"', "/", "\\", "|", "?", "*", ".", "\x00"]
 SUPPORTED_FILETYPES = [".mp3", ".wav", ".flac", ".ogg", ".wma", ".m4a", ".oga"]
+URL_TAGS = ("comment", "commentNULL", "commentENG", "source", "url")  # Tags that may hold a Spotify track URL
+# With prioritize, files are run in this order: Spotify URL in the tags, search by artist and title, fingerprinting
+FAST_LANE = "spotify_id"
+SEARCH_LANE = "search"
+FINGERPRINT_LANE = "fingerprint"
 logging.getLogger("__main__." + __name__)
 logging.propagate = True
 
@@ -54,9 +65,14 @@ def wait_if_locked(timeout):
             if locks is None:
                 raise ValueError("No Lock objects found in arguments.")
 
+            owner = func_args[0] if func_args else None
             with ExitStack() as stack:
-                for lock in locks:
-                    stack.enter_context(acquire(lock, timeout=timeout))
+                start = time.perf_counter()
+                with tracer.span("lock_wait", "lock", function=func.__name__, locks=len(locks)):
+                    for lock in locks:
+                        stack.enter_context(acquire(lock, timeout=timeout))
+                if isinstance(owner, MPORG):
+                    owner.stats.record_lock_wait(time.perf_counter() - start)
                 result = func(*func_args, **kwargs)
 
             return result
@@ -66,10 +82,22 @@ def wait_if_locked(timeout):
     return decorator
 
 
+def shard_of(key: str, count: int) -> int:
+    """
+    Stable shard of a key, the same on every machine and Python version
+    :param str key: Key to hash
+    :param int count: Number of shards
+    :return: Shard from 1 to count
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
 class TagType(enum.Enum):
     SPOTIFY = 0
     FINGERPRINTER = 1
     METADATA = 2
+    STORE = 3  # The track is already in the store, found by its Spotify ID in the store index
 
 
 def file_generator(search: Path) -> (Path, Path):
@@ -118,12 +146,12 @@ def save_metadata(tagger: Tagger):
         except mutagen.MutagenError:
             time.sleep(random.randint(1, 3))
         except Exception as e:
-            logging.exception(f"EXP - Saving Metadata: {e} -> {tagger.tagger}")
+            logging.exception("EXP - Saving Metadata: %s -> %s", e, tagger.tagger)
     else:
         try:
             tagger.save()
         except mutagen.MutagenError as e:
-            logging.exception(f"Unhandled MutagenError {e}")
+            logging.exception("Unhandled MutagenError %s", e)
 
 
 class MPORG:
@@ -138,16 +166,55 @@ class MPORG:
         fingerprinters: list[Fingerprinter],
         pattern: list,
         lyrics: bool,
+        manifest: Path = None,
+        offline: bool = False,
+        workers: int = None,
+        summary: Path = None,
+        hedge_delay: float = None,
+        lyrics_workers: int = DEFAULT_LYRICS_WORKERS,
+        shard: tuple[int, int] = None,
+        shard_by: str = "album",
+        prioritize: bool = False,
+        fingerprint_threads: int = None,
+        index: StoreIndex = None,
     ):
         self.search = search
         self.store = store
         self.sh = searcher
         self.af = fingerprinters
         self.file_locks = {}
-        self.executor = ThreadPoolExecutor()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)  # ThreadPoolExecutor's default
         self.pattern = pattern
-        self.get_lyrics = lyrics
-        self.lyric_semaphore = threading.Semaphore(5)
+        self.offline = offline
+        self.manifest = manifest
+        self._manifest_file = None
+        self._manifest_lock = Lock()
+        self.stats = RunStats()
+        self.summary = summary
+        self.get_lyrics = bool(lyrics)
+        # (K, N) to only organize files in shard K of N, keyed by album directory or by file
+        self.shard = shard
+        self.shard_by = shard_by
+        self.index = index  # Records what was written to the store, where from and with which tags
+        # Files are classified by their tags and started fast lane first, fingerprinting gets at most
+        # fingerprint_threads threads (half by default) so it cannot hold up cheaper lookups
+        self.scheduler = None
+        self.classifier = None
+        if prioritize:
+            self.scheduler = LaneScheduler(
+                self.executor, self.workers, (FAST_LANE, SEARCH_LANE, FINGERPRINT_LANE),
+                {FINGERPRINT_LANE: fingerprint_threads or max(1, self.workers // 2)})
+            self.classifier = ThreadPoolExecutor(max_workers=min(8, self.workers), thread_name_prefix="classify")
+        # Offline, only lyrics cached by earlier runs are saved
+        self.lyrics = LyricsStage(self.save_lyrics, lyrics_workers, offline, self.stats) if lyrics else None
+        # None tries fingerprinters one after another, otherwise the next one starts after hedge_delay seconds
+        self.hedge_delay = hedge_delay
+        self.fingerprint_executor = None
+        if hedge_delay is not None and len(fingerprinters) > 1:
+            self.fingerprint_executor = ThreadPoolExecutor(
+                max_workers=(workers or min(32, (os.cpu_count() or 1) + 4)) * len(fingerprinters),
+                thread_name_prefix="fingerprint")
 
     def process_file(self, args):
         """
@@ -156,34 +223,51 @@ class MPORG:
         :return str:  Error Messages
         """
         root, file = args
+        start = time.perf_counter_ns()
+        tags_from = None
+        failed = True
+        self.stats.file_started()
         try:
-            logging.info(f"Organizing: {str(root / file)}")
+            logging.info("Organizing: %s", root / file)
             path = root / file
             try:
-                metadata = Tagger(path)
+                with self.stats.stage("read_tags"):
+                    metadata = Tagger(path)
             except mutagen.MutagenError:
                 metadata = {}
             except Exception as e:
-                logging.exception(f"EXP - Loading Metadata: {e} {path}")
+                logging.exception("EXP - Loading Metadata: %s %s", e, path)
                 raise e
 
-            results, tags_from = self.get_metadata(metadata, path)
+            with self.stats.stage("lookup"):
+                spot_id, known = self.find_in_store(metadata, path)
+                if known is None:
+                    results, tags_from = self.get_metadata(metadata, path, spot_id)
+            if known is not None:  # Nothing to copy, look up, tag or search lyrics for
+                tags_from = TagType.STORE
+                self.record_manifest(path, known, tags_from, None, spot_id)
+                failed = False
+                return None
             location = self.get_location(results, tags_from, metadata, file)
 
             source_lock = self.get_lock(path)
             destination_lock = self.get_lock(location)
-            self.copy_file(source_lock, destination_lock, path, location)
+            with self.stats.stage("copy"):
+                self.copy_file(source_lock, destination_lock, path, location)
 
             lock = self.get_lock(location)
-            if tags_from == TagType.SPOTIFY:
-                self.update_metadata_from_spotify(lock, location, results)
-            elif tags_from == TagType.FINGERPRINTER:
-                self.update_metadata_from_fingerprinter(lock, location, results)
-
-            if self.get_lyrics:
-                with self.lyric_semaphore:
-                    self.save_lyrics(location)
-
+            with self.stats.stage("write_tags"):
+                if tags_from == TagType.SPOTIFY:
+                    self.update_metadata_from_spotify(lock, location, results)
+                elif tags_from == TagType.FINGERPRINTER:
+                    self.update_metadata_from_fingerprinter(lock, location, results)
+            self.record_manifest(path, location, tags_from, results)
+            self.record_index(path, location, tags_from, results)
+
+            if self.lyrics is not None:
+                self.lyrics.submit(location, lyrics_key(results, tags_from.name, metadata))
+
+            failed = False
             return None
         except ValueError as e:
             # logging.exception(e)
@@ -191,6 +275,13 @@ class MPORG:
         except Exception as e:
             logging.exception(e)
             return f"Unknown Exception processing file {os.path.join(root, file)}\n EXP {e}"
+        finally:
+            end = time.perf_counter_ns()
+            tag_source = tags_from.name if tags_from else None
+            self.stats.record_file(tag_source, failed, (end - start) / 1e9)
+            if tracer.enabled:
+                tracer.add_complete(str(file), "file", start, end,
+                                    {"path": str(root / file), "tag_source": tag_source, "failed": failed})
 
     def organize(self):
         """
@@ -198,56 +289,224 @@ class MPORG:
         :return:
         """
         logging.top("Organizing files...")
+        self.start_run()
         file_count = get_file_count(self.search)
 
         with tqdm(desc="Organizing", total=file_count, unit="file", miniters=0) as pbar:
             futures = []
             for root, file in file_generator(self.search):
-                if file.suffix.lower() not in SUPPORTED_FILETYPES:  # Skip all unrecognized files straight away
-                    logging.info(f"{str(file)} has unsupported type")
+                if not self.in_shard(root, file):
                     pbar.update(1)
                     continue
-                if (
-                    not self.pattern or self.pattern
-                    and any(item in file.suffix for item in self.pattern)
-                ):  # Check pattern
-                    future = self.executor.submit(self.process_file, (root, file))
+                if self.accepts(file):
+                    future = self.submit_file(root, file)
                     future.add_done_callback(lambda f: pool_callback(f.result(), pbar))
                     futures.append(future)
                 else:
-                    logging.info(f"{str(file)} does not match any pattern {self.pattern}")
                     pbar.update(1)
             wait(futures)
 
+        self.finish_run()
         logging.top("Organizing files finished.")
 
-    def get_metadata(self, metadata: Tagger, file: Path):
+    def start_run(self):
+        if self.af:
+            cpu_pool()  # Set up from the main thread rather than lazily from an organizer thread
+        self.stats.start()
+        if self.manifest:
+            self._manifest_file = open(self.manifest, "w", encoding="utf-8")
+
+    def finish_run(self):
+        """
+        Wait for background lyrics searches, then close the manifest and write the run summary
+        """
+        if self.lyrics is not None and self.lyrics.pending:
+            logging.info("Waiting for %d lyrics searches", self.lyrics.pending)
+            self.lyrics.join()
+
+        if self._manifest_file:
+            self._manifest_file.close()
+            self._manifest_file = None
+            logging.info("Run manifest written to %s", self.manifest)
+        self.stats.finish()
+        if self.summary:
+            self.stats.write(self.summary, **self.component_stats())
+
+    def accepts(self, file: Path) -> bool:
+        """
+        Whether a file is a supported type matching the pattern, counting it as discovered or skipped
+        :param Path file: File name or path
+        """
+        if file.suffix.lower() not in SUPPORTED_FILETYPES:  # Skip all unrecognized files straight away
+            logging.info("%s has unsupported type", file)
+            self.stats.count_discovered(skipped=True)
+            return False
+        if not self.pattern or self.pattern and any(item in file.suffix for item in self.pattern):  # Check pattern
+            self.stats.count_discovered()
+            return True
+        logging.info("%s does not match any pattern %s", file, self.pattern)
+        self.stats.count_discovered(skipped=True)
+        return False
+
+    def in_shard(self, root: Path, file: Path) -> bool:
+        """
+        Whether a file belongs to this run's shard. Files are keyed by their directory relative to the search path, so
+        an album's tracks stay together, or by their relative path
+        :param Path root: Directory of the file
+        :param Path file: File name
+        """
+        if self.shard is None:
+            return True
+        try:
+            directory = Path(root).relative_to(self.search)
+        except ValueError:
+            directory = Path(root)
+        key = directory if self.shard_by == "album" else directory / file
+        return shard_of(key.as_posix(), self.shard[1]) == self.shard[0]
+
+    def submit_file(self, root: Path, file: Path) -> Future:
+        """
+        Queue a file accepted by accepts() for processing, in its lane if prioritizing
+        :return: Future resolving to process_file's result
+        """
+        if self.scheduler is None:
+            return self.executor.submit(self.process_file, (root, file))
+        future = Future()
+        classified = self.classifier.submit(self.classify, root / file)
+        classified.add_done_callback(
+            lambda f: self.scheduler.submit(f.result(), self.process_file, (root, file), future=future))
+        return future
+
+    def classify(self, path: Path) -> str:
+        """
+        Guess from a file's tags how expensive it is to resolve
+        :param Path path: File to classify
+        :return: FAST_LANE if its tags hold a Spotify URL, FINGERPRINT_LANE if it lacks the artist or title to search
+                 for and fingerprinters are enabled, else SEARCH_LANE
+        """
+        try:
+            with self.stats.stage("classify"):
+                metadata = Tagger(path)
+        except Exception as e:
+            logging.debug("Cannot read tags of %s to classify it: %s", path, e)
+            return FINGERPRINT_LANE if self.af else SEARCH_LANE
+        if get_valid_spotify_url([metadata.get(tag) for tag in URL_TAGS]):
+            return FAST_LANE
+        if self.af and not (metadata.get("artist") and metadata.get("title")):
+            return FINGERPRINT_LANE
+        return SEARCH_LANE
+
+    def component_stats(self) -> dict:
+        """
+        Collect request and cache statistics from the searcher and fingerprinters for the run summary
+        :return: dict
+        """
+        sections = {}
+        stats = getattr(self.sh, "stats", None)
+        if callable(stats) and isinstance(searcher_stats := stats(), dict):
+            sections["spotify"] = searcher_stats
+        fingerprinters = {}
+        for fingerprinter in self.af:
+            cache = getattr(fingerprinter, "cache", None)
+            if callable(getattr(cache, "stats", None)) and isinstance(cache_stats := cache.stats(), dict):
+                fingerprinters[fingerprinter.name] = {"cache": cache_stats}
+        if fingerprinters:
+            sections["fingerprinters"] = fingerprinters
+        if self.lyrics is not None:
+            sections["lyrics"] = self.lyrics.stats()
+        if self.scheduler is not None:
+            sections["lanes"] = self.scheduler.stats()
+        return sections
+
+    def record_manifest(self, source: Path, destination: Path, tags_from: TagType, results: Track,
+                        spotify_id: str = None) -> None:
+        """
+        Append a file's outcome to the run manifest, if one is being written
+        :param source: Path of origin file
+        :param destination: Path the file was organized to
+        :param tags_from: Source of Tags
+        :param results: Track Object containing Metadata
+        :param spotify_id: Spotify track ID, taken from results if None
+        :return: None
+        """
+        if self._manifest_file is None:
+            return
+        entry = {
+            "source": str(source),
+            "destination": str(destination),
+            "tag_source": tags_from.name,
+            "spotify_id": spotify_id or spotify_id_of(tags_from, results),
+        }
+        with self._manifest_lock:
+            self._manifest_file.write(json.dumps(entry) + "\n")
+
+    def record_index(self, source: Path, destination: Path, tags_from: TagType, results: Track) -> None:
+        """
+        Record a file written to the store in the store index, if one is kept
+        :param source: Path of origin file
+        :param destination: Path the file was organized to
+        :param tags_from: Source of Tags
+        :param results: Track Object containing Metadata
+        :return: None
+        """
+        if self.index is None:
+            return
+        # Only a digest left by fingerprinting is recorded, hashing every file here would read it a second time. It
+        # matches the tagged copy only where tags are not hashed. `mporg index rebuild` fills in the rest
+        digest = digest_index().cached(source) if destination.suffix.lower() in TAGS_EXCLUDED else None
+        with self.stats.stage("index"):
+            self.index.record(destination, spotify_id_of(tags_from, results), digest, source.absolute(),
+                              tags_from.name)
+
+    def find_in_store(self, metadata: Tagger, file: Path) -> tuple[str | None, Path | None]:
+        """
+        Look a file's track up in the store index by its Spotify ID, taken from the Spotify URL in its tags or else
+        from a search that does not fetch the track's details
+        :param metadata: tagger object with original metadata of file
+        :param file: Path of origin file
+        :return: Spotify ID if one was found, and the file of the same format in the store holding the track if
+                 there is one
+        """
+        if self.index is None:
+            return None, None
+        spot_id = get_valid_spotify_url([metadata.get(tag) for tag in URL_TAGS])
+        if spot_id is None:
+            title, artist = get_search_terms(metadata)
+            if title and artist:
+                with self.stats.stage("spotify"):
+                    spot_id = self.sh.search_id("".join(title), artist)
+        if spot_id is None:
+            return None, None
+        for destination in self.index.find_spotify_id(spot_id):
+            if not os.path.exists(destination):  # Deleted or moved outside MPORG, organize the file again
+                logging.info("%s is indexed but no longer in the store", destination)
+                self.index.remove(destination)
+            elif destination.suffix.lower() == file.suffix.lower():
+                logging.info("%s is already in the store as %s", file, destination)
+                return spot_id, destination
+        return spot_id, None
+
+    def get_metadata(self, metadata: Tagger, file: Path, spotify_id: str = None):
         """
         Try to get metadata from Spotify, Audio Fingerprinting, or fall back to metadata provided by the file
         :param metadata: tagger object with original metadata of file
         :param file: Path of origin file
+        :param spotify_id: Spotify ID already found for the file by find_in_store, used instead of a search
         :return: Tuple of metadata results and the source of the metadata
         """
-        url_locs = []
-        for url in (metadata.get("comment"), metadata.get("commentNULL"), metadata.get("commentENG"), metadata.get("source"), metadata.get("url")):
-            url_locs.append(url)
-
-        if spot_id := get_valid_spotify_url(url_locs):
-            logging.info(f"A spotify Url was found in {file} metadata. Searching via id")
+        if spot_id := get_valid_spotify_url([metadata.get(tag) for tag in URL_TAGS]):
+            logging.info("A spotify Url was found in %s metadata. Searching via id", file)
             spotify_results = self.get_fingerprint_spotify_metadata(spot_id)
             return spotify_results, TagType.SPOTIFY
-        artist = ["".join(u.replace("\x00", "").split("/"))
-            for u in metadata.get("artist", "")]  # Replace Null Bytes
-        title = [u.replace("\x00", "") for u in metadata.get("title", "")]
-        if len(artist) == 1:
-            artist = "".join(artist)
-        if len(title) == 1:
-            title = "".join(title)
-
-        logging.info(f"Attempting to get metadata for {title} by {artist}")
-        spotify_results = self.search_spotify(title, artist)
+        title, artist = get_search_terms(metadata)
+
+        logging.info("Attempting to get metadata for %s by %s", title, artist)
+        if spotify_id:
+            spotify_results = self.get_fingerprint_spotify_metadata(spotify_id)
+        else:
+            spotify_results = self.search_spotify(title, artist)
         if spotify_results:
-            logging.info(f"Metadata found on Spotify for {title} by {artist}")
+            logging.info("Metadata found on Spotify for %s by %s", title, artist)
             logging.debug(spotify_results)
             return spotify_results, TagType.SPOTIFY
         if self.af:
@@ -258,41 +517,91 @@ class MPORG:
                         fingerprint_results.results.get("spotifyid")
                     )
                     if spotify_results:
-                        logging.info(
-                            f"Metadata found using audio fingerprinting and Spotify for ID:"
-                            f" {fingerprint_results.results.get('spotifyid')}"
-                        )
+                        logging.info("Metadata found using audio fingerprinting and Spotify for ID: %s",
+                                     fingerprint_results.results.get('spotifyid'))
                         logging.debug(spotify_results)
                         return spotify_results, TagType.SPOTIFY
                 else:
-                    logging.info(
-                        f"Metadata found using audio fingerprinting: {fingerprint_results.results.track_name}"
-                        f" by {fingerprint_results.results.track_artists}"
-                    )
+                    logging.info("Metadata found using audio fingerprinting: %s by %s",
+                                 fingerprint_results.results.track_name, fingerprint_results.results.track_artists)
                     logging.debug(fingerprint_results.results)
                     return fingerprint_results.results, TagType.FINGERPRINTER
         else:
             logging.debug("No Fingerprinters provided. Fingerprinting disabled")
 
-        logging.info(f"No Metadata found for {file}")
+        logging.info("No Metadata found for %s", file)
         return None, TagType.METADATA
 
     def search_spotify(self, title: str, artist: str) -> Track:
         results = None
         if title and artist:
-            results = self.sh.search(name="".join(title), artist=artist)
-            logging.info(f"Spotify Results: {results}")
+            with self.stats.stage("spotify"):
+                results = self.sh.search(name="".join(title), artist=artist)
+            logging.info("Spotify Results: %s", results)
         return results
 
     def get_fingerprint_metadata(self, file: Path) -> FingerprintResult | None:
+        if self.fingerprint_executor is not None:
+            return self.get_hedged_fingerprint_metadata(file)
         for fingerprinter in self.af:
-            results = fingerprinter.fingerprint(file)
+            results = self.run_fingerprinter(fingerprinter, file)
             if results.code == 0:
                 return results
         return None
 
+    def run_fingerprinter(self, fingerprinter: Fingerprinter, file: Path) -> FingerprintResult:
+        with self.stats.stage(f"fingerprint:{fingerprinter.name}", "fingerprint"):
+            return fingerprinter.fingerprint(file)
+
+    def get_hedged_fingerprint_metadata(self, file: Path) -> FingerprintResult | None:
+        """
+        Query the fingerprinters concurrently. The first one starts right away, each next one once the previous
+        ones failed or hedge_delay seconds passed without a match. The first match wins, matches arriving together
+        are chosen by fingerprinter order. Fingerprinters not started yet are cancelled, running ones are left to
+        finish in the background and their results are discarded.
+        :param Path file: File to fingerprint
+        :return: FingerprintResult or None
+        """
+        pending = {}  # Future -> priority
+        started = 0
+
+        def start_next():
+            nonlocal started
+            future = self.fingerprint_executor.submit(self.run_fingerprinter, self.af[started], file)
+            pending[future] = started
+            started += 1
+
+        start_next()
+        try:
+            while pending:
+                hedge = started < len(self.af)
+                done, _ = wait(pending, timeout=self.hedge_delay if hedge else None, return_when=FIRST_COMPLETED)
+                if not done:  # Nothing yet, hedge with the next fingerprinter
+                    start_next()
+                    continue
+
+                matches = []
+                for future in done:
+                    priority = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logging.warning("Fingerprinter %s failed on %s: %s", self.af[priority].name, file, e)
+                        continue
+                    if results.code == 0:
+                        matches.append((priority, results))
+                if matches:
+                    return min(matches, key=lambda match: match[0])[1]
+                if not pending and started < len(self.af):
+                    start_next()
+            return None
+        finally:
+            for future in pending:
+                future.cancel()
+
     def get_fingerprint_spotify_metadata(self, spotify_id: str) -> Track | None:
-        results = self.sh.search(spot_id=spotify_id)
+        with self.stats.stage("spotify"):
+            results = self.sh.search(spot_id=spotify_id)
         if results:
             return results
         return None
@@ -310,100 +619,11 @@ class MPORG:
         """
         ext = file.suffix
         if tags_from == TagType.SPOTIFY:
-            return self.spotify_location(results, ext)
+            return spotify_location(self.store, results, ext)
         elif tags_from == TagType.FINGERPRINTER:
-            return self.fingerprinter_location(results, ext)
+            return fingerprinter_location(self.store, results, ext)
         elif tags_from == TagType.METADATA:
-            return self.metadata_location(metadata, ext, file)
-
-    def spotify_location(self, results: Track, ext: str) -> Path:
-        album_artist, album_name, track_artist, track_name = _sanitize_results(
-            self.store, results
-        )
-
-        return (
-            self.store
-            / album_artist
-            / f"{results.album_year} - {album_name.strip()}"
-            / f"{results.track_number}. - {track_artist} - {track_name}{ext}"
-        )
-
-    def fingerprinter_location(self, results: Track, ext: str) -> Path:
-        album_artist, album_name, track_artist, track_name = _sanitize_results(
-            self.store, results
-        )
-
-        return (
-            self.store
-            / album_artist
-            / (
-                f"{results.track_year} - " + f"{album_name}"
-                if results.track_year
-                else f"{album_name}"
-            )
-            / f"{track_artist} - {track_name}{ext}"
-        )
-
-    def metadata_location(
-        self, metadata: Tagger, file_extension: str, file: Path
-    ) -> Path:
-        title = metadata.get("title")
-        artist = metadata.get("artist")
-        album = metadata.get("album")
-
-        if not all((title, artist, album)):
-            logging.warning(
-                f"Cannot find enough metadata to organize '{str(file)}' ..."
-            )
-            return self.store / "_TaggingImpossible" / file
-
-        track_artist = ", ".join(artist).strip()
-        year = "".join(metadata.get("date", "")).strip()
-        album = "".join(metadata.get("album", "")).strip()
-        track = "".join(metadata.get("title", "")).strip()
-        track_num = "".join(metadata.get("tracknumber", ["1"]))
-        artist = [a.replace("/", ", ").strip() for a in metadata.get("artist", [])]
-        # MP4 files get artists as '/' separated strings, split them apart here
-        # If the artist name actually has '/', sorry
-
-        if (
-            title
-            and artist
-            and metadata.get("album")
-            and not metadata.get("albumartist")
-        ):
-            album_artist = ", ".join(artist).strip()  # Use artist instead
-        else:
-            album_artist = ", ".join(metadata.get("albumartist", [])).strip()
-
-        # Build path using pathlib
-        path = self.store / _remove_invalid_path_chars(album_artist)
-        if year:
-            if isinstance(year, str):
-                path /= f"{_remove_invalid_path_chars(year)} - {_remove_invalid_path_chars(album)}"
-            else:
-                path /= f"{year} - {_remove_invalid_path_chars(album)}"
-        else:
-            path /= _remove_invalid_path_chars(album)
-
-        parts = []
-        # Build filename
-        if track_num:
-            if isinstance(
-                track_num, str
-            ):  # Prob in form num / total so remove the /total
-                parts.append(
-                    f"{int(_remove_invalid_path_chars(track_num.split('/')[0]))}."
-                )
-            else:
-                parts.append(f"{track_num}.")
-        if track_artist and track_artist != "Unknown":
-            parts.append(_remove_invalid_path_chars(track_artist))
-        if track:
-            parts.append(_remove_invalid_path_chars(track))
-
-        path /= f'{" - ".join(parts)}{file_extension}'
-        return path
+            return metadata_location(self.store, metadata, ext, file)
 
     @wait_if_locked(10)
     def copy_file(self, source: Path, destination: Path) -> None:
@@ -414,7 +634,7 @@ class MPORG:
         :return:
         """
         if not os.path.exists(destination):
-            logging.info(f"Copying {source} to {destination}")
+            logging.info("Copying %s to %s", source, destination)
 
             retries = 3  # Maximum number of retries
             for _ in range(retries):
@@ -423,12 +643,15 @@ class MPORG:
                     shutil.copyfile(source, destination)
                     break  # Copying succeeded, exit the loop
                 except (OSError, IOError) as e:
-                    logging.warning(f"Error copying file: {e}")
+                    logging.warning("Error copying file: %s", e)
                     time.sleep(1)  # Wait for 1 second before retrying
             else:
-                logging.error(f"Failed to copy file after {retries} retries: {source}")
+                logging.error("Failed to copy file after %s retries: %s", retries, source)
+                return
+            with suppress(OSError):
+                self.stats.count_bytes_copied(os.path.getsize(destination))
         else:
-            logging.info(f"Destination file already exists:{source} -> {destination}")
+            logging.info("Destination file already exists:%s -> %s", source, destination)
 
     def get_lock(self, path: Path) -> Lock:
         if path not in self.file_locks:
@@ -449,7 +672,7 @@ class MPORG:
         try:
             metadata = Tagger(location)
         except Exception as e:
-            logging.exception(f"Error getting metadata for update {e} ")
+            logging.exception("Error getting metadata for update %s ", e)
             raise e
         metadata.set("title", results.track_name)
         metadata.set("artist", results.track_artists)
@@ -489,7 +712,7 @@ class MPORG:
         try:
             metadata = Tagger(location)
         except Exception as e:
-            logging.exception(f"Error getting metadata for update {e} ")
+            logging.exception("Error getting metadata for update %s ", e)
             raise e
         metadata.set("title", results.track_name)
         metadata.set("artist", results.track_artists)
@@ -509,38 +732,18 @@ class MPORG:
 
         save_metadata(metadata)
 
-    def save_lyrics(self, location: Path):
+    def save_lyrics(self, location: Path, t: str, lyrics: str):
         """
-        Search for a songs lyrics. Save the lyrics alongside the file if it is found
-        :param Path location: Path to file to search for lyrics for
+        Save lyrics alongside a file, replacing an outdated lyrics file
+        :param Path location: Path to file the lyrics are for
+        :param str t: Lyric type, the extension of the lyrics file (txt or lrc)
+        :param str lyrics: Lyrics
         :return: None
-        :raises Timout Error: - Timout Occurred writing lyrics
-        :raises Exception: - An Unspecified Error occurred obtaining lyrics
         """
-        # Get Lyrics if available
-        lock = self.get_lock(location)
-
         retry_limit = 5
         retry_delay = 2  # seconds
 
-        lyrics = None
-        t = None
-        for _ in range(retry_limit):
-            try:
-                logging.info(f"Searching for lyrics for {location}")
-                t, lyrics = search_lyrics_by_file(location, lrc=True)
-                break
-            except Exception as e:
-                logging.info(f"{e}, {_}")
-                time.sleep(retry_delay)
-                if _ >= retry_limit - 1:
-                    raise e
-                continue
-
-        if not lyrics:
-            return None
-
-        logging.info(f"Lyrics found for {location}. Type {t}.")
+        logging.info("Lyrics found for %s. Type %s.", location, t)
         lyric_file = location.parent
         filename = location.stem
         destination = lyric_file / (filename + "." + t)
@@ -556,24 +759,22 @@ class MPORG:
 
             for file in existing:
                 if file.exists():
-                    logging.info(
-                        f"A lyrics file already exists for {location}, check if current."
-                    )
+                    logging.info("A lyrics file already exists for %s, check if current.", location)
                     with open(file, "r", encoding="utf-8") as f:
                         if not lyrics == f.read():
-                            logging.info(f"Deleting {file}")
+                            logging.info("Deleting %s", file)
                             try:
                                 file.unlink()
                             except Exception as e:
                                 logging.exception(e)
                                 logging.error("Error Unlinking file. Try to Ignore")
                         else:
-                            logging.info(f"{file} is current")
+                            logging.info("%s is current", file)
                             return
 
         for _ in range(retry_limit):
             try:
-                logging.info(f"Writing Lyrics file: {destination}")
+                logging.info("Writing Lyrics file: %s", destination)
                 with acquire(destination_lock, timeout=30):
                     with open(destination, "w", encoding="utf-8") as f:
                         f.write(lyrics)
@@ -586,7 +787,7 @@ class MPORG:
                 continue
 
                 # Retry limit reached for destination lock, file operations failed
-        logging.error(f"Failed to acquire destination lock for {destination}")
+        logging.error("Failed to acquire destination lock for %s", destination)
 
         # Retry limit reached for location lock, file operations failed
         # logging.error(f"Failed to acquire location lock for {location}")
@@ -666,12 +867,138 @@ def _sanitize_results(root: Path, results: Track) -> (str, str, str, str):
     return album_artist, album_name, track_artist, track_name
 
 
+def spotify_location(store: Path, results: Track, ext: str) -> Path:
+    """
+    :return: Where a file tagged from Spotify goes in store
+    """
+    album_artist, album_name, track_artist, track_name = _sanitize_results(
+        store, results
+    )
+
+    return (
+        store
+        / album_artist
+        / f"{results.album_year} - {album_name.strip()}"
+        / f"{results.track_number}. - {track_artist} - {track_name}{ext}"
+    )
+
+
+def fingerprinter_location(store: Path, results: Track, ext: str) -> Path:
+    """
+    :return: Where a file tagged from a fingerprinter goes in store
+    """
+    album_artist, album_name, track_artist, track_name = _sanitize_results(
+        store, results
+    )
+
+    return (
+        store
+        / album_artist
+        / (
+            f"{results.track_year} - " + f"{album_name}"
+            if results.track_year
+            else f"{album_name}"
+        )
+        / f"{track_artist} - {track_name}{ext}"
+    )
+
+
+def metadata_location(
+    store: Path, metadata: Tagger, file_extension: str, file: Path
+) -> Path:
+    """
+    :return: Where a file organized by its own tags goes in store, under _TaggingImpossible if they are not enough
+    """
+    title = metadata.get("title")
+    artist = metadata.get("artist")
+    album = metadata.get("album")
+
+    if not all((title, artist, album)):
+        logging.warning("Cannot find enough metadata to organize '%s' ...", file)
+        return store / "_TaggingImpossible" / file
+
+    track_artist = ", ".join(artist).strip()
+    year = "".join(metadata.get("date", "")).strip()
+    album = "".join(metadata.get("album", "")).strip()
+    track = "".join(metadata.get("title", "")).strip()
+    track_num = "".join(metadata.get("tracknumber", ["1"]))
+    artist = [a.replace("/", ", ").strip() for a in metadata.get("artist", [])]
+    # MP4 files get artists as '/' separated strings, split them apart here
+    # If the artist name actually has '/', sorry
+
+    if (
+        title
+        and artist
+        and metadata.get("album")
+        and not metadata.get("albumartist")
+    ):
+        album_artist = ", ".join(artist).strip()  # Use artist instead
+    else:
+        album_artist = ", ".join(metadata.get("albumartist", [])).strip()
+
+    # Build path using pathlib
+    path = store / _remove_invalid_path_chars(album_artist)
+    if year:
+        if isinstance(year, str):
+            path /= f"{_remove_invalid_path_chars(year)} - {_remove_invalid_path_chars(album)}"
+        else:
+            path /= f"{year} - {_remove_invalid_path_chars(album)}"
+    else:
+        path /= _remove_invalid_path_chars(album)
+
+    parts = []
+    # Build filename
+    if track_num:
+        if isinstance(
+            track_num, str
+        ):  # Prob in form num / total so remove the /total
+            parts.append(
+                f"{int(_remove_invalid_path_chars(track_num.split('/')[0]))}."
+            )
+        else:
+            parts.append(f"{track_num}.")
+    if track_artist and track_artist != "Unknown":
+        parts.append(_remove_invalid_path_chars(track_artist))
+    if track:
+        parts.append(_remove_invalid_path_chars(track))
+
+    path /= f'{" - ".join(parts)}{file_extension}'
+    return path
+
+
+def get_search_terms(metadata) -> tuple:
+    """
+    :param metadata: Tagger or dict with a file's tags
+    :return: Title and artist to search Spotify for, strings if the file has one of each, else lists
+    """
+    artist = ["".join(u.replace("\x00", "").split("/"))
+              for u in metadata.get("artist", "")]  # Replace Null Bytes
+    title = [u.replace("\x00", "") for u in metadata.get("title", "")]
+    if len(artist) == 1:
+        artist = "".join(artist)
+    if len(title) == 1:
+        title = "".join(title)
+    return title, artist
+
+
+def spotify_id_of(tags_from: TagType, results: Track) -> str | None:
+    """
+    :return: Spotify track ID of a file tagged from Spotify, else None
+    """
+    if tags_from == TagType.SPOTIFY and results:
+        return results.track_id or get_valid_spotify_url([results.track_url])
+    return None
+
+
 def get_valid_spotify_url(strings):
     spotify_track_url = "https://open.spotify.com/track/"
 
     for string in strings:
-        if string and spotify_track_url in "".join(string):
-            track_id = "".join(string).replace(spotify_track_url, "")
+        if string and not isinstance(string, str):
+            # MP3 comments are read as (lang, desc, text) tuples
+            string = "".join(s[-1] if isinstance(s, tuple) else s for s in string)
+        if string and spotify_track_url in string:
+            track_id = string.replace(spotify_track_url, "")
             track_id = track_id.split("?")[0]  # Remove any trailing params
             return track_id
 
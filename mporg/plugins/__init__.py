@@ -1,4 +1,12 @@
+from enum import Enum
+
 from mporg import CONFIG_DIR
 PLUGIN_DIR = CONFIG_DIR / "plugins"
 
 FINGERPRINTER_DIR = PLUGIN_DIR / "FingerprinterPlugins"
+
+
+class PluginType(Enum):
+    FINGERPRINTER = "FingerprinterPlugins"
+    SEARCHER = "SearcherPlugins"
+    LYRICS = "LyricsPlugins"
@@ -1,13 +1,17 @@
-import importlib
+import importlib.util
 import inspect
+import json
 import sys
 import logging
+import threading
 from pathlib import Path
 
-from mporg.audio_fingerprinter import Fingerprinter
+from mporg import CONFIG_DIR
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
 from mporg.credentials.providers import CredentialProvider
-from mporg.plugins import FINGERPRINTER_DIR, PLUGIN_DIR
-from mporg.plugins.util import PluginType, Plugin
+from mporg.plugins import FINGERPRINTER_DIR, PLUGIN_DIR, PluginType
+from mporg.plugins.registry import RegistryEntry, get_registry
+from mporg.plugins.util import Plugin
 
 
 def get_class_by_pattern(module, pattern):
@@ -16,66 +20,187 @@ def get_class_by_pattern(module, pattern):
     return matching
 
 
+def plugin_from_file(file: Path) -> Plugin | None:
+    """
+    Import a plugin module and return its fingerprinter and credential provider classes
+    :param Path file: *Plugin.py module
+    :return: Plugin, or None if the module could not be loaded
+    """
+    module_name = file.stem
+    plugin_name = module_name.replace("Plugin", "")
+    logging.debug(f"Loading fingerprinter {plugin_name} from {file}")
+
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, FINGERPRINTER_DIR / file)
+        # module = SourceFileLoader(module_name, FINGERPRINTER_DIR / file).load_module()
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+
+        fingerprinter = getattr(module, plugin_name)
+        # Only the module's own provider, not CredentialProvider itself or others it imports
+        cred = next((cls for cls in get_class_by_pattern(module, "CredentialProvider")
+                     if cls.__module__ == module_name), None)
+
+        fingerprinter_valid = issubclass(fingerprinter, Fingerprinter)
+        logging.debug(f"Fingerprinter valid: {fingerprinter_valid}")
+
+        if cred:
+            credential_provider_valid = issubclass(cred, CredentialProvider)
+            logging.debug(f"CredentialProvider valid: {credential_provider_valid}")
+        else:
+            credential_provider_valid = True
+
+        if not fingerprinter_valid and credential_provider_valid:
+            logging.warning(f"Invalid Fingerprinter or CredentialProvider")
+            raise Exception("Invalid Fingerprinter or CredentialProvider")
+
+        logging.debug(f"Loaded fingerprinter {plugin_name} from {file}")
+        return Plugin(fingerprinter, cred)
+    except (ModuleNotFoundError, AttributeError) as e:
+        logging.error(f"Error loading plugin {plugin_name}: {e}")
+        return None
+
+
+class LazyPlugin:
+    """
+    A registered plugin. Its module is only imported when load() is first called.
+    """
+    def __init__(self, entry: RegistryEntry, plugin_dir: Path = None):
+        self.entry = entry
+        self.path = (plugin_dir or PLUGIN_DIR) / entry.entry_point
+        self._plugin = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.entry.name
+
+    @property
+    def loaded(self) -> bool:
+        return self._plugin is not None
+
+    def load(self) -> Plugin:
+        """
+        Import the plugin module, once
+        :return: Plugin
+        :raises ImportError: The module could not be loaded
+        """
+        with self._lock:
+            if self._plugin is None:
+                self._plugin = plugin_from_file(self.path)
+                if self._plugin is None:
+                    raise ImportError(f"Plugin {self.name} could not be loaded from {self.path}")
+            return self._plugin
+
+    def saved_credentials(self) -> dict | None:
+        """
+        Read the plugin's saved credentials without importing it
+        :return: Saved credentials, {} if the plugin needs none, None if it needs some but none are saved
+        """
+        if not self.entry.provider:
+            return {}
+        if not self.entry.provider_config:
+            return None
+        try:
+            with open(CONFIG_DIR / self.entry.provider_config, "r", encoding="utf-8") as f:
+                return json.load(f) or None
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def fingerprinter(self, credentials: dict = None, offline: bool = False, verified: bool = False) -> "LazyFingerprinter":
+        return LazyFingerprinter(self, credentials, offline, verified)
+
+
+class LazyFingerprinter(Fingerprinter):
+    """
+    Stands in for a plugin's fingerprinter, importing and creating it when the first file needs it.
+    If that fails the plugin is disabled for the rest of the run.
+    """
+    def __init__(self, plugin: LazyPlugin, credentials: dict = None, offline: bool = False, verified: bool = False):
+        self.plugin = plugin
+        self.credentials = credentials or {}
+        self.offline = offline
+        self.verified = verified
+        self._fingerprinter = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.plugin.name
+
+    def _create(self) -> Fingerprinter | None:
+        with self._lock:
+            if self._fingerprinter is None and not self._failed:
+                try:
+                    plugin = self.plugin.load()
+                    if plugin.provider is not None and not (self.offline or self.verified):
+                        provider = plugin.provider(CONFIG_DIR / plugin.provider.CONFIG_NAME)
+                        if not (provider.verify_spec(self.credentials) and provider.verify_credentials(self.credentials)):
+                            raise ValueError(f"Saved {plugin.provider.PNAME} credentials are invalid, delete "
+                                             f"{provider.credential_file} to enter them again")
+                    fingerprinter = plugin.plugin(self.credentials) if plugin.provider else plugin.plugin()
+                    fingerprinter.offline = self.offline
+                    self._fingerprinter = fingerprinter
+                except Exception as e:
+                    logging.error(f"Disabling fingerprinter {self.name}: {e}")
+                    self._failed = True
+            return self._fingerprinter
+
+    def fingerprint(self, path_to_fingerprint: Path) -> FingerprintResult:
+        fingerprinter = self._create()
+        if fingerprinter is None:
+            return FingerprintResult(code=11, type="fail")  # The plugin could not be loaded
+        return fingerprinter.fingerprint(path_to_fingerprint)
+
+    def __getattr__(self, item):
+        # Only reached for attributes LazyFingerprinter lacks, such as the plugin's cache. Never triggers a load
+        fingerprinter = self.__dict__.get("_fingerprinter")
+        if fingerprinter is None:
+            raise AttributeError(item)
+        return getattr(fingerprinter, item)
+
+
 class PluginLoader:
-    def __init__(self):
+    def __init__(self, plugin_dir: Path = None):
+        self.plugin_dir = plugin_dir or PLUGIN_DIR
         self.plugins = {}
         self.cred_managers = {}
         self.fingerprinters = {}
+        self._registry = None
 
-    def fingerprinter_from_file(self, file: Path):
-        module_name = file.stem
-        plugin_name = module_name.replace("Plugin", "")
-        logging.debug(f"Loading fingerprinter {plugin_name} from {file}")
-
-        try:
-            spec = importlib.util.spec_from_file_location(module_name, FINGERPRINTER_DIR / file)
-            # module = SourceFileLoader(module_name, FINGERPRINTER_DIR / file).load_module()
-            module = importlib.util.module_from_spec(spec)
-            sys.modules[module_name] = module
-            spec.loader.exec_module(module)
-
-            fingerprinter = getattr(module, plugin_name)
-            cred = get_class_by_pattern(module, "CredentialProvider")[0]
-
-            fingerprinter_valid = issubclass(fingerprinter, Fingerprinter)
-            logging.debug(f"Fingerprinter valid: {fingerprinter_valid}")
+    @property
+    def registry(self) -> dict[str, RegistryEntry]:
+        if self._registry is None:
+            self._registry = get_registry(self.plugin_dir)
+        return self._registry
 
-            if cred:
-                credential_provider_valid = issubclass(cred, CredentialProvider)
-                logging.debug(f"CredentialProvider valid: {credential_provider_valid}")
-            else:
-                credential_provider_valid = True
-
-            if not fingerprinter_valid and credential_provider_valid:
-                logging.warning(f"Invalid Fingerprinter or CredentialProvider")
-                raise Exception("Invalid Fingerprinter or CredentialProvider")
-
-            self.fingerprinters[plugin_name] = Plugin(fingerprinter, cred)
-            logging.debug(f"Loaded fingerprinter {plugin_name} from {file}")
-        except (ModuleNotFoundError, AttributeError) as e:
-            print(e)
+    def fingerprinter_from_file(self, file: Path):
+        """
+        Import a plugin module right away and add it to fingerprinters
+        """
+        plugin = plugin_from_file(file)
+        if plugin is not None:
+            self.fingerprinters[file.stem.replace("Plugin", "")] = plugin
 
     def load_plugin(self, plugin_type: PluginType, plugin_name: str):
-        if FINGERPRINTER_DIR.exists():
-            print(FINGERPRINTER_DIR)
-
-        files = [f for f in (PLUGIN_DIR / plugin_type.value).rglob("*Plugin.py")]
-
+        """
+        Add the registered plugin whose entry point matches plugin_name. Its module is imported on first use
+        """
         fil_name = plugin_name.lower().strip()
-        file = [f for f in files if fil_name in str(f).lower().strip()][0]
+        entries = [e for e in self.registry.values() if e.type == plugin_type.value and fil_name in e.entry_point.lower()]
+        if not entries:
+            raise ValueError(f"No {plugin_type.value} plugin matching {plugin_name} is installed")
 
         if plugin_type == PluginType.FINGERPRINTER:
-            self.fingerprinter_from_file(file)
+            self.fingerprinters[entries[0].name] = LazyPlugin(entries[0], self.plugin_dir)
 
     def load_all_fingerprinters(self):
-        if FINGERPRINTER_DIR.exists():
-            print(FINGERPRINTER_DIR)
-
-        fingerprinter_files = list(FINGERPRINTER_DIR.rglob("*Plugin.py"))
-        for file in fingerprinter_files:
-            self.fingerprinter_from_file(file)
-
-        print(self.fingerprinters)
+        for entry in self.registry.values():
+            if entry.type == PluginType.FINGERPRINTER.value:
+                self.fingerprinters[entry.name] = LazyPlugin(entry, self.plugin_dir)
+        logging.debug(f"Fingerprinters: {list(self.fingerprinters)}")
 
 
 if __name__ == "__main__":
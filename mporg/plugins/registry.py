@@ -0,0 +1,217 @@
+import ast
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from mporg import VERSION
+from mporg.plugins import PLUGIN_DIR, PluginType
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+REGISTRY_NAME = "registry.json"
+REGISTRY_VERSION = 1
+ENTRY_POINT_PATTERN = "*Plugin.py"
+
+
+@dataclass
+class RegistryEntry:
+    """
+    Everything needed to offer a plugin without importing it
+    """
+    name: str  # Name of the plugin class, the entry point's name without "Plugin"
+    type: str  # PluginType value
+    directory: str  # Plugin directory name, as used by the default plugin URLs
+    entry_point: str  # Path of the *Plugin.py module relative to PLUGIN_DIR
+    sha256: str
+    size: int
+    mtime_ns: int
+    version: str = None  # From plugin.json
+    provider: str = None  # Name of the CredentialProvider class, if the plugin has one
+    provider_name: str = None  # Its PNAME
+    provider_config: str = None  # Its CONFIG_NAME
+
+
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _class_constants(node: ast.ClassDef) -> dict:
+    constants = {}
+    for item in node.body:
+        if (isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name)
+                and isinstance(item.value, ast.Constant)):
+            constants[item.targets[0].id] = item.value.value
+    return constants
+
+
+def scan_entry_point(path: Path, plugin_dir: Path) -> RegistryEntry | None:
+    """
+    Describe a plugin module by parsing it, without running any of its code
+    :param Path path: *Plugin.py module
+    :param Path plugin_dir: Root of the plugin directories
+    :return: RegistryEntry, or None if the module does not define its plugin class
+    """
+    source = path.read_bytes()
+    try:
+        tree = ast.parse(source, filename=str(path))
+    except SyntaxError as e:
+        logging.warning(f"Cannot parse plugin {path}: {e}")
+        return None
+
+    name = path.stem.replace("Plugin", "")
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    if name not in classes:
+        logging.warning(f"Plugin {path} does not define {name}, skipping it")
+        return None
+
+    provider = next((cls for cls in classes if "CredentialProvider" in cls), None)
+    constants = _class_constants(classes[provider]) if provider else {}
+
+    relative = path.relative_to(plugin_dir)
+    version = None
+    if (manifest := path.parent / "plugin.json").exists():
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                version = json.load(f).get("version")
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    stat = path.stat()
+    return RegistryEntry(
+        name=name,
+        type=relative.parts[0],
+        directory=relative.parts[1] if len(relative.parts) > 2 else name,
+        entry_point=relative.as_posix(),
+        sha256=hashlib.sha256(source).hexdigest(),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        version=version,
+        provider=provider,
+        provider_name=constants.get("PNAME"),
+        provider_config=constants.get("CONFIG_NAME"),
+    )
+
+
+def _directory_stamps(plugin_dir: Path) -> dict:
+    """
+    Modification times of the plugin type directories and every plugin directory, which change when plugins or
+    their modules are added or removed
+    """
+    stamps = {}
+    for plugin_type in PluginType:
+        type_dir = plugin_dir / plugin_type.value
+        if not type_dir.is_dir():
+            continue
+        stamps[plugin_type.value] = type_dir.stat().st_mtime_ns
+        for entry in os.scandir(type_dir):
+            if entry.is_dir():
+                stamps[f"{plugin_type.value}/{entry.name}"] = entry.stat().st_mtime_ns
+    return stamps
+
+
+def build_registry(plugin_dir: Path = None) -> dict[str, RegistryEntry]:
+    """
+    Scan the plugin directories and write the registry
+    :param plugin_dir: Root of the plugin directories, PLUGIN_DIR if None
+    :return: Dict of plugin name to RegistryEntry
+    """
+    plugin_dir = plugin_dir or PLUGIN_DIR
+    entries = {}
+    for plugin_type in PluginType:
+        for path in sorted((plugin_dir / plugin_type.value).rglob(ENTRY_POINT_PATTERN)):
+            if entry := scan_entry_point(path, plugin_dir):
+                entries[entry.name] = entry
+
+    _write_registry(plugin_dir, _directory_stamps(plugin_dir), entries)
+    return entries
+
+
+def _write_registry(plugin_dir: Path, directories: dict, entries: dict[str, RegistryEntry]):
+    registry = {
+        "registry": REGISTRY_VERSION,
+        "mporg": VERSION,
+        "directories": directories,
+        "plugins": [asdict(entry) for entry in entries.values()],
+    }
+    try:
+        plugin_dir.mkdir(0o777, parents=True, exist_ok=True)
+        temp = plugin_dir / (REGISTRY_NAME + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(temp, plugin_dir / REGISTRY_NAME)
+        logging.debug(f"Plugin registry written with {len(entries)} plugins")
+    except OSError as e:
+        logging.warning(f"Could not write the plugin registry: {e}")
+
+
+def _entry_current(entry: RegistryEntry, plugin_dir: Path) -> bool:
+    """
+    Whether a plugin module is unchanged since its entry was written. The entry takes the new modification time of
+    a module that was touched but not changed, so it is not hashed again next time
+    """
+    path = plugin_dir / entry.entry_point
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns:
+        return True
+    if stat.st_size == entry.size and file_hash(path) == entry.sha256:  # Touched, but unchanged
+        entry.mtime_ns = stat.st_mtime_ns
+        return True
+    return False
+
+
+def load_registry(plugin_dir: Path = None) -> dict[str, RegistryEntry] | None:
+    """
+    Read the registry, if it still matches the plugin directories
+    :param plugin_dir: Root of the plugin directories, PLUGIN_DIR if None
+    :return: Dict of plugin name to RegistryEntry, or None if the registry is missing or out of date
+    """
+    plugin_dir = plugin_dir or PLUGIN_DIR
+    try:
+        with open(plugin_dir / REGISTRY_NAME, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+        if registry.get("registry") != REGISTRY_VERSION:
+            return None
+        entries = {data["name"]: RegistryEntry(**data) for data in registry["plugins"]}
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+    if registry.get("directories") != _directory_stamps(plugin_dir):
+        logging.debug("Plugin directories changed since the registry was written")
+        return None
+    mtimes = {name: entry.mtime_ns for name, entry in entries.items()}
+    if not all(_entry_current(entry, plugin_dir) for entry in entries.values()):
+        logging.debug("A plugin module changed since the registry was written")
+        return None
+    if any(entry.mtime_ns != mtimes[name] for name, entry in entries.items()):
+        _write_registry(plugin_dir, registry["directories"], entries)
+    return entries
+
+
+def get_registry(plugin_dir: Path = None) -> dict[str, RegistryEntry]:
+    """
+    Read the registry, rebuilding it first if it is out of date
+    :param plugin_dir: Root of the plugin directories, PLUGIN_DIR if None
+    :return: Dict of plugin name to RegistryEntry
+    """
+    entries = load_registry(plugin_dir)
+    if entries is None:
+        entries = build_registry(plugin_dir)
+    return entries
+
+
+def invalidate_registry(plugin_dir: Path = None):
+    """
+    Remove the registry so the next run scans the plugin directories again
+    """
+    try:
+        os.remove((plugin_dir or PLUGIN_DIR) / REGISTRY_NAME)
+    except FileNotFoundError:
+        pass
@@ -2,7 +2,6 @@ import json
 import subprocess
 from tempfile import TemporaryDirectory
 from dataclasses import dataclass
-from enum import Enum
 from pathlib import Path
 import logging
 import rich
@@ -11,7 +10,8 @@ import requests
 from rich.markdown import Markdown
 
 from mporg.credentials.providers import CredentialProvider
-from mporg.plugins import PLUGIN_DIR
+from mporg.plugins import PLUGIN_DIR, PluginType
+from mporg.plugins.registry import invalidate_registry, load_registry
 
 
 @dataclass
@@ -32,12 +32,6 @@ class PluginInfo:
     url: str = None
 
 
-class PluginType(Enum):
-    FINGERPRINTER = "FingerprinterPlugins"
-    SEARCHER = "SearcherPlugins"
-    LYRICS = "LyricsPlugins"
-
-
 default_plugin_urls = {
     PluginType.FINGERPRINTER: "https://raw.githubusercontent.com/"
                               "Drag-3/MPORG/master/plugins/FingerprinterPlugins/MBFingerprinter/plugin.json",
@@ -176,6 +170,7 @@ def install_plugin(source: str):
 
         install_plugin_dependencies(plugin)
         install_plugin_modules(plugin)
+        invalidate_registry()
         logging.info(f"Plugin {plugin.name} installed successfully.")
         return True
     except Exception as e:
@@ -191,6 +186,7 @@ def delete_plugin(plugin_dir: Path):
     :param plugin_dir:
     :return:
     """
+    invalidate_registry()
     try:
         if plugin_dir.exists():
             if plugin_dir.is_file():
@@ -257,6 +253,15 @@ def setup_and_check_plugins():
     if not PLUGIN_DIR.exists():
         PLUGIN_DIR.mkdir(0o777, parents=True, exist_ok=True)
 
+    # A current registry listing the default plugins means their files are all in place
+    registry = load_registry()
+    if registry is not None:
+        registered = {(entry.type, entry.directory) for entry in registry.values() if entry.version is not None}
+        if all((plugin_type.value, url.split("/")[-2]) in registered
+               for plugin_type, url in default_plugin_urls.items()):
+            logging.debug("Default plugins found in the plugin registry.")
+            return
+
     # Verify default plugins
     check_default_plugins()
     logging.info("Default plugins verified.")
@@ -287,6 +292,7 @@ def check_plugin_updates(force = False):
                     delete_plugin(plugin.dir)
                     # Move the new plugin directory to the old plugin directory's location
                     temp_dir.rename(plugin.dir)
+                    invalidate_registry()
                     logging.info(f"Plugin {plugin.name} updated successfully.")
                 else:
                     logging.error(f"Error updating plugin {plugin.name}. Previous version retained.")
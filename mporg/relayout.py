@@ -0,0 +1,193 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import mutagen
+
+from mporg.organizer import (SUPPORTED_FILETYPES, URL_TAGS, TagType, fingerprinter_location, get_valid_spotify_url,
+                             metadata_location, spotify_location)
+from mporg.types import Tagger, Track
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+SIDECAR_TYPES = ("lrc", "txt")  # Extensions of the lyrics files saved next to organized files
+
+
+@dataclass(frozen=True)
+class Move:
+    source: Path
+    destination: Path
+
+
+def _first(metadata: Tagger, key: str) -> str | None:
+    value = metadata.get(key)
+    if not value:
+        return None
+    return "".join(value).strip() if isinstance(value, list) else str(value).strip()
+
+
+def _list(metadata: Tagger, key: str) -> tuple[str, ...]:
+    value = metadata.get(key) or []
+    return tuple(value) if isinstance(value, list) else (str(value),)
+
+
+def track_from_tags(metadata: Tagger) -> Track | None:
+    """
+    Rebuild the Track a file was tagged from, out of the tags MPORG wrote to it
+    :param Tagger metadata: Tags of a file in the store
+    :return: Track, None if the file lacks a title, artist or album
+    """
+    title, album = _first(metadata, "title"), _first(metadata, "album")
+    artists = _list(metadata, "artist")
+    if not (title and album and artists):
+        return None
+    number = _first(metadata, "tracknumber")
+    try:
+        number = int(number.split("/")[0]) if number else None
+    except ValueError:
+        number = None
+    year = _first(metadata, "date")
+    return Track(
+        track_name=title,
+        track_number=number,
+        track_year=year,
+        track_artists=artists,
+        album_name=album,
+        album_artists=_list(metadata, "albumartist") or artists,
+        album_year=year,
+    )
+
+
+class Relayout:
+    """
+    Moves the files of an existing store to where the current layout rules would put them. Destinations are computed
+    from the tags already in each file, so nothing is looked up, and files are renamed rather than copied, so the
+    store must be on one filesystem. Lyrics files, the lyrics index and the store index follow each file.
+    """
+    def __init__(self, store: Path, index=None, sidecars=None, workers: int = None, dry_run: bool = False):
+        """
+        :param Path store: Root of the store to re-lay out
+        :param index: StoreIndex of the store, used to tell fingerprinted files apart and updated as files move
+        :param sidecars: SidecarIndex whose entries are moved along with the lyrics files
+        :param workers: Number of files to read tags from at once
+        :param bool dry_run: Only log the moves
+        """
+        self.store = Path(store)
+        self.index = index
+        self.sidecars = sidecars
+        self.workers = workers
+        self.dry_run = dry_run
+
+    def destination(self, path: Path) -> Path | None:
+        """
+        :param Path path: File in the store
+        :return: Where the current layout rules put the file, None if its tags are not enough to place it
+        """
+        try:
+            metadata = Tagger(path)
+        except mutagen.MutagenError as e:
+            logging.warning("Cannot read tags of %s: %s", path, e)
+            return None
+
+        # Only the index tells files tagged by a fingerprinter apart from files organized by their own tags
+        entry = self.index.get(path) if self.index is not None else None
+        tags_from = TagType.__members__.get(entry["tag_source"] or "") if entry else None
+        if tags_from not in (TagType.SPOTIFY, TagType.FINGERPRINTER, TagType.METADATA):
+            if get_valid_spotify_url([metadata.get(tag) for tag in URL_TAGS]):
+                tags_from = TagType.SPOTIFY
+            else:
+                tags_from = TagType.METADATA
+
+        if tags_from in (TagType.SPOTIFY, TagType.FINGERPRINTER):
+            results = track_from_tags(metadata)
+            if results is None:
+                return None
+            if tags_from == TagType.SPOTIFY:
+                return spotify_location(self.store, results, path.suffix)
+            return fingerprinter_location(self.store, results, path.suffix)
+
+        if not all(metadata.get(tag) for tag in ("title", "artist", "album")):
+            return None  # Would go to _TaggingImpossible, stays where it is
+        return metadata_location(self.store, metadata, path.suffix, path.relative_to(self.store))
+
+    def files(self):
+        for root, _, files in os.walk(self.store):
+            for file in files:
+                path = Path(root) / file
+                if path.suffix.lower() in SUPPORTED_FILETYPES:
+                    yield path
+
+    def plan(self) -> list[Move]:
+        """
+        :return: Files of the store that are not where the current layout rules put them, with their destinations
+        """
+        paths = list(self.files())
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="relayout") as executor:
+            destinations = executor.map(self.destination, paths)
+            return [Move(path, destination) for path, destination in zip(paths, destinations)
+                    if destination is not None and destination != path]
+
+    def move(self, move: Move) -> bool:
+        """
+        Rename a file and its lyrics files to their new location
+        :return: Whether the file was moved, False if its destination is taken by another file
+        """
+        source, destination = move.source, move.destination
+        if destination.exists() and not os.path.samefile(source, destination):
+            logging.warning("Not moving %s, %s already exists", source, destination)
+            return False
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(source, destination)
+
+        for lyric_type in SIDECAR_TYPES:
+            sidecar = source.with_suffix("." + lyric_type)
+            if not sidecar.exists():
+                continue
+            target = destination.with_suffix("." + lyric_type)
+            if target.exists():
+                logging.warning("Not moving %s, %s already exists", sidecar, target)
+                continue
+            os.rename(sidecar, target)
+
+        if self.sidecars is not None:
+            self.sidecars.move(source, destination)
+        if self.index is not None:
+            self.index.move(source, destination)
+        self.prune(source.parent)
+        return True
+
+    def prune(self, directory: Path):
+        """
+        Remove directory and its parents up to the store while they are empty
+        """
+        while directory != self.store and self.store in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:  # Not empty
+                return
+            directory = directory.parent
+
+    def run(self) -> dict:
+        """
+        Move every file of the store to where the current layout rules put it
+        :return: Counts of moved files, files skipped because their destination is taken, and failed moves
+        """
+        counts = {"moved": 0, "conflicts": 0, "failed": 0}
+        for move in self.plan():
+            if self.dry_run:
+                logging.info("Would move %s -> %s", move.source, move.destination)
+                counts["moved"] += 1
+                continue
+            try:
+                if self.move(move):
+                    logging.info("Moved %s -> %s", move.source, move.destination)
+                    counts["moved"] += 1
+                else:
+                    counts["conflicts"] += 1
+            except OSError as e:  # EXDEV if the destination is on another filesystem
+                logging.error("Cannot move %s to %s: %s", move.source, move.destination, e)
+                counts["failed"] += 1
+        return counts
@@ -3,14 +3,19 @@ import logging
 import random
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, date
+from pathlib import Path
+from urllib.parse import urlsplit
 
 import diskcache
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from mporg import CONFIG_DIR
+from mporg import CONFIG_DIR, SPOTIFY_API_URL as API_URL, SPOTIFY_AUTH_URL as AUTH_URL
+from mporg.cache import TieredCache, MISSING
+from mporg.instrumentation import tracer
 from mporg.types import Track
 
 PITCH_CODES = {
@@ -42,17 +47,29 @@ def json_serial(obj):
 
 
 locks = {}
+MATCHED_ITEMS = 256  # Search matches kept in memory for the details lookup that usually follows search_id
 
 
 class SpotifySearcher:
     """
     Class for searching Spotify for tracks
+    When offline, only cached responses are returned and no requests are made
+    api_url and auth_url can point to a stand-in server (see benchmarks/fake_spotify.py). Such a server gets its own
+    response cache and its tokens are never saved, so it cannot pollute the data of the real API.
     """
-    def __init__(self, cid: str, secret: str):
+    def __init__(self, cid: str, secret: str, offline: bool = False, api_url: str = API_URL, auth_url: str = AUTH_URL,
+                 cache_dir: Path = None):
         self.cid = cid
         self.secret = secret
+        self.offline = offline
+        self.api_url = api_url.rstrip('/')
+        self.auth_url = auth_url
 
-        self.auth_path = CONFIG_DIR / ".sp_auth_cache"
+        default_api = self.api_url == API_URL
+        self.auth_path = CONFIG_DIR / ".sp_auth_cache" if default_api else None
+        if cache_dir is None:
+            netloc = urlsplit(self.api_url).netloc.replace(':', '_')
+            cache_dir = CONFIG_DIR / ("spotifycache" if default_api else f"spotifycache_{netloc}")
 
         self.auth_lock = threading.Lock()
         self.auth_path_lock = threading.Lock()
@@ -68,7 +85,7 @@ class SpotifySearcher:
             self.session.headers.update(
                 {'Authorization': f'{self.token_info["token_type"]} {self.token_info["access_token"]}'})
 
-        self.cache = diskcache.Cache(directory=str(CONFIG_DIR / "spotifycache"))
+        self.cache = TieredCache(diskcache.Cache(directory=str(cache_dir)), name="spotify" if default_api else None)
         self.cache.expire(60 * 60 * 12)  # Set the cache to expire in 12 hours
         self.semaphores = {
             'search': threading.Semaphore(3),
@@ -76,12 +93,19 @@ class SpotifySearcher:
             'audio-analysis': threading.Semaphore(2),
             'artists': threading.Semaphore(2)
         }
+        self._matched = OrderedDict()  # Track ID -> track object of recent search_id matches
+        self._matched_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.http_calls = {}
+        self.rate_limited = 0
 
     def load_auth(self):
         """
         Load the auth cache from disk
         :return:
         """
+        if self.auth_path is None:
+            return None
         try:
             with self.auth_path_lock, open(self.auth_path, 'r', encoding='utf-8') as f:
                 info = json.load(f)
@@ -91,14 +115,17 @@ class SpotifySearcher:
             return None
 
     def save_auth(self, data):
+        if self.auth_path is None:
+            return
         with self.auth_path_lock, open(self.auth_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, default=json_serial)
 
     def authenticate(self, cid, secret):
-        AUTH_URL = "https://accounts.spotify.com/api/token"
-        auth_resp = requests.post(AUTH_URL, {"grant_type": "client_credentials",
-                                             "client_id": cid,
-                                             "client_secret": secret})
+        with tracer.span("POST token", "http") as span:
+            auth_resp = requests.post(self.auth_url, {"grant_type": "client_credentials",
+                                                      "client_id": cid,
+                                                      "client_secret": secret})
+            span["status"] = auth_resp.status_code
         auth_resp_json = auth_resp.json()
         access_token = auth_resp_json['access_token']
         token_type = auth_resp_json['token_type']
@@ -132,19 +159,57 @@ class SpotifySearcher:
                 if self.token_info is None or self.token_expired():
                     self.update_token()
 
+    def _count_response(self, endpoint: str, response: requests.Response):
+        # Retries done by the adapter are only visible in the history of the final response
+        retries = getattr(response.raw, 'retries', None)
+        history = retries.history if retries else ()
+        rate_limited = sum(1 for attempt in history if attempt.status == 429) + (response.status_code == 429)
+        with self._stats_lock:
+            self.http_calls[endpoint] = self.http_calls.get(endpoint, 0) + 1 + len(history)
+            self.rate_limited += rate_limited
+
+    def stats(self) -> dict:
+        """
+        HTTP call counts per endpoint, rate limited responses and cache statistics
+        :return: dict
+        """
+        with self._stats_lock:
+            return {
+                "http_calls": dict(self.http_calls),
+                "http_calls_total": sum(self.http_calls.values()),
+                "rate_limited": self.rate_limited,
+                "cache": self.cache.stats(),
+            }
+
     def search(self, name: str = None, artist: str = None, spot_id: str = None) -> None | Track:
         cache_key = f"{name}-{artist}-{spot_id}"
-        if cache_key in self.cache:
+        cached = self.cache.get(cache_key, MISSING)
+        if cached is not MISSING:
             # If the response is already in the cache, return it
             logging.info("Returning cached Spotify response")
-            return self.cache[cache_key]
+            return cached
+        if name and not spot_id:  # search_id may have already searched for this track
+            found = self.cache.get(f"id:{name}-{artist}", MISSING)
+            if found is None:
+                return None
+            if found is not MISSING:
+                track_info = self.search(spot_id=found)
+                if track_info is not None:
+                    self.cache[cache_key] = track_info
+                return track_info
+        if self.offline:
+            logging.debug("Offline and no cached Spotify response for %s", cache_key)
+            return None
         if not name and not spot_id:
             logging.warning("No name or ID provided.")
             return None
 
         if spot_id:
             logging.debug("Searching with Spotify ID")
-            result = self._get_item_base('tracks', spot_id)
+            with self._matched_lock:
+                result = self._matched.pop(spot_id, None)
+            if result is None:
+                result = self._get_item_base('tracks', spot_id)
             track_info = self._get_track_info(result)
             self.cache[cache_key] = track_info  # Cache the response
             return track_info
@@ -166,6 +231,35 @@ class SpotifySearcher:
         self.cache[cache_key] = None
         return None
 
+    def search_id(self, name: str, artist: str) -> str | None:
+        """
+        Find the Spotify ID of a track by name and artist, without fetching its details. A following search by this
+        ID does not request the track again.
+        :return: Spotify track ID, None if there is no match
+        """
+        cached = self.cache.get(f"{name}-{artist}-None", MISSING)
+        if cached is not MISSING:  # Full details of this search are cached
+            return cached.track_id if cached else None
+        cache_key = f"id:{name}-{artist}"
+        cached = self.cache.get(cache_key, MISSING)
+        if cached is not MISSING:
+            return cached
+        if self.offline or not name:
+            return None
+
+        query = f'{artist[0] if isinstance(artist, list) else artist} {name}'
+        results = self._get_item('search', q=query, type="track", limit=25)
+        for item in results["tracks"]["items"]:
+            if self._check_item_match(item, name, artist):
+                with self._matched_lock:
+                    self._matched[item["id"]] = item
+                    while len(self._matched) > MATCHED_ITEMS:
+                        self._matched.popitem(last=False)
+                self.cache[cache_key] = item["id"]
+                return item["id"]
+        self.cache[cache_key] = None
+        return None
+
     def _get_item(self, endpoint: str, **params):
         """
         Get an item from the Spotify API using http parameters
@@ -175,10 +269,13 @@ class SpotifySearcher:
         """
         self.validate_token()
         with self.semaphores[endpoint]:
-            response = self.session.get(f'https://api.spotify.com/v1/{endpoint}', params=params, timeout=20)
+            with tracer.span(f"GET {endpoint}", "http") as span:
+                response = self.session.get(f'{self.api_url}/{endpoint}', params=params, timeout=20)
+                span["status"] = response.status_code
+            self._count_response(endpoint, response)
             if response.status_code == 429:
                 retry_after = int(response.headers.get('retry-after', '1'))
-                logging.warning(f" {endpoint} Rate limited. Waiting for {retry_after} seconds before retrying.")
+                logging.warning(" %s Rate limited. Waiting for %s seconds before retrying.", endpoint, retry_after)
                 time.sleep(retry_after + random.randint(3, 7))
             elif response.status_code != 200:
                 response.raise_for_status()
@@ -193,11 +290,14 @@ class SpotifySearcher:
         """
         self.validate_token()
         with self.semaphores[endpoint]:
-            response = self.session.get(f"https://api.spotify.com/v1/{endpoint}/{value}", timeout=20)
+            with tracer.span(f"GET {endpoint}", "http", id=value) as span:
+                response = self.session.get(f"{self.api_url}/{endpoint}/{value}", timeout=20)
+                span["status"] = response.status_code
+            self._count_response(endpoint, response)
 
             if response.status_code == 429:
                 retry_after = int(response.headers.get('retry-after', '1'))
-                logging.warning(f" {endpoint} Rate limited. Waiting for {retry_after} seconds before retrying.")
+                logging.warning(" %s Rate limited. Waiting for %s seconds before retrying.", endpoint, retry_after)
                 time.sleep(retry_after + random.randint(3, 7))
             elif response.status_code != 200:
                 response.raise_for_status()
@@ -247,5 +347,7 @@ class SpotifySearcher:
             album_genres=";".join(genres),
 
             track_url=item['external_urls']['spotify'],
+            track_id=item['id'],
+            album_id=item['album'].get('id'),
             track_image=item['album']['images'][0]['url'],
         )
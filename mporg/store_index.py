@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from mporg import CONFIG_DIR
+from mporg.db import Database
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+INDEX_DIR = CONFIG_DIR / "storeindex"
+REBUILD_BATCH = 500  # Entries written per transaction when rebuilding
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    destination TEXT PRIMARY KEY,
+    spotify_id TEXT,
+    digest TEXT,
+    source TEXT,
+    tag_source TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_spotify_id ON files (spotify_id);
+CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+"""
+COLUMNS = ("destination", "spotify_id", "digest", "source", "tag_source", "size", "mtime_ns", "created", "updated")
+
+
+def index_path(store: Path) -> Path:
+    """
+    Default index file of a store, one per store under the config directory
+    """
+    key = hashlib.blake2b(str(Path(store).absolute()).encode("utf-8"), digest_size=8).hexdigest()
+    return INDEX_DIR / f"{key}.db"
+
+
+def scan_file(path: Path) -> tuple[str | None, str | None]:
+    """
+    Read what the index records about a file already in the store
+    :param Path path: Organized file
+    :return: Spotify track ID from its tags, and the digest of its audio data
+    """
+    from mporg.audio_digest import audio_digest
+    from mporg.organizer import URL_TAGS, get_valid_spotify_url
+    from mporg.types import Tagger
+
+    try:
+        metadata = Tagger(path)
+        spotify_id = get_valid_spotify_url([metadata.get(tag) for tag in URL_TAGS])
+    except Exception as e:
+        logging.debug("Cannot read tags of %s: %s", path, e)
+        spotify_id = None
+    try:
+        digest = audio_digest(path)
+    except OSError as e:
+        logging.debug("Cannot hash %s: %s", path, e)
+        digest = None
+    return spotify_id, digest
+
+
+class StoreIndex(Database):
+    """
+    Records every file MPORG has organized into a store: its Spotify track ID, the digest of its audio data, the
+    file it was organized from and where its tags came from. Paths are kept relative to the store.
+    """
+    def __init__(self, store: Path, path: Path = None, wal: bool = True):
+        """
+        :param Path store: Root of the store
+        :param path: Database file, index_path(store) if None
+        :param bool wal: Use write-ahead logging, off for indexes on network filesystems
+        """
+        self.store = Path(store)
+        super().__init__(path or index_path(store), SCHEMA, wal)
+
+    def _key(self, destination: Path) -> str:
+        try:
+            return Path(destination).relative_to(self.store).as_posix()
+        except ValueError:
+            return Path(destination).absolute().relative_to(self.store.absolute()).as_posix()
+
+    def _row(self, row) -> dict | None:
+        if row is None:
+            return None
+        entry = dict(zip(COLUMNS, row))
+        entry["destination"] = self.store / entry["destination"]
+        return entry
+
+    def _entry(self, destination: Path, spotify_id: str = None, digest: str = None, source: Path = None,
+               tag_source: str = None) -> tuple:
+        try:
+            stat = os.stat(destination)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        now = time.time()
+        return (self._key(destination), spotify_id, digest, str(source) if source else None, tag_source, size,
+                mtime_ns, now, now)
+
+    @staticmethod
+    def _upsert(db, entries):
+        db.executemany(
+            "INSERT INTO files (destination, spotify_id, digest, source, tag_source, size, mtime_ns, created, "
+            "updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (destination) DO UPDATE SET "
+            "spotify_id = excluded.spotify_id, digest = COALESCE(excluded.digest, digest), "
+            "source = COALESCE(excluded.source, source), tag_source = COALESCE(excluded.tag_source, tag_source), "
+            "size = excluded.size, mtime_ns = excluded.mtime_ns, updated = excluded.updated",
+            entries)
+
+    def record(self, destination: Path, spotify_id: str = None, digest: str = None, source: Path = None,
+               tag_source: str = None):
+        """
+        Add or update the entry of a file written to the store. Digest, source and tag source are kept if not given
+        :param Path destination: File in the store
+        :param spotify_id: Spotify track ID it was tagged from
+        :param digest: Digest of its audio data
+        :param source: File it was organized from
+        :param tag_source: Name of the TagType its tags came from
+        """
+        entry = self._entry(destination, spotify_id, digest, source, tag_source)
+        with self._transaction() as db:
+            self._upsert(db, [entry])
+
+    def get(self, destination: Path) -> dict | None:
+        """
+        :return: Entry of a file in the store, None if it is not indexed
+        """
+        return self._row(self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM files WHERE destination = ?", (self._key(destination),)).fetchone())
+
+    def contains(self, destination: Path) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM files WHERE destination = ?", (self._key(destination),)).fetchone() is not None
+
+    def find_spotify_id(self, spotify_id: str) -> list[Path]:
+        """
+        :return: Files in the store tagged from a Spotify track
+        """
+        rows = self._connection().execute("SELECT destination FROM files WHERE spotify_id = ?", (spotify_id,))
+        return [self.store / destination for destination, in rows]
+
+    def find_digest(self, digest: str) -> list[Path]:
+        """
+        :return: Files in the store with the given audio data
+        """
+        rows = self._connection().execute("SELECT destination FROM files WHERE digest = ?", (digest,))
+        return [self.store / destination for destination, in rows]
+
+    def remove(self, destination: Path):
+        with self._transaction() as db:
+            db.execute("DELETE FROM files WHERE destination = ?", (self._key(destination),))
+
+    def move(self, destination: Path, new_destination: Path):
+        """
+        Move the entry of a file renamed within the store, replacing any stale entry at its new path
+        """
+        old, new = self._key(destination), self._key(new_destination)
+        with self._transaction() as db:
+            db.execute("DELETE FROM files WHERE destination = ?", (new,))
+            db.execute("UPDATE files SET destination = ?, updated = ? WHERE destination = ?", (new, time.time(), old))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def stats(self) -> dict:
+        db = self._connection()
+        files, spotify, digests = db.execute(
+            "SELECT COUNT(*), COUNT(spotify_id), COUNT(digest) FROM files").fetchone()
+        tag_sources = dict(db.execute("SELECT COALESCE(tag_source, 'unknown'), COUNT(*) FROM files "
+                                      "GROUP BY tag_source").fetchall())
+        return {"files": files, "with_spotify_id": spotify, "with_digest": digests, "tag_sources": tag_sources}
+
+    def rebuild(self, workers: int = None, full: bool = False) -> dict:
+        """
+        Bring the index in line with the store. Files are scanned by a pool of threads, entries of files that are
+        unchanged since they were recorded are kept unless full, and entries of files no longer in the store are
+        removed. Unchanged files recorded without a digest, as organize runs only record digests already computed
+        by fingerprinting, are hashed
+        :param workers: Number of files to scan at once
+        :param bool full: Scan every file, even unchanged ones
+        :return: Counts of scanned, hashed, unchanged and removed files
+        """
+        from mporg.audio_digest import audio_digest
+        from mporg.organizer import SUPPORTED_FILETYPES
+
+        db = self._connection()
+        known = {destination: (size, mtime_ns, digest) for destination, size, mtime_ns, digest
+                 in db.execute("SELECT destination, size, mtime_ns, digest FROM files")}
+        counts = {"scanned": 0, "hashed": 0, "unchanged": 0, "removed": 0}
+        present = set()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index") as executor:
+            scans = {}
+            hashes = {}
+            for root, _, files in os.walk(self.store):
+                for file in files:
+                    path = Path(root) / file
+                    if path.suffix.lower() not in SUPPORTED_FILETYPES:
+                        continue
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    key = self._key(path)
+                    present.add(key)
+                    size, mtime_ns, digest = known.get(key, (None, None, None))
+                    if not full and (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                        if digest is None:
+                            hashes[key] = executor.submit(audio_digest, path)
+                        else:
+                            counts["unchanged"] += 1
+                        continue
+                    scans[path] = executor.submit(scan_file, path)
+
+            entries = []
+            for path, future in scans.items():
+                spotify_id, digest = future.result()
+                entries.append(self._entry(path, spotify_id, digest, tag_source="SPOTIFY" if spotify_id else None))
+                if len(entries) >= REBUILD_BATCH:
+                    with self._transaction() as db:
+                        self._upsert(db, entries)
+                    entries = []
+            with self._transaction() as db:
+                self._upsert(db, entries)
+            counts["scanned"] = len(scans)
+
+            digests = []
+            for key, future in hashes.items():
+                try:
+                    digests.append((future.result(), key))
+                except OSError as e:
+                    logging.debug("Cannot hash %s: %s", self.store / key, e)
+                if len(digests) >= REBUILD_BATCH:
+                    with self._transaction() as db:
+                        db.executemany("UPDATE files SET digest = ? WHERE destination = ?", digests)
+                    digests = []
+            with self._transaction() as db:
+                db.executemany("UPDATE files SET digest = ? WHERE destination = ?", digests)
+            counts["hashed"] = len(hashes)
+
+        removed = [key for key in known if key not in present]
+        with self._transaction() as db:
+            db.executemany("DELETE FROM files WHERE destination = ?", ((key,) for key in removed))
+        counts["removed"] = len(removed)
+        return counts
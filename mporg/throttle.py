@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+
+from mporg.instrumentation import tracer
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+
+class RateLimiter:
+    """
+    Thread safe limiter allowing rate calls per second. Every caller reserves the next free slot when it arrives,
+    so callers are served in arrival order and none can be starved by later ones.
+    """
+    def __init__(self, rate: float, name: str = None):
+        self.interval = 1 / rate
+        self.name = name
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0  # Total seconds callers spent waiting
+
+    def acquire(self) -> float:
+        """
+        Block until the caller's slot
+        :return: Seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            self.waited += slot - now
+        delay = slot - now
+        if delay > 0:
+            with tracer.span(f"rate_limit:{self.name}" if self.name else "rate_limit", "lock"):
+                time.sleep(delay)
+        return delay
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Batcher:
+    """
+    Gathers items submitted by concurrent callers into batches for handler, which takes a list of items and returns
+    a list of results in the same order. A batch is sent when it holds max_size items or max_wait seconds after its
+    first item arrived, after waiting for the limiter if one is given.
+    """
+    def __init__(self, handler, max_size: int = 10, max_wait: float = 0.1, limiter: RateLimiter = None,
+                 concurrency: int = 2, name: str = "batch"):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.limiter = limiter
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue = SimpleQueue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name)
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        """
+        Queue an item for the next batch
+        :return: Future resolving to the item's result, or the handler's exception
+        """
+        future = Future()
+        self._queue.put((item, future))
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name=f"{self.name}-dispatcher", daemon=True)
+                self._dispatcher.start()
+        return future
+
+    def __call__(self, item):
+        """
+        Submit an item and wait for its result
+        """
+        return self.submit(item).result()
+
+    def _dispatch(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            if self.limiter is not None:
+                self.limiter.acquire()
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch: list):
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            results = self.handler(items)
+            if len(results) != len(items):
+                raise ValueError(f"{self.name} handler returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else None}
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call for their key is running wait for it and
+    share its result, instead of repeating the request.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # Calls answered by another caller's request
+
+    def do(self, key, func):
+        """
+        :param key: Hashable key identifying the request
+        :param func: Callable without arguments making the request
+        :return: func's result
+        :raises: Whatever func raised
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class LaneScheduler:
+    """
+    Runs tasks on an executor in lane order: a task is started only when no earlier lane has one waiting. At most
+    capacity tasks are handed to the executor at once, so the order is decided here rather than in the executor's
+    queue, and lanes can be limited to fewer tasks so slow ones never take every thread.
+    """
+    def __init__(self, executor, capacity: int, lanes, limits: dict = None):
+        """
+        :param executor: Executor to run tasks on
+        :param int capacity: Tasks running at once, the executor's number of workers
+        :param lanes: Lane names, highest priority first
+        :param limits: Maximum running tasks of a lane by name
+        """
+        self.executor = executor
+        self.capacity = capacity
+        self.lanes = list(lanes)
+        self.limits = limits or {}
+        self._queues = {lane: deque() for lane in self.lanes}
+        self._running = {lane: 0 for lane in self.lanes}
+        self._counts = {lane: {"submitted": 0, "finished": 0} for lane in self.lanes}
+        self._lock = threading.Lock()
+
+    def submit(self, lane: str, func, *args, future: Future = None) -> Future:
+        """
+        Queue func(*args) in a lane
+        :param future: Future to resolve with the result, a new one if None
+        :return: Future resolving to func's result
+        """
+        future = future or Future()
+        with self._lock:
+            self._queues[lane].append((future, func, args))
+            self._counts[lane]["submitted"] += 1
+        self._dispatch()
+        return future
+
+    def _next(self):
+        """
+        :return: (lane, task) to start next, None if nothing may start
+        """
+        if sum(self._running.values()) >= self.capacity:
+            return None
+        for lane in self.lanes:
+            if self._queues[lane] and self._running[lane] < self.limits.get(lane, self.capacity):
+                return lane, self._queues[lane].popleft()
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                task = self._next()
+                if task is None:
+                    return
+                lane, (future, func, args) = task
+                self._running[lane] += 1
+            if not future.set_running_or_notify_cancel():
+                self._finished(lane)
+                continue
+            self.executor.submit(self._run, lane, future, func, args)
+
+    def _run(self, lane: str, future: Future, func, args):
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            self._finished(lane)
+            self._dispatch()
+
+    def _finished(self, lane: str):
+        with self._lock:
+            self._running[lane] -= 1
+            self._counts[lane]["finished"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {lane: dict(self._counts[lane], queued=len(self._queues[lane]), running=self._running[lane])
+                    for lane in self.lanes}
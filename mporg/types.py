@@ -3,17 +3,13 @@ from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
 
-import matplotlib
-from matplotlib import pyplot as plt
-from matplotlib import image as mpimg
 import mutagen
-import requests
 from mutagen import File
 from mutagen.asf import ASF, ASFUnicodeAttribute
 from mutagen.easyid3 import EasyID3
 from mutagen.easymp4 import EasyMP4
 from mutagen.flac import FLAC, Picture
-from mutagen.id3 import ID3NoHeaderError, ID3, COMM, APIC, PictureType
+from mutagen.id3 import ID3NoHeaderError, ID3, COMM, APIC, PictureType, WOAS
 from mutagen.mp3 import MP3
 from mutagen.mp4 import MP4Cover
 from mutagen.wave import WAVE
@@ -47,6 +43,8 @@ class Track:
         :return:
         """
         if self.track_image:
+            import requests
+
             data = requests.get(self.track_image, stream=True)
             mime = data.headers.get("Content-Type", "image/jpeg")
 
@@ -84,6 +82,21 @@ def register_picture_key():
     EasyID3.RegisterKey('picture', getter, setter, deleter)
 
 
+def register_source_key():
+    # WOAS is a URL frame, which holds a url instead of the text RegisterTextKey reads and writes
+    def getter(id3, key):
+        return [frame.url for frame in id3.getall('WOAS')]
+
+    def setter(id3, key, value):
+        id3.delall('WOAS')
+        id3.add(WOAS(url=value[0] if isinstance(value, list) else value))
+
+    def deleter(id3, key=None):
+        id3.delall('WOAS')
+
+    EasyID3.RegisterKey('source', getter, setter, deleter)
+
+
 class Tagger:
     """
     Wrapper class for mutagen objects, to provide consistent api for any filetype
@@ -148,7 +161,7 @@ class Tagger:
         register_comment_key()
         register_picture_key()
         EasyID3.RegisterTextKey("initialkey", "TKEY")
-        EasyID3.RegisterTextKey("source", "WOAS")
+        register_source_key()
         EasyMP4.RegisterTextKey("source", "source")
         EasyMP4.RegisterTextKey("initialkey", "----:com.apple.iTunes:initialkey")
 
@@ -215,6 +228,10 @@ class Tagger:
         return result
 
     def set(self, key, value, **kwargs):
+        if value is None:  # Missing results are not written, they would make saving fail
+            return
+        if isinstance(value, tuple):  # Track stores artists as tuples, which Vorbis comments do not accept
+            value = list(value)
         if self.extension.lower() == ".mp3":
             match key:  # Special Cases for MP3
                 case "comment":  # Working
@@ -319,10 +336,6 @@ if __name__ == "__main__":
     #    f.write(image)
     #print(mime)
 
-    #plt.title("Test Image")
-    #image = mpimg.imread(BytesIO(image), format=mime)
-    #plt.imshow(image)
-    ##plt.show()
 
 
     id3 = ID3(test_file)
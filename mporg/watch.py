@@ -0,0 +1,283 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+DEFAULT_SETTLE = 5.0  # Seconds a file must stay unchanged before it is organized
+DEFAULT_POLL_INTERVAL = 10.0
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+READ_SIZE = 64 * 1024
+
+
+def _walk_files(root: Path):
+    for directory, _, files in os.walk(root):
+        for file in files:
+            yield Path(directory) / file
+
+
+class PollingWatcher:
+    """
+    Finds new and modified files by comparing snapshots of the tree, for systems without inotify
+    """
+    def __init__(self, root: Path, interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for path in _walk_files(self.root):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: float) -> set[Path]:
+        """
+        Wait up to timeout seconds for the next scan
+        :return: Files created or modified since the last scan
+        """
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+        snapshot = self._scan()
+        changed = {path for path, stamp in snapshot.items() if self._snapshot.get(path) != stamp}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Receives file events under root from the Linux kernel, watching every directory including new ones
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        for function in ("inotify_init1", "inotify_add_watch", "inotify_rm_watch"):
+            if not hasattr(self._libc, function):
+                raise OSError(errno.ENOSYS, f"{function} is not available")
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise self._error("inotify_init1")
+        self._watches = {}  # Watch descriptor -> directory
+        self._pending = set()  # Files found in new directories, reported with the next changes
+        try:
+            self._add_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _error(self, function: str, path: Path = None) -> OSError:
+        code = ctypes.get_errno()
+        return OSError(code, f"{function}: {os.strerror(code)}", str(path) if path else None)
+
+    def _add_watch(self, directory: Path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = self._error("inotify_add_watch", directory)
+            if error.errno == errno.ENOSPC:
+                raise OSError(error.errno, "Too many directories to watch, raise fs.inotify.max_user_watches",
+                              str(directory))
+            if error.errno not in (errno.ENOENT, errno.ENOTDIR):  # Removed before it could be watched
+                raise error
+            return
+        self._watches[wd] = directory
+
+    def _add_tree(self, root: Path, report: bool = False):
+        """
+        Watch root and every directory below it
+        :param report: Also report the files already inside, as they may have been written before the watch
+        """
+        for directory, _, files in os.walk(root):
+            self._add_watch(Path(directory))
+            if report:
+                self._pending.update(Path(directory) / file for file in files)
+
+    def _read_events(self) -> list[tuple[int, int, str]]:
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def changes(self, timeout: float) -> set[Path]:
+        """
+        Wait up to timeout seconds for events
+        :return: Files created, modified or moved in
+        """
+        changed, self._pending = self._pending, set()
+        if changed:
+            timeout = 0
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                logging.warning("Too many file events at once, some were lost. Rescanning %s", self.root)
+                changed.update(_walk_files(self.root))
+                continue
+            directory = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path, report=True)
+            elif mask & (IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB):
+                changed.add(path)
+        changed.update(self._pending)
+        self._pending.clear()
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(root: Path, poll_interval: float = None):
+    """
+    Watch root with inotify where available, else by polling
+    :param poll_interval: Poll every this many seconds instead of using inotify
+    """
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            logging.warning("Cannot use inotify (%s), polling %s every %ss instead", e, root, DEFAULT_POLL_INTERVAL)
+        poll_interval = DEFAULT_POLL_INTERVAL
+    return PollingWatcher(root, poll_interval)
+
+
+class SettleTracker:
+    """
+    Holds back changed files until they have been left alone for settle seconds, so files still being downloaded
+    or copied are not organized half written
+    """
+    def __init__(self, settle: float = DEFAULT_SETTLE):
+        self.settle = settle
+        self._files = {}  # Path -> (last change, (size, mtime_ns))
+
+    def __len__(self):
+        return len(self._files)
+
+    def touch(self, paths, now: float = None):
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            self._files[path] = (now, None)
+
+    def ready(self, now: float = None) -> list[Path]:
+        """
+        :return: Files unchanged for settle seconds, which are then forgotten
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, (changed, stamp) in list(self._files.items()):
+            if now - changed < self.settle:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:  # Deleted or moved away
+                del self._files[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if stamp is not None and stamp == current:
+                ready.append(path)
+                del self._files[path]
+            else:  # Check again after another settle period, in case writes came without events
+                self._files[path] = (now, current)
+        return ready
+
+    def next_check(self, now: float = None) -> float | None:
+        """
+        :return: Seconds until the next file could be ready, None if nothing is pending
+        """
+        if not self._files:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(changed for changed, _ in self._files.values()) + self.settle - now)
+
+
+def watch(root: Path, on_ready, settle: float = DEFAULT_SETTLE, poll_interval: float = None,
+          stop: threading.Event = None, ignore: Path = None):
+    """
+    Call on_ready with every file created or modified under root once it stops changing, until stop is set
+    :param Path root: Directory to watch
+    :param on_ready: Called with the path of each settled file
+    :param float settle: Seconds a file must stay unchanged
+    :param poll_interval: Poll instead of using inotify
+    :param stop: Event ending the watch
+    :param ignore: Directory whose files are never reported, such as a store inside root
+    """
+    stop = stop or threading.Event()
+    ignore = Path(ignore).absolute() if ignore else None
+    watcher = create_watcher(root, poll_interval)
+    tracker = SettleTracker(settle)
+    logging.info("Watching %s for new files", root)
+    try:
+        while not stop.is_set():
+            timeout = tracker.next_check()
+            timeout = 1.0 if timeout is None else min(1.0, timeout)
+            changed = watcher.changes(timeout)
+            if ignore is not None:
+                changed = {path for path in changed if not path.absolute().is_relative_to(ignore)}
+            tracker.touch(changed)
+            for path in tracker.ready():
+                on_ready(path)
+    finally:
+        watcher.close()
@@ -0,0 +1,249 @@
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from mporg.db import Database
+
+logging.getLogger("__main__." + __name__)
+logging.propagate = True
+
+DEFAULT_LEASE = 300  # Seconds a worker may hold an item before another worker can take it
+DEFAULT_MAX_ATTEMPTS = 3  # Leases per item before it is marked failed, so a file crashing workers is not retried
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    file TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (root, file)
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (state, lease_expires);
+"""
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    id: int
+    root: Path
+    file: Path
+    attempts: int
+
+
+class WorkQueue(Database):
+    """
+    Durable queue of files to organize, shared by a coordinator adding files and any number of workers on any host
+    that can open the database. Workers lease items for a limited time and acknowledge them when done. Items whose
+    lease expires, because their worker crashed or lost its connection, are handed to the next worker.
+    """
+    def __init__(self, path: Path, wal: bool = True, timeout: float = 60):
+        """
+        :param Path path: SQLite database, created if missing
+        :param bool wal: Use write-ahead logging, off for queues on network filesystems
+        :param float timeout: Seconds to wait for another process's write lock
+        """
+        super().__init__(path, SCHEMA, wal, timeout)
+
+    def add(self, entries) -> int:
+        """
+        Queue files, ignoring ones already queued
+        :param entries: Iterable of (root, file) as yielded by file_generator
+        :return: Number of files added
+        """
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO items (root, file, updated) VALUES (?, ?, ?)",
+                           ((str(Path(root).absolute()), str(file), now) for root, file in entries))
+            return db.total_changes - before
+
+    def lease(self, worker: str, count: int = 1, lease: float = DEFAULT_LEASE,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> list[WorkItem]:
+        """
+        Take up to count pending items, or items whose lease expired
+        :param str worker: Name of the leasing worker
+        :param int count: Maximum number of items
+        :param float lease: Seconds until the items can be leased by another worker
+        :param int max_attempts: Items leased this many times already are marked failed instead
+        :return: Leased items
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE items SET state = ?, worker = NULL, lease_expires = NULL, updated = ?, "
+                "error = 'Lease expired ' || attempts || ' times' "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, max_attempts))
+            rows = db.execute(
+                "SELECT id, root, file, attempts FROM items "
+                "WHERE state = ? OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT ?",
+                (PENDING, LEASED, now, count)).fetchall()
+            db.executemany(
+                "UPDATE items SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE id = ?",
+                ((LEASED, worker, now + lease, now, row[0]) for row in rows))
+        return [WorkItem(item_id, Path(root), Path(file), attempts + 1) for item_id, root, file, attempts in rows]
+
+    def renew(self, worker: str, ids, lease: float = DEFAULT_LEASE) -> int:
+        """
+        Extend the leases a worker still holds on items it is working on
+        :return: Number of leases extended
+        """
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("UPDATE items SET lease_expires = ?, updated = ? WHERE id = ? AND state = ? AND worker = ?",
+                           ((now + lease, now, item_id, LEASED, worker) for item_id in ids))
+            return db.total_changes - before
+
+    def ack(self, worker: str, item_id: int, error: str = None) -> bool:
+        """
+        Finish an item, as failed if error is given
+        :return: False if the worker no longer held the lease, the item was then left to its new holder
+        """
+        with self._transaction() as db:
+            changed = db.execute(
+                "UPDATE items SET state = ?, error = ?, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND state = ? AND worker = ?",
+                (FAILED if error else DONE, error, time.time(), item_id, LEASED, worker)).rowcount
+        return changed == 1
+
+    def retry_failed(self) -> int:
+        """
+        Queue failed items again, with their attempts reset
+        :return: Number of items queued again
+        """
+        with self._transaction() as db:
+            return db.execute("UPDATE items SET state = ?, attempts = 0, error = NULL, worker = NULL, updated = ? "
+                              "WHERE state = ?", (PENDING, time.time(), FAILED)).rowcount
+
+    def counts(self) -> dict:
+        """
+        :return: Number of items in each state
+        """
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(self._connection().execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+        return counts
+
+    def failures(self, limit: int = 20) -> list[tuple[str, str]]:
+        """
+        :return: (path, error) of up to limit failed items
+        """
+        rows = self._connection().execute(
+            "SELECT root, file, error FROM items WHERE state = ? ORDER BY updated DESC LIMIT ?", (FAILED, limit))
+        return [(os.path.join(root, file), error) for root, file, error in rows]
+
+    def unfinished(self) -> bool:
+        counts = self.counts()
+        return counts[PENDING] + counts[LEASED] > 0
+
+
+class Worker:
+    """
+    Leases files from a WorkQueue and runs them through an organizer until the queue is finished
+    """
+    def __init__(self, queue: WorkQueue, org, batch: int = None, lease: float = DEFAULT_LEASE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, name: str = None):
+        """
+        :param WorkQueue queue: Queue to work on
+        :param MPORG org: Organizer to process files with
+        :param batch: Items to hold at once, twice the default number of organizer threads if None
+        :param float lease: Seconds per lease, renewed while files are in progress
+        :param int max_attempts: Leases per item before it is marked failed
+        :param name: Name recorded on leases, host:pid if None
+        """
+        self.queue = queue
+        self.org = org
+        self.batch = batch or 2 * min(32, (os.cpu_count() or 1) + 4)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.name = name or worker_name()
+        self.counts = {"processed": 0, "failed": 0, "lost": 0}
+        self._in_flight = set()
+        self._condition = threading.Condition()
+
+    def _finish(self, item: WorkItem, future):
+        try:
+            error = future.result()
+        except Exception as e:
+            error = f"Unknown Exception processing file {item.root / item.file}\n EXP {e}"
+        if error:
+            logging.warning(error)
+        acked = self.queue.ack(self.name, item.id, error)
+        if not acked:
+            logging.warning("Lease on %s expired before it was finished", item.root / item.file)
+        with self._condition:
+            if not acked:
+                self.counts["lost"] += 1
+            self.counts["failed" if error else "processed"] += 1
+            self._in_flight.discard(item.id)
+            self._condition.notify_all()
+
+    def _submit(self, item: WorkItem):
+        with self._condition:
+            self._in_flight.add(item.id)
+        if not self.org.accepts(item.file):
+            self.queue.ack(self.name, item.id)
+            with self._condition:
+                self._in_flight.discard(item.id)
+            return
+        future = self.org.submit_file(item.root, item.file)
+        future.add_done_callback(lambda f: self._finish(item, f))
+
+    def _renew(self, stop: threading.Event):
+        while not stop.wait(self.lease / 3):
+            with self._condition:
+                ids = list(self._in_flight)
+            if ids:
+                self.queue.renew(self.name, ids, self.lease)
+
+    def run(self, follow: bool = False, idle: float = 5, stop: threading.Event = None):
+        """
+        Process items until none are left, then wait for the files in progress
+        :param bool follow: Keep waiting for new items instead of returning once the queue is finished
+        :param float idle: Seconds to wait before asking an empty queue again
+        :param stop: Event to stop leasing new items
+        :return: Counts of processed, failed and lost items
+        """
+        stop = stop or threading.Event()
+        renew_stop = threading.Event()
+        renewer = threading.Thread(target=self._renew, args=(renew_stop,), name="lease-renewer", daemon=True)
+        renewer.start()
+        try:
+            while not stop.is_set():
+                with self._condition:
+                    self._condition.wait_for(lambda: len(self._in_flight) < self.batch)
+                    free = self.batch - len(self._in_flight)
+                items = self.queue.lease(self.name, free, self.lease, self.max_attempts)
+                for item in items:
+                    self._submit(item)
+                if items:
+                    continue
+                if not follow and not self.queue.unfinished():
+                    break
+                with self._condition:  # Wake early when a file finishes, the queue may be done then
+                    self._condition.wait(idle)
+            with self._condition:
+                self._condition.wait_for(lambda: not self._in_flight)
+        finally:
+            renew_stop.set()
+        with self._condition:
+            return dict(self.counts)
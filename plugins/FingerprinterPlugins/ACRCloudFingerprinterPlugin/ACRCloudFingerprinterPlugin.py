@@ -8,6 +8,7 @@ from ftfy import ftfy
 
 from mporg import CONFIG_DIR
 from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.cache import TieredCache
 from mporg.credentials.providers import CredentialProvider
 from mporg.types import Track
 
@@ -15,15 +16,16 @@ from mporg.types import Track
 class ACRCloudFingerprinter(Fingerprinter):
     def __init__(self, config: dict):
         self.acrcloud = ACRCloudRecognizer(config)
-        self.cache = diskcache.Cache(directory=str(CONFIG_DIR / "audiocache_A"))
+        self.cache = TieredCache(diskcache.Cache(directory=str(CONFIG_DIR / "audiocache_A")), name="acrcloud")
         # Acrcloud is paid, so I will not set the cache to expire as of now
 
     def fingerprint(self, path_to_fingerprint: Path) -> 'FingerprintResult':
-        cache_key = str(path_to_fingerprint)
-        cached_result = self.cache.get(cache_key)
+        cache_key, cached_result = self.cached_result(path_to_fingerprint)
         if cached_result is not None:
             logging.info(f"Using cached result for {path_to_fingerprint}")
             return cached_result
+        if self.offline:
+            return FingerprintResult(code=10, type="fail")  # Not cached, and requests are not allowed
         try:
             logging.info(f"Starting fingerprintng for {path_to_fingerprint}")
             result = self.acrcloud.recognize_by_file(str(path_to_fingerprint), 0)
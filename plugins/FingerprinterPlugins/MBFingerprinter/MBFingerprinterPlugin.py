@@ -1,39 +1,67 @@
+import gzip
 import logging
 from pathlib import Path
+from urllib.parse import urlencode
 
 import diskcache
 import musicbrainzngs
 import requests
-from acoustid import fingerprint_file, lookup, FingerprintGenerationError
+from acoustid import fingerprint_file, FingerprintGenerationError
 from ftfy import ftfy
 
 from mporg import CONFIG_DIR, VERSION
-from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult, run_cpu_bound
+from mporg.cache import TieredCache
 from mporg.credentials.providers import CredentialProvider
+from mporg.instrumentation import tracer
+from mporg.throttle import Batcher, RateLimiter, SingleFlight
 from mporg.types import Track
 
+ACOUSTID_URL = "https://api.acoustid.org/v2/lookup"
+ACOUSTID_BATCH_SIZE = 10  # Fingerprints per lookup request
+ACOUSTID_BATCH_WAIT = 0.25  # Seconds a lookup waits for others to join its batch
+acoustid_limiter = RateLimiter(3, "acoustid")  # AcoustID allows 3 requests per second
+
+RECORDING_INCLUDES = ['url-rels', 'artists', 'tags', 'releases']
+RECORDING_EXPIRE = 60 * 60 * 24 * 30  # Recordings rarely change, refresh them monthly
+musicbrainz_limiter = RateLimiter(1, "musicbrainz")  # MusicBrainz allows one request per second per client
+recording_requests = SingleFlight()
+
+
+class AcoustIDError(Exception):
+    pass
+
 
 class MBFingerprinter(Fingerprinter):
     def __init__(self, config):
         musicbrainzngs.set_useragent(app="python-MPORG", version=VERSION, contact="juserysthee@gmail.com")
-        self.cache = diskcache.Cache(directory=str(CONFIG_DIR / "audiocache_M"))
+        self.cache = TieredCache(diskcache.Cache(directory=str(CONFIG_DIR / "audiocache_M")), name="musicbrainz")
         self.cache.expire(60 * 60 * 12)  # Set the cache to expire in 12 hours
         self.api_key = config.get('api')
-        musicbrainzngs.set_rate_limit(False)
+        musicbrainzngs.set_rate_limit(False)  # Rate limited by musicbrainz_limiter, which queues callers fairly
+        self.recordings = TieredCache(diskcache.Cache(directory=str(CONFIG_DIR / "mbrecordings")), name="mbrecordings")
+        self.lookup = Batcher(self._lookup_batch, ACOUSTID_BATCH_SIZE, ACOUSTID_BATCH_WAIT, acoustid_limiter,
+                              name="acoustid")
 
     def fingerprint(self, path_to_fingerprint: Path) -> 'FingerprintResult':
-        cache_key = str(path_to_fingerprint)
-        cached_result = self.cache.get(cache_key)
+        cache_key, cached_result = self.cached_result(path_to_fingerprint)
         if cached_result is not None:
             logging.info(f"Using cached result for {path_to_fingerprint}")
             return cached_result
+        if self.offline:
+            return FingerprintResult(code=10, type="fail")  # Not cached, and requests are not allowed
         try:
             logging.info(f"Starting fingerprinting for {path_to_fingerprint}")
-            duration, fingerprint = fingerprint_file(str(path_to_fingerprint))
-            api_result = lookup(self.api_key, fingerprint, duration, meta='recordings')
+            # Decoding and Chromaprint are CPU bound, run them in the process pool and only wait on the network here
+            with tracer.span("chromaprint", "fingerprint", path=str(path_to_fingerprint)):
+                duration, fingerprint = run_cpu_bound(fingerprint_file, str(path_to_fingerprint))
+            api_result = self.lookup((duration, fingerprint))
         except FingerprintGenerationError as e:
             logging.info(f"Error recognizing fingerprint: {e}")
             return FingerprintResult(code=9, type="fail")
+        except AcoustIDError as e:
+            logging.info(f"Error looking up fingerprint on AcoustID: {e}")
+            return FingerprintResult(code=3, type="fail")
 
         out = FingerprintResult()
         result = api_result.get('results', [])
@@ -56,9 +84,7 @@ class MBFingerprinter(Fingerprinter):
             return out
 
         try:
-            musicbrainzngs.set_useragent(app="python-MPORG", version=VERSION, contact="juserysthee@gmail.com")
-            m_response = musicbrainzngs.get_recording_by_id(release_id,
-                                                            includes=['url-rels', 'artists', 'tags', 'releases'])
+            m_response = self.get_recording(release_id)
         except musicbrainzngs.WebServiceError as exc:
             logging.info(f"Error fetching release info from MusicBrainz: {exc}")
             out.type = "fail"
@@ -137,6 +163,53 @@ class MBFingerprinter(Fingerprinter):
         self.cache.set(cache_key, out)
         return out
 
+    def get_recording(self, mbid: str) -> dict:
+        """
+        Get a recording from MusicBrainz, or the recording cache. Concurrent requests for the same recording are
+        made once, and requests are limited to one per second across all threads.
+        :param str mbid: MusicBrainz recording ID
+        :return: MusicBrainz response
+        :raises musicbrainzngs.WebServiceError: The request failed
+        """
+        def fetch():
+            cached = self.recordings.get(mbid)
+            if cached is not None:
+                return cached
+            with musicbrainz_limiter, tracer.span("musicbrainz recording", "http", mbid=mbid):
+                response = musicbrainzngs.get_recording_by_id(mbid, includes=RECORDING_INCLUDES)
+            self.recordings.set(mbid, response, expire=RECORDING_EXPIRE)
+            return response
+
+        return recording_requests.do(mbid, fetch)
+
+    def _lookup_batch(self, fingerprints: list[tuple[float, str]]) -> list[dict]:
+        """
+        Look up several fingerprints in one AcoustID request
+        :param fingerprints: (duration, fingerprint) tuples
+        :return: One lookup response per fingerprint, each with a results list
+        """
+        data = {'client': self.api_key, 'format': 'json', 'meta': 'recordings'}
+        for i, (duration, fingerprint) in enumerate(fingerprints):
+            data[f'duration.{i}'] = str(int(duration))
+            data[f'fingerprint.{i}'] = fingerprint
+        headers = {'Content-Encoding': 'gzip', 'Content-Type': 'application/x-www-form-urlencoded'}
+        try:
+            with tracer.span("acoustid lookup", "http", fingerprints=len(fingerprints)):
+                response = requests.post(ACOUSTID_URL, data=gzip.compress(urlencode(data).encode()),
+                                         headers=headers, timeout=30)
+            api_result = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise AcoustIDError(e) from e
+
+        if api_result.get('status') != 'ok':
+            raise AcoustIDError(api_result.get('error', {}).get('message', f"HTTP {response.status_code}"))
+        if 'fingerprints' not in api_result:  # Answered as a single lookup
+            if len(fingerprints) != 1:  # The results cannot be told apart, and must not be given to every file
+                raise AcoustIDError(f"Lookup of {len(fingerprints)} fingerprints answered as a single lookup")
+            return [api_result]
+        by_index = {int(f.get('index', -1)): f for f in api_result['fingerprints']}
+        return [{'status': 'ok', 'results': by_index.get(i, {}).get('results', [])} for i in range(len(fingerprints))]
+
     @staticmethod
     def _get_album_genres(release: dict) -> list[str]:
 
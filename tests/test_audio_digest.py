@@ -0,0 +1,161 @@
+import os
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from mporg import audio_digest
+from mporg.audio_digest import DigestIndex, audio_digest as digest_of, audio_region
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from tests.utils import DictCache
+
+AUDIO = bytes(range(256)) * 64
+
+
+def id3v2(payload: bytes) -> bytes:
+    size = len(payload)
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x03\x00\x00" + synchsafe + payload
+
+
+def id3v1(title: bytes) -> bytes:
+    return (b"TAG" + title).ljust(128, b"\x00")
+
+
+def ape(items: bytes) -> bytes:
+    return items + b"APETAGEX" + struct.pack("<IIII", 2000, len(items) + 32, 1, 0) + bytes(8)
+
+
+def flac(blocks: list[bytes]) -> bytes:
+    out = b"fLaC"
+    for i, block in enumerate(blocks):
+        out += bytes([(0x80 if i == len(blocks) - 1 else 0) | 4]) + len(block).to_bytes(3, "big") + block
+    return out
+
+
+class CachingFingerprinter(Fingerprinter):
+    def __init__(self):
+        self.cache = DictCache()
+
+    def fingerprint(self, path_to_fingerprint):
+        return self.cached_result(path_to_fingerprint)[1]
+
+
+class DigestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> Path:
+        path = self.root / name
+        path.write_bytes(data)
+        return path
+
+
+class TestAudioDigest(DigestTestCase):
+    def test_mp3_tags_ignored(self):
+        plain = self.write("plain.mp3", AUDIO)
+        tagged = self.write("tagged.mp3", id3v2(b"TIT2 title" * 20) + AUDIO + ape(b"items") + id3v1(b"Title"))
+
+        self.assertEqual(audio_region(plain), (0, len(AUDIO)))
+        start, end = audio_region(tagged)
+        self.assertEqual(tagged.read_bytes()[start:end], AUDIO)
+        self.assertEqual(digest_of(plain), digest_of(tagged))
+
+    def test_flac_metadata_ignored(self):
+        first = self.write("a.flac", flac([b"streaminfo", b"vorbis comment one"]) + AUDIO)
+        second = self.write("b.flac", id3v2(b"x") + flac([b"streaminfo", b"other comment", b"picture"]) + AUDIO)
+        self.assertEqual(digest_of(first), digest_of(second))
+
+    def test_audio_changes_digest(self):
+        first = self.write("a.mp3", AUDIO)
+        second = self.write("b.mp3", AUDIO[:-1] + b"\x00")
+        self.assertNotEqual(digest_of(first), digest_of(second))
+        self.assertTrue(digest_of(first).startswith(audio_digest.DIGEST_PREFIX))
+
+    def test_large_files_sampled(self):
+        size = audio_digest.SAMPLE_SIZE * audio_digest.SAMPLE_COUNT * 4
+        data = bytearray(os.urandom(size))
+        first = self.write("a.mp3", id3v2(b"x") + bytes(data))
+        gap = audio_digest.SAMPLE_SIZE + 10  # Between the first and second sample
+        data[gap] ^= 0xFF
+        second = self.write("b.mp3", bytes(data))
+        self.assertEqual(digest_of(first), digest_of(second))
+
+        data[-1] ^= 0xFF  # In the last sample
+        third = self.write("c.mp3", bytes(data))
+        self.assertNotEqual(digest_of(second), digest_of(third))
+        self.assertNotEqual(digest_of(first), digest_of(self.write("d.mp3", bytes(data[:-1]))))
+
+    def test_truncated_tag(self):
+        path = self.write("broken.mp3", id3v2(b"x" * 100)[:50])
+        self.assertEqual(audio_region(path), (110, 110))
+
+
+class TestDigestIndex(DigestTestCase):
+    def test_unchanged_files_not_rehashed(self):
+        index = DigestIndex(DictCache())
+        path = self.write("song.mp3", AUDIO)
+        digest = index.digest(path)
+        self.assertEqual(index.digest(path), digest)
+        self.assertEqual(index.hashed, 1)
+
+        path.write_bytes(AUDIO[::-1])
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotEqual(index.digest(path), digest)
+        self.assertEqual(index.hashed, 2)
+
+    def test_cached_does_not_hash(self):
+        index = DigestIndex(DictCache())
+        path = self.write("song.mp3", AUDIO)
+        self.assertIsNone(index.cached(path))
+        digest = index.digest(path)
+        self.assertEqual(index.cached(path), digest)
+        self.assertIsNone(index.cached(path.with_name("missing.mp3")))
+        self.assertEqual(index.hashed, 1)
+
+
+class TestCachedResult(DigestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch = patch.object(audio_digest, "_index", DigestIndex(DictCache()))
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        super().tearDown()
+
+    def test_moved_file_hits(self):
+        fingerprinter = CachingFingerprinter()
+        original = self.write("song.mp3", id3v2(b"old tags") + AUDIO)
+        key, result = fingerprinter.cached_result(original)
+        self.assertIsNone(result)
+        fingerprinter.cache.set(key, FingerprintResult(code=0, type="spotify", results={"spotifyid": "abc"}))
+
+        moved = self.root / "moved"
+        moved.mkdir()
+        copy = self.write("moved/renamed.mp3", id3v2(b"new tags, different length") + AUDIO)
+        self.assertEqual(fingerprinter.fingerprint(copy).results, {"spotifyid": "abc"})
+
+    def test_path_keyed_result_migrated(self):
+        fingerprinter = CachingFingerprinter()
+        path = self.write("song.mp3", AUDIO)
+        result = FingerprintResult(code=0, type="spotify", results={"spotifyid": "abc"})
+        fingerprinter.cache.set(str(path), result)
+
+        key, cached = fingerprinter.cached_result(path)
+        self.assertEqual(cached, result)
+        self.assertEqual(fingerprinter.cache, {key: result})
+
+    def test_unreadable_file_keyed_by_path(self):
+        missing = self.root / "missing.mp3"
+        self.assertEqual(CachingFingerprinter().cached_result(missing), (str(missing), None))
+
+
+if __name__ == '__main__':
+    unittest.main()
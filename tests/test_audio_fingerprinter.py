@@ -0,0 +1,42 @@
+import os
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+from mporg import audio_fingerprinter
+from mporg.audio_fingerprinter import run_cpu_bound
+
+
+def worker_pid(_=None) -> int:
+    return os.getpid()
+
+
+def fail(message: str):
+    raise ValueError(message)
+
+
+class TestRunCpuBound(unittest.TestCase):
+    def test_runs_in_other_process(self):
+        self.assertNotEqual(run_cpu_bound(worker_pid), os.getpid())
+        self.assertIs(audio_fingerprinter.cpu_pool(), audio_fingerprinter.cpu_pool())
+
+    def test_workers_not_forked(self):
+        self.assertNotEqual(audio_fingerprinter.cpu_pool()._mp_context.get_start_method(), "fork")
+
+    def test_exceptions_propagate(self):
+        with self.assertRaisesRegex(ValueError, "bad file"):
+            run_cpu_bound(fail, "bad file")
+
+    def test_fallback_without_pool(self):
+        with patch.object(audio_fingerprinter, "cpu_pool", return_value=None):
+            self.assertEqual(run_cpu_bound(worker_pid), os.getpid())
+
+    def test_fallback_on_broken_pool(self):
+        pool = MagicMock()
+        pool.submit.return_value.result.side_effect = BrokenProcessPool("worker died")
+        with patch.object(audio_fingerprinter, "cpu_pool", return_value=pool):
+            self.assertEqual(run_cpu_bound(worker_pid), os.getpid())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from parameterized import parameterized
+
+from benchmarks.library import TrackSpec, write_file, generate_library
+from mporg.types import Tagger
+
+
+class TestSyntheticLibrary(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @parameterized.expand([("mp3",), ("flac",), ("m4a",), ("ogg",)])
+    def test_written_files_are_readable_and_writable(self, extension):
+        path = self.root / f"song.{extension}"
+        write_file(path, TrackSpec(title="Song 1", artist="Artist 1", album="Album 1", date="2020", track_number=1,
+                                   total_tracks=2), art=b"\x89PNG fake")
+
+        tagger = Tagger(path)
+        self.assertEqual("".join(tagger.get("title")), "Song 1")
+        self.assertEqual("".join(tagger.get("artist")), "Artist 1")
+
+        tagger.set("artist", ("Artist 2", "Artist 3"))
+        tagger.save()
+        self.assertIn("Artist 2", Tagger(path).get("artist"))
+
+    def test_generate_library(self):
+        paths = generate_library(self.root, 25, album_size=10, art_size=8)
+
+        self.assertEqual(len(paths), 25)
+        self.assertEqual(len({p.parent for p in paths}), 3)
+        self.assertTrue(all(p.exists() for p in paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
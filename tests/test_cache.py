@@ -0,0 +1,157 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import diskcache
+
+import mporg.main
+from mporg import cache
+from mporg.cache import LRUCache, TieredCache, MISSING
+from mporg.types import Track
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used_by_entries(self):
+        lru = LRUCache(max_entries=2, max_bytes=1024)
+        lru.set("a", 1, size=1)
+        lru.set("b", 2, size=1)
+        lru.get("a")  # "b" is now the least recently used
+        lru.set("c", 3, size=1)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIs(lru.get("b"), MISSING)
+        self.assertEqual(lru.get("c"), 3)
+
+    def test_evicts_by_bytes(self):
+        lru = LRUCache(max_entries=10, max_bytes=10)
+        lru.set("a", "x", size=6)
+        lru.set("b", "y", size=6)
+
+        self.assertIs(lru.get("a"), MISSING)
+        self.assertEqual(lru.get("b"), "y")
+        self.assertEqual(lru.current_bytes, 6)
+
+    def test_oversized_value_not_kept(self):
+        lru = LRUCache(max_entries=10, max_bytes=10)
+        lru.set("a", "small", size=1)
+        lru.set("a", "huge", size=11)
+
+        self.assertIs(lru.get("a"), MISSING)
+        self.assertEqual(lru.current_bytes, 0)
+
+    def test_cached_none(self):
+        lru = LRUCache()
+        lru.set("a", None)
+        self.assertIsNone(lru.get("a"))
+        self.assertIn("a", lru)
+
+
+    def test_returns_copies(self):
+        lru = LRUCache()
+        lru.set("a", {"artists": ["A"]})
+        lru.get("a")["artists"].append("B")
+        self.assertEqual(lru.get("a"), {"artists": ["A"]})
+        self.assertIsNot(lru.get("a"), lru.get("a"))
+
+
+class TestTieredCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.disk = diskcache.Cache(directory=self.tmp.name)
+        self.cache = TieredCache(self.disk)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_write_through(self):
+        self.cache["key"] = "value"
+        self.assertEqual(self.disk["key"], "value")
+        self.assertEqual(self.cache["key"], "value")
+        self.assertEqual(self.cache.stats()["memory_hits"], 1)
+
+    def test_disk_hit_promotes_to_memory(self):
+        self.disk["key"] = "value"
+
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        stats = self.cache.stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+
+    def test_memory_hits_are_copies(self):
+        track = Track(track_name="Song", track_artists=["A"])  # Frozen, but its lists are not
+        self.cache["key"] = track
+        self.cache["key"].track_artists.append("B")
+        self.assertEqual(self.cache["key"], track)
+        self.assertEqual(self.cache.stats()["memory_hits"], 2)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertIs(self.cache.get("missing", MISSING), MISSING)
+        self.assertNotIn("missing", self.cache)
+        with self.assertRaises(KeyError):
+            _ = self.cache["missing"]
+
+    def test_cached_none_is_a_hit(self):
+        self.cache["key"] = None
+        self.assertIn("key", self.cache)
+        self.assertIsNone(self.cache.get("key", MISSING))
+
+    def test_delete(self):
+        self.cache["key"] = "value"
+        del self.cache["key"]
+        self.assertNotIn("key", self.cache)
+        self.assertNotIn("key", self.disk)
+
+
+class TestCacheTransfer(unittest.TestCase):
+    def setUp(self):
+        self.source = tempfile.TemporaryDirectory()
+        self.target = tempfile.TemporaryDirectory()
+        self.export = Path(self.source.name) / "caches.gz"
+
+    def tearDown(self):
+        self.source.cleanup()
+        self.target.cleanup()
+
+    def _dirs(self, root):
+        return {name: Path(root) / name for name in cache.CACHE_DIRS}
+
+    def test_export_import_round_trip(self):
+        with patch.dict(cache.CACHE_DIRS, self._dirs(self.source.name)):
+            with cache.open_cache("spotify") as spotify:
+                spotify["a"] = "value"
+                spotify["b"] = None
+                spotify.set("old", "value", expire=-1)
+            exported = cache.export_caches(self.export, ["spotify"])
+        self.assertEqual(exported, {"spotify": 2})
+
+        with patch.dict(cache.CACHE_DIRS, self._dirs(self.target.name)):
+            with cache.open_cache("spotify") as spotify:
+                spotify["a"] = "local"
+            imported = cache.import_caches(self.export)
+            with cache.open_cache("spotify") as spotify:
+                self.assertEqual(spotify["a"], "local")  # Existing entries are kept by default
+                self.assertIsNone(spotify["b"])
+                self.assertNotIn("old", spotify)
+        self.assertEqual(imported, {"spotify": 1})
+
+    def test_import_rejects_other_files(self):
+        self.export.write_bytes(b"not a cache")
+        with self.assertRaises(Exception):
+            cache.import_caches(self.export)
+
+    def test_read_spotify_ids(self):
+        ids_file = Path(self.source.name) / "ids.txt"
+        ids_file.write_text("# comment\nabc\nhttps://open.spotify.com/track/def?si=1\n\n")
+        manifest = Path(self.source.name) / "manifest.jsonl"
+        manifest.write_text(json.dumps({"spotify_id": "ghi"}) + "\n" + json.dumps({"spotify_id": None}) + "\n")
+
+        self.assertEqual(mporg.main.read_spotify_ids(ids_file, manifest), ["abc", "def", "ghi"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.organizer import MPORG
+
+
+class TimedFingerprinter(Fingerprinter):
+    def __init__(self, name: str, latency: float, code: int = 0):
+        self._name = name
+        self.latency = latency
+        self.code = code
+        self.started = threading.Event()
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def fingerprint(self, path_to_fingerprint):
+        self.calls += 1
+        self.started.set()
+        time.sleep(self.latency)
+        return FingerprintResult(code=self.code, type="spotify" if self.code == 0 else "fail",
+                                 results={"spotifyid": self._name})
+
+
+class RaisingFingerprinter(Fingerprinter):
+    def fingerprint(self, path_to_fingerprint):
+        raise RuntimeError("broken plugin")
+
+
+def organizer(fingerprinters, hedge_delay) -> MPORG:
+    return MPORG(Path("store"), Path("search"), MagicMock(), fingerprinters, [], False, hedge_delay=hedge_delay)
+
+
+class TestHedgedFingerprint(unittest.TestCase):
+    def test_sequential_by_default(self):
+        first, second = TimedFingerprinter("first", 0, code=3), TimedFingerprinter("second", 0)
+        org = organizer([first, second], None)
+        self.assertIsNone(org.fingerprint_executor)
+        self.assertEqual(org.get_fingerprint_metadata(Path("song.mp3")).results, {"spotifyid": "second"})
+
+    def test_hedge_beats_slow_miss(self):
+        slow, fast = TimedFingerprinter("slow", 1.0, code=3), TimedFingerprinter("fast", 0)
+        org = organizer([slow, fast], 0.05)
+        start = time.perf_counter()
+        results = org.get_fingerprint_metadata(Path("song.mp3"))
+        self.assertEqual(results.results, {"spotifyid": "fast"})
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_no_hedge_when_first_matches(self):
+        first, second = TimedFingerprinter("first", 0), TimedFingerprinter("second", 0)
+        org = organizer([first, second], 0.5)
+        self.assertEqual(org.get_fingerprint_metadata(Path("song.mp3")).results, {"spotifyid": "first"})
+        self.assertEqual(second.calls, 0)
+
+    def test_failure_starts_next_immediately(self):
+        first, second = TimedFingerprinter("first", 0, code=3), TimedFingerprinter("second", 0)
+        org = organizer([first, second], 5)
+        start = time.perf_counter()
+        self.assertEqual(org.get_fingerprint_metadata(Path("song.mp3")).results, {"spotifyid": "second"})
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_first_match_wins(self):
+        fingerprinters = [TimedFingerprinter("slow", 1.0), TimedFingerprinter("fast", 0)]
+        org = organizer(fingerprinters, 0)
+        self.assertEqual(org.get_fingerprint_metadata(Path("song.mp3")).results, {"spotifyid": "fast"})
+
+    def test_all_fail(self):
+        org = organizer([RaisingFingerprinter(), TimedFingerprinter("miss", 0, code=3)], 0)
+        self.assertIsNone(org.get_fingerprint_metadata(Path("song.mp3")))
+
+    def test_unstarted_cancelled(self):
+        fingerprinters = [TimedFingerprinter("first", 0), TimedFingerprinter("second", 0),
+                          TimedFingerprinter("third", 0)]
+        org = organizer(fingerprinters, 1)
+        org.get_fingerprint_metadata(Path("song.mp3"))
+        self.assertEqual([f.calls for f in fingerprinters], [1, 0, 0])
+        self.assertEqual(org.stats.stages["fingerprint:first"].count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
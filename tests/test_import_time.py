@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Only needed to organize files, never to parse arguments or print the version
+HEAVY_MODULES = {"diskcache", "http", "lyrics_searcher", "matplotlib", "mutagen", "requests", "rich", "tqdm",
+                 "urllib3", "mporg.organizer", "mporg.spotify_searcher", "mporg.cache", "mporg.metrics"}
+
+
+def imported_modules(*args: str) -> tuple[set[str], str]:
+    """
+    Run python -X importtime with args in a clean process
+    :return: Names of all modules imported and the process' stdout
+    """
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, USERPROFILE=home,
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+        process = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT, env=env,
+                                 capture_output=True, text=True, timeout=60)
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and not line.rstrip().endswith("| package"):
+            modules.add(line.rsplit("|", 1)[-1].strip())
+    return modules, process.stdout
+
+
+def heavy(modules: set[str]) -> set[str]:
+    return {m for m in modules if any(m == h or m.startswith(h + ".") for h in HEAVY_MODULES)}
+
+
+class TestImportTime(unittest.TestCase):
+    def test_main_module(self):
+        modules, _ = imported_modules("-c", "import mporg.main")
+        self.assertIn("mporg.main", modules)
+        self.assertEqual(heavy(modules), set())
+
+    def test_version(self):
+        modules, out = imported_modules("-m", "mporg.main", "--version")
+        self.assertEqual(out.strip(), __import__("mporg").VERSION)
+        self.assertEqual(heavy(modules), set())
+
+    def test_help(self):
+        modules, out = imported_modules("-m", "mporg.main", "--help")
+        self.assertIn("--offline", out)
+        self.assertEqual(heavy(modules), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import json
+import logging
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from benchmarks.library import generate_library
+from benchmarks.stubs import StubSearcher, StubFingerprinter
+from mporg import instrumentation
+from mporg.instrumentation import Histogram, RunStats, Tracer
+from mporg.logging_utils.logging_setup import add_logging_level
+from mporg.organizer import MPORG, wait_if_locked
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = Histogram(buckets=(1, 2, 3, 4))
+        for value in (0.5, 1.5, 2.5, 3.5):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.counts, [1, 1, 1, 1, 0])
+        self.assertAlmostEqual(histogram.percentile(50), 2)
+        self.assertLessEqual(histogram.percentile(99), 3.5)
+        self.assertEqual(histogram.to_dict()["max_ms"], 3500)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().percentile(50), 0.0)
+        self.assertEqual(Histogram().to_dict()["mean_ms"], 0.0)
+
+
+class TestRunStats(unittest.TestCase):
+    def test_stage_timing(self):
+        stats = RunStats()
+        with stats.stage("copy"):
+            self.assertEqual(stats.in_flight["copy"], 1)
+        with self.assertRaises(ValueError):
+            with stats.stage("copy"):
+                raise ValueError
+
+        self.assertEqual(stats.in_flight["copy"], 0)
+        self.assertEqual(stats.stages["copy"].count, 2)
+
+    def test_queues(self):
+        stats = RunStats()
+        stats.count_discovered()
+        stats.count_discovered()
+        self.assertEqual(stats.queued, 2)
+        stats.file_started()
+        self.assertEqual(stats.queued, 1)
+
+        stats.count_waiting("lyrics")
+        self.assertEqual(stats.waiting["lyrics"], 1)
+        stats.count_waiting("lyrics", -1)
+        self.assertEqual(stats.waiting["lyrics"], 0)
+
+        stats.record_file("SPOTIFY")
+        self.assertEqual(stats.queued, 1)
+        self.assertEqual(stats.in_flight["file"], 0)
+
+    def test_summary(self):
+        stats = RunStats()
+        stats.start()
+        stats.count_discovered()
+        stats.count_discovered()
+        stats.count_discovered(skipped=True)
+        stats.record_file("SPOTIFY", seconds=0.1)
+        stats.record_file(None, error=True, seconds=0.2)
+        stats.finish()
+
+        summary = stats.summary(spotify={"http_calls_total": 3})
+        self.assertEqual(summary["files"]["discovered"], 3)
+        self.assertEqual(summary["files"]["skipped"], 1)
+        self.assertEqual(summary["files"]["processed"], 2)
+        self.assertEqual(summary["files"]["failed"], 1)
+        self.assertEqual(summary["files"]["by_tag_source"], {"SPOTIFY": 1, "UNKNOWN": 1})
+        self.assertEqual(summary["stages"]["file"]["count"], 2)
+        self.assertEqual(summary["spotify"], {"http_calls_total": 3})
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "trace.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_disabled_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span("work", "stage") as args:
+            args["status"] = 200
+        self.assertFalse(tracer.enabled)
+        tracer.stop()
+
+    def test_spans_from_threads(self):
+        tracer = Tracer()
+        tracer.start(self.path)
+        barrier = threading.Barrier(3)  # Keep all threads alive so their idents differ
+
+        def work():
+            with tracer.span("GET tracks", "http") as args:
+                args["status"] = 200
+            barrier.wait()
+
+        threads = [threading.Thread(target=work, name=f"worker-{i}") for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        tracer.stop()
+
+        events = self._load()
+        spans = [e for e in events if e["ph"] == "X"]
+        names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+        self.assertEqual(len(spans), 3)
+        self.assertEqual(len({e["tid"] for e in spans}), 3)
+        self.assertEqual(spans[0]["args"], {"status": 200})
+        self.assertEqual(names, {"worker-0", "worker-1", "worker-2"})
+
+    def test_flushes_in_batches(self):
+        tracer = Tracer()
+        tracer.start(self.path)
+        with unittest.mock.patch.object(instrumentation, "TRACE_FLUSH_EVENTS", 2):
+            for _ in range(5):
+                with tracer.span("copy", "stage"):
+                    pass
+        tracer.stop()
+
+        self.assertEqual(len([e for e in self._load() if e["ph"] == "X"]), 5)
+
+    def test_lock_waits_traced(self):
+        @wait_if_locked(1)
+        def locked(value):
+            return value
+
+        tracer = instrumentation.tracer
+        tracer.start(self.path)
+        try:
+            self.assertEqual(locked(threading.Lock(), 5), 5)
+        finally:
+            tracer.stop()
+
+        spans = [e for e in self._load() if e["ph"] == "X"]
+        self.assertEqual(spans[0]["name"], "lock_wait")
+        self.assertEqual(spans[0]["args"]["function"], "locked")
+
+
+class TestRunSummary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not hasattr(logging, "TOP"):
+            add_logging_level("TOP", logging.CRITICAL - 1)
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        self.tmp.cleanup()
+
+    def test_organize_writes_summary(self):
+        generate_library(self.root / "search", 6, {"mp3": 1}, album_size=3, untagged=0.5, art_size=0)
+        summary_path = self.root / "summary.json"
+        searcher = StubSearcher()
+        searcher.stats = MagicMock(return_value={"http_calls_total": 0})
+        org = MPORG(self.root / "store", self.root / "search", searcher, [StubFingerprinter()], [], False,
+                    workers=2, summary=summary_path)
+        org.organize()
+
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual(summary["files"]["processed"], 6)
+        self.assertEqual(summary["files"]["failed"], 0)
+        self.assertEqual(sum(summary["files"]["by_tag_source"].values()), 6)
+        for stage in ("file", "read_tags", "lookup", "copy", "write_tags"):
+            self.assertEqual(summary["stages"][stage]["count"], 6, stage)
+        self.assertIn("fingerprint:StubFingerprinter", summary["stages"])
+        self.assertEqual(summary["spotify"], {"http_calls_total": 0})
+        self.assertGreater(summary["bytes_copied"], 0)
+        self.assertEqual(summary["lock_wait"]["count"], 6 + summary["files"]["by_tag_source"].get("SPOTIFY", 0)
+                         + summary["files"]["by_tag_source"].get("FINGERPRINTER", 0))
+        self.assertEqual(summary["queues"]["files"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import logging
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from logging.handlers import QueueHandler
+from pathlib import Path
+from unittest.mock import patch
+
+from mporg.logging_utils import logging_setup
+from mporg.logging_utils.custom_handlers import SamplingFilter
+
+
+def _record(level: int) -> logging.LogRecord:
+    return logging.LogRecord("root", level, __file__, 1, "message %s", ("arg",), None)
+
+
+class TestSamplingFilter(unittest.TestCase):
+    def test_limits_info(self):
+        sampler = SamplingFilter(2)
+        with patch("mporg.logging_utils.custom_handlers.time.monotonic", return_value=sampler.last):
+            passed = [sampler.filter(_record(logging.INFO)) for _ in range(5)]
+
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertEqual(sampler.suppressed, 3)
+
+    def test_refills(self):
+        sampler = SamplingFilter(1)
+        start = sampler.last
+        with patch("mporg.logging_utils.custom_handlers.time.monotonic", side_effect=[start, start, start + 1.5]):
+            self.assertTrue(sampler.filter(_record(logging.INFO)))
+            self.assertFalse(sampler.filter(_record(logging.INFO)))
+            self.assertTrue(sampler.filter(_record(logging.INFO)))
+
+    def test_warnings_always_pass(self):
+        sampler = SamplingFilter(0.001)
+        sampler.tokens = 0
+        self.assertTrue(sampler.filter(_record(logging.WARNING)))
+        self.assertFalse(sampler.filter(_record(logging.DEBUG)))
+
+
+class TestSetupLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.patches = [patch.object(logging_setup, "CONFIG_DIR", root), patch.object(logging_setup, "LOG_DIR", root)]
+        for p in self.patches:
+            p.start()
+        self.logger = logging.getLogger()
+        self.level = self.logger.level
+
+    def tearDown(self):
+        logging_setup.stop_logging()
+        for p in self.patches:
+            p.stop()
+        self.logger.setLevel(self.level)
+        self.tmp.cleanup()
+
+    def _log_text(self) -> str:
+        with open(Path(self.tmp.name) / "MPORG.log", "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_records_go_through_queue(self):
+        logging_setup.setup_logging(5)
+        self.assertTrue(any(isinstance(h, QueueHandler) for h in self.logger.handlers))
+        self.assertEqual(self.logger.level, logging.INFO)
+        self.assertFalse(self.logger.isEnabledFor(logging.DEBUG))
+
+        logging.info("Organizing: %s", "song.mp3")
+        logging_setup.stop_logging()
+
+        self.assertIn("INFO - Organizing: song.mp3", self._log_text())
+        self.assertFalse(any(isinstance(h, QueueHandler) for h in self.logger.handlers))
+
+    def test_sampling_reports_dropped(self):
+        console = io.StringIO()
+        with redirect_stderr(console):
+            logging_setup.setup_logging(2, sample_rate=1)
+            for i in range(10):
+                logging.info("File %d", i)
+            logging_setup.stop_logging()
+
+        self.assertIn("File 0", console.getvalue())
+        self.assertNotIn("File 9", console.getvalue())
+        self.assertIn("INFO messages were not shown on the console by log sampling", console.getvalue())
+
+    def test_sampling_keeps_file_log(self):
+        with redirect_stderr(io.StringIO()):
+            logging_setup.setup_logging(2, sample_rate=1)
+            for i in range(10):
+                logging.info("File %d", i)
+            logging_setup.stop_logging()
+
+        text = self._log_text()
+        for i in range(10):
+            self.assertIn(f"File {i}", text)
+
+    def test_setup_twice(self):
+        logging_setup.setup_logging(5)
+        logging_setup.setup_logging(5)
+        self.assertEqual(sum(isinstance(h, QueueHandler) for h in self.logger.handlers), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
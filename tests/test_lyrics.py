@@ -0,0 +1,196 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from mporg.instrumentation import RunStats
+from mporg.lyrics import NO_LYRICS, LyricsStage, SidecarIndex, lyrics_key
+from mporg.types import Track
+from tests.utils import DictCache
+
+
+class Recorder:
+    def __init__(self):
+        self.written = []
+        self.lock = threading.Lock()
+
+    def __call__(self, location, lyric_type, lyrics):
+        with self.lock:
+            self.written.append((location, lyric_type, lyrics))
+
+
+class TestLyricsKey(unittest.TestCase):
+    def test_by_source_id(self):
+        self.assertEqual(lyrics_key(Track(track_id="abc"), "SPOTIFY"), "spotify:abc")
+
+    def test_by_artist_and_title(self):
+        track = Track(track_name="Song ", track_artists=("A", "B"))
+        self.assertEqual(lyrics_key(track, "FINGERPRINTER"), "track:a;b|song")
+        self.assertEqual(lyrics_key(None, "METADATA", {"artist": ["A"], "title": ["Song"]}), "track:a|song")
+
+    def test_unknown(self):
+        self.assertIsNone(lyrics_key(None, "METADATA", {}))
+        self.assertIsNone(lyrics_key(None, "METADATA", {"title": ["Song"]}))
+
+
+class LyricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = DictCache()
+        self.index = SidecarIndex(DictCache())
+        self.writer = Recorder()
+        self.calls = []
+
+    def stage(self, search, **kwargs) -> LyricsStage:
+        def counted(location):
+            self.calls.append(location)
+            return search(location)
+        return LyricsStage(kwargs.pop("writer", self.writer), cache=self.cache, search=counted, index=self.index,
+                           **kwargs)
+
+
+class TestLyricsStage(LyricsTestCase):
+    def test_found_cached(self):
+        stage = self.stage(lambda location: ("lrc", "[00:01] la"))
+        stage.submit(Path("a.mp3"), "spotify:1")
+        self.assertTrue(stage.join(5))
+        stage.submit(Path("b.mp3"), "spotify:1")
+        self.assertTrue(stage.join(5))
+
+        self.assertEqual(self.calls, [Path("a.mp3")])
+        self.assertEqual(self.writer.written, [(Path("a.mp3"), "lrc", "[00:01] la"), (Path("b.mp3"), "lrc", "[00:01] la")])
+        self.assertEqual(stage.stats()["cache_hits"], 1)
+
+    def test_not_found_cached(self):
+        stage = self.stage(lambda location: (None, None))
+        for name in ("a.mp3", "b.mp3"):
+            stage.submit(Path(name), "track:x|instrumental")
+            self.assertTrue(stage.join(5))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache["track:x|instrumental"], NO_LYRICS)
+        self.assertEqual(self.writer.written, [])
+
+    def test_retries_scheduled(self):
+        attempts = iter([ConnectionError("down"), ConnectionError("down"), ("txt", "words")])
+
+        def flaky(location):
+            result = next(attempts)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        stats = RunStats()
+        stage = self.stage(flaky, retry_delay=0.05, stats=stats, workers=1)
+        stage.submit(Path("a.mp3"), "spotify:1")
+        self.assertEqual(stage.pending, 1)
+        self.assertTrue(stage.join(5))
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(stage.counts["retries"], 2)
+        self.assertEqual(self.writer.written, [(Path("a.mp3"), "txt", "words")])
+        self.assertEqual(stats.waiting["lyrics"], 0)
+        self.assertEqual(stats.stages["lyrics"].count, 3)
+
+    def test_retry_does_not_hold_worker(self):
+        def search(location):
+            if location.name == "flaky.mp3":
+                raise ConnectionError("down")
+            return "txt", "words"
+
+        stage = self.stage(search, retry_delay=10, retries=2, workers=1)
+        stage.submit(Path("flaky.mp3"), None)
+        stage.submit(Path("good.mp3"), None)
+        start = time.monotonic()
+        while not self.writer.written and time.monotonic() - start < 5:
+            time.sleep(0.01)
+        self.assertEqual(self.writer.written, [(Path("good.mp3"), "txt", "words")])
+        self.assertEqual(stage.pending, 1)  # flaky.mp3 waits for its retry without a worker
+
+    def test_gives_up(self):
+        def down(location):
+            raise ConnectionError("down")
+
+        stage = self.stage(down, retry_delay=0.01, retries=2)
+        stage.submit(Path("a.mp3"), "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.assertEqual(stage.counts["failed"], 1)
+        self.assertNotIn("spotify:1", self.cache)
+
+    def test_offline_uses_cache_only(self):
+        self.cache["spotify:1"] = ("txt", "words")
+        stage = self.stage(lambda location: ("txt", "other"), offline=True)
+        stage.submit(Path("a.mp3"), "spotify:1")
+        stage.submit(Path("b.mp3"), "spotify:2")
+        self.assertTrue(stage.join(5))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.writer.written, [(Path("a.mp3"), "txt", "words")])
+
+
+class TestSidecarIndex(LyricsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.song = Path(self.tmp.name) / "song.mp3"
+        self.song.touch()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def write_sidecar(self, location, lyric_type, lyrics):
+        self.writer(location, lyric_type, lyrics)
+        location.with_suffix("." + lyric_type).write_text(lyrics, encoding="utf-8")
+
+    def test_current_sidecar_skips_search(self):
+        stage = self.stage(lambda location: ("lrc", "[00:01] la"), writer=self.write_sidecar)
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.cache.clear()  # Even with the lyrics no longer cached, nothing is searched
+
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(self.writer.written), 1)
+        self.assertEqual(stage.counts["current"], 1)
+        self.assertEqual(self.index.get(self.song)["source"], "spotify:1")
+
+    def test_edited_sidecar_searched_again(self):
+        stage = self.stage(lambda location: ("txt", "words"), writer=self.write_sidecar)
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.song.with_suffix(".txt").write_text("edited by hand", encoding="utf-8")
+
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.assertEqual(len(self.writer.written), 2)
+        self.assertEqual(self.song.with_suffix(".txt").read_text(encoding="utf-8"), "words")
+
+    def test_other_track_searched(self):
+        stage = self.stage(lambda location: ("txt", "words"), writer=self.write_sidecar)
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        stage.submit(self.song, "spotify:2")  # The file now holds a different track
+        self.assertTrue(stage.join(5))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_same_lyrics_not_rewritten(self):
+        stage = self.stage(lambda location: ("txt", "words"), writer=self.write_sidecar)
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        stage.submit(self.song, "spotify:2")  # Different source, same lyrics: no comparison or write needed
+        self.assertTrue(stage.join(5))
+        self.assertEqual(len(self.writer.written), 1)
+        self.assertEqual(stage.counts["unchanged"], 1)
+        self.assertEqual(self.index.get(self.song)["source"], "spotify:2")
+
+    def test_expired(self):
+        stage = self.stage(lambda location: ("txt", "words"), writer=self.write_sidecar)
+        stage.submit(self.song, "spotify:1")
+        self.assertTrue(stage.join(5))
+        self.assertTrue(self.index.current(self.song, "spotify:1"))
+        self.assertFalse(self.index.current(self.song, "spotify:1", max_age=-1))
+
+
+if __name__ == '__main__':
+    unittest.main()
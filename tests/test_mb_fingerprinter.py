@@ -0,0 +1,49 @@
+import importlib.util
+import json
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+PLUGIN = Path(__file__).parent.parent / "plugins/FingerprinterPlugins/MBFingerprinter/MBFingerprinterPlugin.py"
+
+try:
+    spec = importlib.util.spec_from_file_location("MBFingerprinterPlugin", PLUGIN)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+except ImportError:  # The plugin's own dependencies are installed with it
+    plugin = None
+
+
+def response(body: dict) -> MagicMock:
+    mock = MagicMock(status_code=200)
+    mock.json.return_value = json.loads(json.dumps(body))
+    return mock
+
+
+@unittest.skipIf(plugin is None, "MBFingerprinter dependencies are not installed")
+class TestLookupBatch(unittest.TestCase):
+    def setUp(self):
+        self.fingerprinter = plugin.MBFingerprinter.__new__(plugin.MBFingerprinter)
+        self.fingerprinter.api_key = "key"
+
+    def test_batch_results_by_index(self):
+        body = {"status": "ok", "fingerprints": [{"index": "1", "results": [{"id": "b"}]},
+                                                 {"index": "0", "results": [{"id": "a"}]}]}
+        with patch.object(plugin.requests, "post", return_value=response(body)):
+            results = self.fingerprinter._lookup_batch([(10, "fp0"), (20, "fp1")])
+        self.assertEqual([result["results"] for result in results], [[{"id": "a"}], [{"id": "b"}]])
+
+    def test_single_response_for_single_fingerprint(self):
+        body = {"status": "ok", "results": [{"id": "a"}]}
+        with patch.object(plugin.requests, "post", return_value=response(body)):
+            self.assertEqual(self.fingerprinter._lookup_batch([(10, "fp0")]), [body])
+
+    def test_single_response_for_batch_fails(self):
+        body = {"status": "ok", "results": [{"id": "a"}]}
+        with patch.object(plugin.requests, "post", return_value=response(body)):
+            with self.assertRaises(plugin.AcoustIDError):
+                self.fingerprinter._lookup_batch([(10, "fp0"), (20, "fp1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+
+from mporg.instrumentation import RunStats
+from mporg.metrics import MetricsServer, render_metrics
+
+
+def _run_stats() -> RunStats:
+    stats = RunStats()
+    stats.start()
+    for _ in range(3):
+        stats.count_discovered()
+    stats.count_discovered(skipped=True)
+    stats.file_started()
+    with stats.stage("copy"):
+        stats.count_bytes_copied(2048)
+    stats.record_file("SPOTIFY", seconds=0.5)
+    stats.file_started()
+    stats.record_file("METADATA", error=True, seconds=0.01)
+    stats.record_lock_wait(0.2)
+    return stats
+
+
+class TestRenderMetrics(unittest.TestCase):
+    def test_render(self):
+        spotify = {"http_calls": {"search": 4, "tracks": 1}, "http_calls_total": 5, "rate_limited": 2,
+                   "cache": {"memory_hits": 3, "disk_hits": 1, "misses": 5}}
+        fingerprinters = {"MusicBrainzPlugin": {"cache": {"memory_hits": 0, "disk_hits": 2, "misses": 1}}}
+        text = render_metrics(_run_stats().summary(spotify=spotify, fingerprinters=fingerprinters))
+        lines = text.splitlines()
+
+        self.assertIn("mporg_files_discovered_total 4", lines)
+        self.assertIn("mporg_files_skipped_total 1", lines)
+        self.assertIn('mporg_files_processed_total{tag_source="SPOTIFY"} 1', lines)
+        self.assertIn('mporg_files_failed_total{tag_source="METADATA"} 1', lines)
+        self.assertIn('mporg_queue_depth{queue="files"} 1', lines)
+        self.assertIn('mporg_stage_in_flight{stage="copy"} 0', lines)
+        self.assertIn('mporg_stage_duration_seconds_bucket{stage="file",le="+Inf"} 2', lines)
+        self.assertIn('mporg_stage_duration_seconds_bucket{stage="file",le="0.5"} 2', lines)
+        self.assertIn('mporg_stage_duration_seconds_bucket{stage="file",le="0.25"} 1', lines)
+        self.assertIn("mporg_lock_wait_seconds_count 1", lines)
+        self.assertIn("mporg_bytes_copied_total 2048", lines)
+        self.assertIn('mporg_cache_hits_total{cache="spotify",tier="memory"} 3', lines)
+        self.assertIn('mporg_cache_misses_total{cache="MusicBrainzPlugin"} 1', lines)
+        self.assertIn('mporg_spotify_requests_total{endpoint="search"} 4', lines)
+        self.assertIn("mporg_spotify_rate_limited_total 2", lines)
+        self.assertIn("# TYPE mporg_stage_duration_seconds histogram", lines)
+
+    def test_label_escaping(self):
+        stats = RunStats()
+        stats.record_file('a"b\\c')
+        self.assertIn('mporg_files_processed_total{tag_source="a\\"b\\\\c"} 1', render_metrics(stats.summary()))
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self):
+        org = MagicMock()
+        org.stats = _run_stats()
+        org.component_stats.return_value = {}
+        self.server = MetricsServer(org, 0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_scrape(self):
+        with urllib.request.urlopen(self.server.url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+        self.assertIn("mporg_files_discovered_total 4", body)
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(self.server.url.replace("/metrics", "/other"), timeout=5)
+        self.assertEqual(e.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
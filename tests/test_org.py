@@ -79,6 +79,14 @@ class TestMPORGHelpers(unittest.TestCase):
     def test_sanitize_results(self, name, track, expected_tuple):
         self.assertEqual(mp._sanitize_results(Path('Test'), track), expected_tuple)
 
+    @parameterized.expand([
+        ("No URL", [None, ["Just a comment"]], None),
+        ("URL", [None, ["https://open.spotify.com/track/12345?si=abc"]], "12345"),
+        ("MP3 Comment", [[("XXX", "Spotify URL", "https://open.spotify.com/track/12345")]], "12345"),
+    ])
+    def test_get_valid_spotify_url(self, name, strings, expected):
+        self.assertEqual(mp.get_valid_spotify_url(strings), expected)
+
 
 class TestMPORG(unittest.TestCase):
     def setUp(self):
@@ -390,7 +398,7 @@ class TestMPORGWithMocks(unittest.TestCase):
         with patch('mporg.organizer.Tagger', return_value=tag):
             self.mporg.process_file(args)
 
-        self.mporg.get_metadata.assert_called_once_with(tag, Path(root, file))
+        self.mporg.get_metadata.assert_called_once_with(tag, Path(root, file), None)
         self.mporg.copy_file.assert_called_once_with(ANY, ANY,  # First two will be locks for src and destination
                                                      Path(root, file),  # Source file path
                                                      self.store / 'Test Artist' / '2023 - Test Album'
@@ -422,6 +430,180 @@ class TestMPORGWithMocks(unittest.TestCase):
             unittest.mock.call((Path('/path/to/files'), Path('song2.mp3')))
         ])
 
+    def test_organize_shard(self):
+        albums = [(f"search/Album {i}", [], ["1.mp3", "2.mp3"]) for i in range(20)]
+        self.mporg.process_file = MagicMock()
+        self.mporg.executor = MockThreadPoolExecutor()
+        self.mporg.pattern = False
+
+        processed = []
+        for shard in (1, 2, 3):
+            self.mporg.process_file.reset_mock()
+            self.mporg.shard = (shard, 3)
+            with patch('os.walk', MagicMock(return_value=albums)), \
+                    patch('mporg.organizer.get_file_count', MagicMock(return_value=40)):
+                self.mporg.organize()
+            calls = [c.args[0] for c in self.mporg.process_file.call_args_list]
+            self.assertGreater(len(calls), 0)
+            self.assertEqual({root for root, _ in calls},
+                             {root for root, _ in calls if (root, Path("2.mp3")) in calls})  # Albums stay together
+            processed.extend(calls)
+        self.assertEqual(sorted(processed), sorted((Path(root), Path(f)) for root, _, files in albums for f in files))
+
+    def test_in_shard_by_path(self):
+        self.mporg.shard, self.mporg.shard_by = (1, 2), "path"
+        files = [Path(f"{i}.mp3") for i in range(50)]
+        in_shard = [self.mporg.in_shard(self.search, file) for file in files]
+        self.assertTrue(0 < sum(in_shard) < 50)
+        self.assertEqual(in_shard, [self.mporg.in_shard(Path("search"), file) for file in files])
+
+    @patch('mporg.organizer.shutil.copyfile')
+    @patch('mporg.organizer.os.path.exists', return_value=False)
+    def test_copy_file_ignores_stale_index(self, exists, copyfile):
+        self.mporg.index = MagicMock()
+        self.mporg.index.contains.return_value = True  # The file was deleted from the store since it was indexed
+        with patch('mporg.organizer.os.makedirs'):
+            self.mporg.copy_file(threading.Lock(), threading.Lock(), Path("song.mp3"), self.store / "song.mp3")
+        exists.assert_called_once_with(self.store / "song.mp3")
+        copyfile.assert_called_once_with(Path("song.mp3"), self.store / "song.mp3")
+
+    @patch('mporg.organizer.os.path.exists', return_value=True)
+    @patch('mporg.organizer.Tagger')
+    def test_process_file_already_in_store(self, tagger, exists):
+        tagger.return_value = {"comment": ["https://open.spotify.com/track/abc"]}
+        known = self.store / "Artist" / "Album" / "1. - Artist - Song.mp3"
+        self.mporg.index = MagicMock()
+        self.mporg.index.find_spotify_id.return_value = [known]
+        self.mporg.copy_file = MagicMock()
+        self.mporg.update_metadata_from_spotify = MagicMock()
+        self.mporg.record_manifest = MagicMock()
+        self.mporg.lyrics = MagicMock()
+
+        self.assertIsNone(self.mporg.process_file((self.search, Path("song.mp3"))))
+        self.mporg.index.find_spotify_id.assert_called_once_with("abc")
+        self.searcher.search.assert_not_called()
+        self.mporg.copy_file.assert_not_called()
+        self.mporg.update_metadata_from_spotify.assert_not_called()
+        self.mporg.lyrics.submit.assert_not_called()
+        self.mporg.record_manifest.assert_called_once_with(self.search / "song.mp3", known, mp.TagType.STORE, None,
+                                                           "abc")
+        self.assertEqual(self.mporg.stats.outcomes, {"STORE": 1})
+
+    def test_find_in_store_by_search(self):
+        self.mporg.index = MagicMock()
+        self.mporg.index.find_spotify_id.return_value = []
+        self.searcher.search_id.return_value = "abc"
+        metadata = {"artist": ["Artist"], "title": ["Song"]}
+        self.assertEqual(self.mporg.find_in_store(metadata, Path("song.mp3")), ("abc", None))
+        self.searcher.search_id.assert_called_once_with("Song", "Artist")
+
+        self.mporg.get_fingerprint_spotify_metadata = MagicMock(return_value="track")
+        self.mporg.search_spotify = MagicMock()
+        self.assertEqual(self.mporg.get_metadata(metadata, Path("song.mp3"), "abc"), ("track", mp.TagType.SPOTIFY))
+        self.mporg.get_fingerprint_spotify_metadata.assert_called_once_with("abc")
+        self.mporg.search_spotify.assert_not_called()
+
+    def test_find_in_store_checks_store(self):
+        missing, flac = self.store / "missing.mp3", self.store / "song.flac"
+        self.mporg.index = MagicMock()
+        self.mporg.index.find_spotify_id.return_value = [missing, flac]
+        metadata = {"comment": ["https://open.spotify.com/track/abc"]}
+        with patch('mporg.organizer.os.path.exists', side_effect=lambda path: path == flac):
+            self.assertEqual(self.mporg.find_in_store(metadata, Path("song.mp3")), ("abc", None))
+            self.assertEqual(self.mporg.find_in_store(metadata, Path("song.FLAC")), ("abc", flac))
+        self.mporg.index.remove.assert_called_with(missing)
+
+    def test_find_in_store_without_index(self):
+        self.assertEqual(self.mporg.find_in_store({"artist": ["Artist"], "title": ["Song"]}, Path("song.mp3")),
+                         (None, None))
+        self.searcher.search_id.assert_not_called()
+
+    @patch('mporg.organizer.digest_index')
+    def test_record_index(self, digest_index):
+        digest_index.return_value.cached.return_value = "blake2b:00"
+        self.mporg.index = MagicMock()
+        track = mporg.types.Track(track_name='T', track_artists=('A',), album_name='Al', album_year='2023',
+                                  track_number=1, track_disk=1, track_url='https://open.spotify.com/track/abc',
+                                  album_artists=('A',), track_bpm='120', track_key='C', album_genres='Rock')
+        self.mporg.record_index(Path("song.mp3"), self.store / "song.mp3", mp.TagType.SPOTIFY, track)
+        self.mporg.index.record.assert_called_once_with(self.store / "song.mp3", "abc", "blake2b:00",
+                                                        Path("song.mp3").absolute(), "SPOTIFY")
+        digest_index.return_value.digest.assert_not_called()  # Files are not read again only to hash them
+
+    @patch('mporg.organizer.digest_index')
+    def test_record_index_hashed_tags(self, digest_index):
+        digest_index.return_value.cached.return_value = "blake2b:00"
+        self.mporg.index = MagicMock()
+        self.mporg.record_index(Path("song.m4a"), self.store / "song.m4a", mp.TagType.METADATA, None)
+        # Tagging changed the digest of the copy, it is left for `mporg index rebuild`
+        self.mporg.index.record.assert_called_once_with(self.store / "song.m4a", None, None,
+                                                        Path("song.m4a").absolute(), "METADATA")
+
+    @parameterized.expand([
+        ("spotify_url", {"comment": ["https://open.spotify.com/track/abc?si=1"], "artist": ["A"]}, True, mp.FAST_LANE),
+        ("tagged", {"artist": ["A"], "title": ["T"]}, True, mp.SEARCH_LANE),
+        ("untagged", {"artist": ["A"]}, True, mp.FINGERPRINT_LANE),
+        ("untagged_no_fingerprinters", {}, False, mp.SEARCH_LANE),
+    ])
+    def test_classify(self, name, tags, fingerprinters, expected):
+        self.mporg.af = self.fingerprinter if fingerprinters else []
+        with patch('mporg.organizer.Tagger', return_value=tags):
+            self.assertEqual(self.mporg.classify(Path("song.mp3")), expected)
+
+    def test_classify_unreadable(self):
+        with patch('mporg.organizer.Tagger', side_effect=mporg.types.mutagen.MutagenError("bad")):
+            self.assertEqual(self.mporg.classify(Path("song.mp3")), mp.FINGERPRINT_LANE)
+
+    def test_organize_prioritized(self):
+        tags = {
+            "slow.mp3": {},
+            "search.mp3": {"artist": ["A"], "title": ["T"]},
+            "fast.mp3": {"comment": ["https://open.spotify.com/track/abc"]},
+        }
+        org = mp.MPORG(self.store, self.search, self.searcher, self.fingerprinter, [], False, workers=1,
+                       prioritize=True)
+        order = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def process_file(args):
+            if not started.is_set():  # Hold the only thread until every file is classified and queued
+                started.set()
+                release.wait(5)
+            order.append(args[1].name)
+
+        org.process_file = process_file
+        files = [("search", [], ["blocker.mp3", "slow.mp3", "search.mp3", "fast.mp3"])]
+        with patch('os.walk', MagicMock(return_value=files)), \
+                patch('mporg.organizer.get_file_count', MagicMock(return_value=4)), \
+                patch('mporg.organizer.Tagger', side_effect=lambda path: tags.get(path.name, {})):
+            threading.Timer(0.2, release.set).start()
+            org.organize()
+        self.assertEqual(order, ["blocker.mp3", "fast.mp3", "search.mp3", "slow.mp3"])
+        self.assertEqual(org.component_stats()["lanes"][mp.FINGERPRINT_LANE]["finished"], 2)
+
+
+class TestShard(unittest.TestCase):
+    def test_shard_of_is_stable(self):
+        self.assertEqual(mp.shard_of("Artist/Album", 4), mp.shard_of("Artist/Album", 4))
+        self.assertEqual(mp.shard_of("Artist/Album", 1), 1)
+        counts = [0, 0, 0, 0]
+        for i in range(4000):
+            counts[mp.shard_of(f"Artist {i}/Album", 4) - 1] += 1
+        self.assertTrue(all(800 < count < 1200 for count in counts), counts)
+
+    @parameterized.expand([
+        ("valid", "2/4", (2, 4)),
+        ("last", "4/4", (4, 4)),
+    ])
+    def test_parse_shard(self, name, value, expected):
+        self.assertEqual(mporg.main.parse_shard(value), expected)
+
+    @parameterized.expand([("zero", "0/4"), ("too_big", "5/4"), ("malformed", "1-4"), ("text", "a/b")])
+    def test_parse_shard_invalid(self, name, value):
+        with self.assertRaises(mporg.main.ArgumentTypeError):
+            mporg.main.parse_shard(value)
+
 
 def test():
     if not mporg.CONFIG_DIR.exists():
@@ -0,0 +1,157 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from mporg.plugins import PluginType, registry, util
+from mporg.plugins.plugin_loader import LazyFingerprinter, PluginLoader
+from mporg.plugins.registry import REGISTRY_NAME, build_registry, get_registry, load_registry
+
+PLUGIN_SOURCE = '''
+from mporg.audio_fingerprinter import Fingerprinter, FingerprintResult
+from mporg.credentials.providers import CredentialProvider
+
+
+class FakeCredentialProvider(CredentialProvider):
+    PNAME = "Fake"
+    CONFIG_NAME = "fake.json"
+
+    def verify_credentials(self, credentials):
+        return True
+
+
+class Fake(Fingerprinter):
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def fingerprint(self, path_to_fingerprint):
+        return FingerprintResult(code=0, type="spotify", results={"spotify_id": self.credentials["key"]})
+'''
+
+
+class PluginTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.plugin_dir = Path(self.tmp.name) / "plugins"
+        self.fake_dir = self.plugin_dir / PluginType.FINGERPRINTER.value / "FakeFingerprinter"
+        self.fake_dir.mkdir(parents=True)
+        (self.fake_dir / "FakePlugin.py").write_text(PLUGIN_SOURCE, encoding="utf-8")
+        (self.fake_dir / "plugin.json").write_text(json.dumps({"name": "Fake", "version": "1.0"}), encoding="utf-8")
+        sys.modules.pop("FakePlugin", None)
+
+    def tearDown(self):
+        sys.modules.pop("FakePlugin", None)
+        self.tmp.cleanup()
+
+
+class TestRegistry(PluginTestCase):
+    def test_round_trip(self):
+        entries = build_registry(self.plugin_dir)
+        self.assertTrue((self.plugin_dir / REGISTRY_NAME).exists())
+        self.assertEqual(load_registry(self.plugin_dir), entries)
+
+        entry = entries["Fake"]
+        self.assertEqual(entry.type, PluginType.FINGERPRINTER.value)
+        self.assertEqual(entry.directory, "FakeFingerprinter")
+        self.assertEqual(entry.entry_point, "FingerprinterPlugins/FakeFingerprinter/FakePlugin.py")
+        self.assertEqual(entry.version, "1.0")
+        self.assertEqual((entry.provider, entry.provider_name, entry.provider_config),
+                         ("FakeCredentialProvider", "Fake", "fake.json"))
+        self.assertNotIn("FakePlugin", sys.modules)  # Scanning never runs plugin code
+
+    def test_changed_module(self):
+        build_registry(self.plugin_dir)
+        (self.fake_dir / "FakePlugin.py").write_text(PLUGIN_SOURCE + "\n# changed\n", encoding="utf-8")
+        self.assertIsNone(load_registry(self.plugin_dir))
+
+    def test_touched_module(self):
+        build_registry(self.plugin_dir)
+        stat = (self.fake_dir / "FakePlugin.py").stat()
+        os.utime(self.fake_dir / "FakePlugin.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNotNone(load_registry(self.plugin_dir))
+
+        with patch.object(registry, "file_hash") as file_hash:  # The new modification time was saved
+            self.assertEqual(load_registry(self.plugin_dir)["Fake"].mtime_ns, stat.st_mtime_ns + 10 ** 9)
+        file_hash.assert_not_called()
+
+    def test_new_plugin(self):
+        build_registry(self.plugin_dir)
+        other = self.plugin_dir / PluginType.FINGERPRINTER.value / "OtherFingerprinter"
+        other.mkdir()
+        self.assertIsNone(load_registry(self.plugin_dir))
+
+        (other / "OtherPlugin.py").write_text(PLUGIN_SOURCE.replace("class Fake(", "class Other("), encoding="utf-8")
+        self.assertEqual(set(get_registry(self.plugin_dir)), {"Fake", "Other"})
+
+    def test_invalidate(self):
+        build_registry(self.plugin_dir)
+        registry.invalidate_registry(self.plugin_dir)
+        self.assertIsNone(load_registry(self.plugin_dir))
+
+
+class TestLazyLoading(PluginTestCase):
+    def test_import_on_first_fingerprint(self):
+        loader = PluginLoader(self.plugin_dir)
+        loader.load_all_fingerprinters()
+        plugin = loader.fingerprinters["Fake"]
+        self.assertNotIn("FakePlugin", sys.modules)
+
+        fingerprinter = plugin.fingerprinter({"key": "abc"})
+        self.assertIsInstance(fingerprinter, LazyFingerprinter)
+        self.assertEqual(fingerprinter.name, "Fake")
+        self.assertIsNone(getattr(fingerprinter, "cache", None))
+        self.assertNotIn("FakePlugin", sys.modules)
+
+        with patch("mporg.plugins.plugin_loader.CONFIG_DIR", Path(self.tmp.name)):
+            result = fingerprinter.fingerprint(Path("song.mp3"))
+        self.assertEqual(result.results, {"spotify_id": "abc"})
+        self.assertIn("FakePlugin", sys.modules)
+        self.assertTrue(plugin.loaded)
+
+    def test_load_plugin_by_name(self):
+        loader = PluginLoader(self.plugin_dir)
+        loader.load_plugin(PluginType.FINGERPRINTER, "fake")
+        self.assertEqual(list(loader.fingerprinters), ["Fake"])
+        with self.assertRaises(ValueError):
+            loader.load_plugin(PluginType.FINGERPRINTER, "missing")
+
+    def test_broken_plugin_disabled(self):
+        (self.fake_dir / "FakePlugin.py").write_text(PLUGIN_SOURCE + "\nimport not_a_real_module\n",
+                                                      encoding="utf-8")
+        loader = PluginLoader(self.plugin_dir)
+        loader.load_all_fingerprinters()
+        fingerprinter = loader.fingerprinters["Fake"].fingerprinter({"key": "abc"}, verified=True)
+
+        self.assertEqual(fingerprinter.fingerprint(Path("song.mp3")).type, "fail")
+        self.assertEqual(fingerprinter.fingerprint(Path("song.mp3")).type, "fail")
+
+    def test_saved_credentials(self):
+        loader = PluginLoader(self.plugin_dir)
+        loader.load_all_fingerprinters()
+        plugin = loader.fingerprinters["Fake"]
+        with patch("mporg.plugins.plugin_loader.CONFIG_DIR", Path(self.tmp.name)):
+            self.assertIsNone(plugin.saved_credentials())
+            (Path(self.tmp.name) / "fake.json").write_text(json.dumps({"key": "abc"}), encoding="utf-8")
+            self.assertEqual(plugin.saved_credentials(), {"key": "abc"})
+        self.assertNotIn("FakePlugin", sys.modules)
+
+
+class TestSetupAndCheckPlugins(PluginTestCase):
+    def test_skips_check_with_current_registry(self):
+        urls = {PluginType.FINGERPRINTER: "https://example.com/FakeFingerprinter/plugin.json"}
+        with patch.object(util, "PLUGIN_DIR", self.plugin_dir), patch.object(registry, "PLUGIN_DIR", self.plugin_dir), \
+                patch.object(util, "default_plugin_urls", urls), \
+                patch.object(util, "check_default_plugins") as check:
+            util.setup_and_check_plugins()
+            check.assert_called_once()
+
+            build_registry()
+            util.setup_and_check_plugins()
+            check.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
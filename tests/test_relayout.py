@@ -0,0 +1,111 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from mutagen.easyid3 import EasyID3
+
+from mporg.lyrics import SidecarIndex
+from mporg.relayout import Move, Relayout, track_from_tags
+from mporg.store_index import StoreIndex
+from mporg.types import register_source_key
+from tests import utils
+from tests.utils import DictCache
+
+SPOTIFY_TAGS = {"title": ["Song"], "artist": ["Artist"], "album": ["Album"], "albumartist": ["Artist"],
+                "date": ["2020"], "tracknumber": ["3/12"], "source": ["https://open.spotify.com/track/abc"]}
+METADATA_TAGS = {"title": ["Other"], "artist": ["Band"], "album": ["Record"], "tracknumber": ["1"]}
+
+
+class RelayoutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.store = Path(self.temp.name) / "store"
+        self.tags = {}
+        patcher = patch("mporg.relayout.Tagger", side_effect=lambda path: utils.MockTagger(path, self.tags[path.name]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.index = StoreIndex(self.store, Path(self.temp.name) / "index.db")
+        self.addCleanup(self.index.close)
+        self.sidecars = SidecarIndex(DictCache())
+        self.relayout = Relayout(self.store, self.index, self.sidecars, workers=2)
+
+    def write(self, relative: str, tags: dict = None) -> Path:
+        path = self.store / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"audio")
+        if tags is not None:
+            self.tags[path.name] = tags
+        return path
+
+
+class TestTrackFromTags(unittest.TestCase):
+    def test_track_from_tags(self):
+        track = track_from_tags(utils.MockTagger(Path("song.mp3"), SPOTIFY_TAGS))
+        self.assertEqual((track.track_name, track.track_artists, track.album_name, track.album_artists,
+                          track.album_year, track.track_number), ("Song", ("Artist",), "Album", ("Artist",), "2020", 3))
+
+    def test_missing_tags(self):
+        self.assertIsNone(track_from_tags(utils.MockTagger(Path("song.mp3"), {"title": ["Song"]})))
+
+
+class TestSourceTag(unittest.TestCase):
+    def test_mp3_source_url_round_trip(self):
+        register_source_key()
+        tags = EasyID3()
+        tags["source"] = "https://open.spotify.com/track/abc"
+        self.assertEqual(tags["source"], ["https://open.spotify.com/track/abc"])
+
+
+class TestRelayout(RelayoutTestCase):
+    def test_destinations(self):
+        spotify = self.write("old/song.mp3", SPOTIFY_TAGS)
+        other = self.write("old/other.flac", METADATA_TAGS)
+        fingerprinted = self.write("old/finger.mp3", SPOTIFY_TAGS | {"source": []})
+        self.index.record(fingerprinted, tag_source="FINGERPRINTER")
+        untagged = self.write("_TaggingImpossible/x.mp3", {})
+
+        self.assertEqual(self.relayout.destination(spotify), self.store / "Artist/2020 - Album/3. - Artist - Song.mp3")
+        self.assertEqual(self.relayout.destination(other), self.store / "Band/Record/1. - Band - Other.flac")
+        self.assertEqual(self.relayout.destination(fingerprinted), self.store / "Artist/2020 - Album/Artist - Song.mp3")
+        self.assertIsNone(self.relayout.destination(untagged))
+
+    def test_plan_skips_files_in_place(self):
+        self.write("Artist/2020 - Album/3. - Artist - Song.mp3", SPOTIFY_TAGS)
+        moved = self.write("old/other.flac", METADATA_TAGS)
+        self.write("old/cover.jpg")
+        self.assertEqual(self.relayout.plan(), [Move(moved, self.store / "Band/Record/1. - Band - Other.flac")])
+
+    def test_run_moves_sidecars_and_indexes(self):
+        song = self.write("old/dir/song.mp3", SPOTIFY_TAGS)
+        song.with_suffix(".lrc").write_text("[00:01] la")
+        self.index.record(song, "abc", source=Path("/music/song.mp3"), tag_source="SPOTIFY")
+        self.sidecars.record(song, "lrc", "spotify:abc", "digest")
+        destination = self.store / "Artist/2020 - Album/3. - Artist - Song.mp3"
+
+        self.assertEqual(self.relayout.run(), {"moved": 1, "conflicts": 0, "failed": 0})
+        self.assertTrue(destination.exists())
+        self.assertEqual(destination.with_suffix(".lrc").read_text(), "[00:01] la")
+        self.assertFalse((self.store / "old").exists())  # Emptied directories are removed
+        self.assertEqual(self.index.find_spotify_id("abc"), [destination])
+        self.assertEqual(self.index.get(destination)["source"], str(Path("/music/song.mp3")))
+        self.assertIsNone(self.sidecars.get(song))
+        self.assertEqual(self.sidecars.get(destination)["source"], "spotify:abc")
+
+    def test_conflict_left_in_place(self):
+        self.write("Artist/2020 - Album/3. - Artist - Song.mp3", SPOTIFY_TAGS)
+        copy = self.write("old/copy.mp3", SPOTIFY_TAGS)
+        self.assertEqual(self.relayout.run(), {"moved": 0, "conflicts": 1, "failed": 0})
+        self.assertTrue(copy.exists())
+
+    def test_dry_run(self):
+        song = self.write("old/song.mp3", SPOTIFY_TAGS)
+        self.relayout.dry_run = True
+        self.assertEqual(self.relayout.run()["moved"], 1)
+        self.assertTrue(song.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
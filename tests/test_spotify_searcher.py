@@ -0,0 +1,152 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import mporg.types
+from benchmarks.fake_spotify import FakeSpotifyServer, FakeCatalog
+from mporg import spotify_searcher
+
+
+class TestSpotifySearcherOffline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with patch.object(spotify_searcher, "CONFIG_DIR", Path(self.tmp.name)):
+            self.searcher = spotify_searcher.SpotifySearcher("cid", "secret", offline=True)
+        self.searcher.session = MagicMock()
+        self.searcher.validate_token = MagicMock()
+
+    def tearDown(self):
+        self.searcher.cache.close()
+        self.tmp.cleanup()
+
+    def test_cached_result_returned(self):
+        track = mporg.types.Track(track_name="Song 1", track_artists=("Artist 1",))
+        self.searcher.cache["None-None-12345"] = track
+
+        self.assertEqual(self.searcher.search(spot_id="12345"), track)
+
+    def test_no_requests_when_not_cached(self):
+        self.assertIsNone(self.searcher.search(name="Song 1", artist="Artist 1"))
+        self.assertIsNone(self.searcher.search(spot_id="12345"))
+
+        self.searcher.session.get.assert_not_called()
+        self.searcher.validate_token.assert_not_called()
+
+
+class TestSpotifySearcherFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog = FakeCatalog()
+        self.track = self.catalog.add_track("Song 1", ["Artist 1"], album="Album 1", release_date="2021-05-01")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _searcher(self, server, name="cache"):
+        with patch.object(spotify_searcher, "CONFIG_DIR", Path(self.tmp.name)):
+            return spotify_searcher.SpotifySearcher("cid", "secret", api_url=server.api_url, auth_url=server.auth_url,
+                                                    cache_dir=Path(self.tmp.name) / name)
+
+    def test_search_by_name_and_id(self):
+        with FakeSpotifyServer(catalog=self.catalog) as server:
+            searcher = self._searcher(server)
+            by_name = searcher.search(name="Song 1", artist="Artist 1")
+            by_id = searcher.search(spot_id=self.track["id"])
+            missing = searcher.search(name="Unknown", artist="Artist 1")
+            searcher.cache.close()
+
+        self.assertEqual(by_name.track_name, "Song 1")
+        self.assertEqual(by_name.album_name, "Album 1")
+        self.assertEqual(by_name.album_year, "2021")
+        self.assertEqual(by_name.track_id, self.track["id"])
+        self.assertEqual(by_id, by_name)
+        self.assertIsNone(missing)
+        self.assertFalse((Path(self.tmp.name) / ".sp_auth_cache").exists())
+
+    def test_rate_limited_requests_are_retried(self):
+        with FakeSpotifyServer(catalog=self.catalog, rate_limit_every=2, retry_after=0) as server:
+            searcher = self._searcher(server)
+            result = searcher.search(spot_id=self.track["id"])
+            stats = searcher.stats()
+            searcher.cache.close()
+
+        self.assertEqual(result.track_name, "Song 1")
+        self.assertGreater(server.rate_limited_count, 0)
+        self.assertEqual(stats["rate_limited"], server.rate_limited_count)
+
+    def test_stats_count_requests(self):
+        with FakeSpotifyServer(catalog=self.catalog) as server:
+            searcher = self._searcher(server)
+            searcher.search(spot_id=self.track["id"])
+            searcher.search(spot_id=self.track["id"])
+            stats = searcher.stats()
+            searcher.cache.close()
+
+        self.assertEqual(stats["http_calls"]["tracks"], 1)
+        self.assertEqual(stats["http_calls_total"], server.request_count)
+        self.assertEqual(stats["cache"]["memory_hits"], 1)
+        self.assertEqual(stats["rate_limited"], 0)
+
+    def test_search_id_then_details(self):
+        with FakeSpotifyServer(catalog=self.catalog) as server:
+            searcher = self._searcher(server)
+            spot_id = searcher.search_id("Song 1", "Artist 1")
+            track = searcher.search(spot_id=spot_id)
+            again = searcher.search_id("Song 1", "Artist 1")
+            missing = searcher.search_id("Unknown", "Artist 1")
+            stats = searcher.stats()
+            searcher.cache.close()
+
+        self.assertEqual(spot_id, self.track["id"])
+        self.assertEqual((track.track_name, track.track_id), ("Song 1", spot_id))
+        self.assertEqual(again, spot_id)
+        self.assertIsNone(missing)
+        self.assertEqual(stats["http_calls"]["search"], 2)
+        self.assertNotIn("tracks", stats["http_calls"])  # The search match is reused for the details
+
+    def test_search_id_from_full_search(self):
+        with FakeSpotifyServer(catalog=self.catalog) as server:
+            searcher = self._searcher(server)
+            searcher.search(name="Song 1", artist="Artist 1")
+            spot_id = searcher.search_id("Song 1", "Artist 1")
+            stats = searcher.stats()
+            searcher.cache.close()
+
+        self.assertEqual(spot_id, self.track["id"])
+        self.assertEqual(stats["http_calls"]["search"], 1)
+
+    def test_search_after_search_id(self):
+        with FakeSpotifyServer(catalog=self.catalog) as server:
+            searcher = self._searcher(server)
+            searcher.search_id("Unknown", "Artist 1")
+            missing = searcher.search(name="Unknown", artist="Artist 1")
+            searcher.search_id("Song 1", "Artist 1")
+            track = searcher.search(name="Song 1", artist="Artist 1")
+            stats = searcher.stats()
+            searcher.cache.close()
+
+        self.assertIsNone(missing)
+        self.assertEqual(track.track_id, self.track["id"])
+        self.assertEqual(stats["http_calls"]["search"], 2)  # One per track, search_id's answer is reused
+        self.assertNotIn("tracks", stats["http_calls"])
+
+    def test_record_and_replay(self):
+        fixtures = Path(self.tmp.name) / "fixtures"
+        with FakeSpotifyServer(catalog=self.catalog) as upstream:
+            with FakeSpotifyServer(record=fixtures, upstream=upstream.api_url, upstream_auth=upstream.auth_url) as rec:
+                searcher = self._searcher(rec, "record")
+                recorded = searcher.search(name="Song 1", artist="Artist 1")
+                searcher.cache.close()
+
+        with FakeSpotifyServer(replay=fixtures) as replay:
+            searcher = self._searcher(replay, "replay")
+            replayed = searcher.search(name="Song 1", artist="Artist 1")
+            searcher.cache.close()
+
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(replay.endpoint_counts["search"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
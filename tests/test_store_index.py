@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from mporg.store_index import StoreIndex, index_path, scan_file
+
+AUDIO = bytes(range(256)) * 16
+
+
+class StoreIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.store = Path(self.temp.name) / "store"
+        self.index = StoreIndex(self.store, Path(self.temp.name) / "index.db")
+        self.addCleanup(self.index.close)
+
+    def write(self, relative: str, data: bytes = AUDIO) -> Path:
+        path = self.store / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+
+class TestStoreIndex(StoreIndexTestCase):
+    def test_record_and_find(self):
+        path = self.write("Artist/Album/1. - Artist - Song.mp3")
+        self.index.record(path, "abc", "blake2b:00", Path("/music/song.mp3"), "SPOTIFY")
+
+        entry = self.index.get(path)
+        self.assertEqual(entry["destination"], path)
+        self.assertEqual((entry["spotify_id"], entry["digest"], entry["source"], entry["tag_source"]),
+                         ("abc", "blake2b:00", str(Path("/music/song.mp3")), "SPOTIFY"))
+        self.assertEqual(entry["size"], len(AUDIO))
+        self.assertTrue(self.index.contains(path))
+        self.assertFalse(self.index.contains(self.store / "other.mp3"))
+        self.assertEqual(self.index.find_spotify_id("abc"), [path])
+        self.assertEqual(self.index.find_digest("blake2b:00"), [path])
+        self.assertEqual(self.index.find_spotify_id("missing"), [])
+
+    def test_update_keeps_known_fields(self):
+        path = self.write("song.mp3")
+        self.index.record(path, "abc", "blake2b:00", Path("/music/song.mp3"), "SPOTIFY")
+        created = self.index.get(path)["created"]
+        self.index.record(path, "def")
+        entry = self.index.get(path)
+        self.assertEqual((entry["spotify_id"], entry["digest"], entry["source"]),
+                         ("def", "blake2b:00", str(Path("/music/song.mp3"))))
+        self.assertEqual(entry["created"], created)
+        self.assertEqual(len(self.index), 1)
+
+    def test_absolute_and_relative_paths(self):
+        cwd = os.getcwd()
+        os.chdir(self.temp.name)
+        self.addCleanup(os.chdir, cwd)
+        index = StoreIndex(Path("store"), Path("relative.db"))
+        self.addCleanup(index.close)
+        index.record(Path("store") / "song.mp3")
+        self.assertTrue(index.contains(Path(self.temp.name).resolve() / "store" / "song.mp3"))
+
+    def test_remove_and_stats(self):
+        first, second = self.write("a.mp3"), self.write("b.mp3")
+        self.index.record(first, "abc", tag_source="SPOTIFY")
+        self.index.record(second, tag_source="METADATA")
+        self.assertEqual(self.index.stats(), {"files": 2, "with_spotify_id": 1, "with_digest": 0,
+                                              "tag_sources": {"SPOTIFY": 1, "METADATA": 1}})
+        self.index.remove(first)
+        self.assertEqual(len(self.index), 1)
+
+    def test_move(self):
+        old, new = self.write("old.mp3"), self.store / "Artist" / "new.mp3"
+        self.index.record(old, "abc", source=Path("/music/song.mp3"))
+        self.index.record(new, "stale")
+        self.index.move(old, new)
+        self.assertFalse(self.index.contains(old))
+        self.assertEqual(self.index.get(new)["spotify_id"], "abc")
+        self.assertEqual(len(self.index), 1)
+
+    def test_index_path_per_store(self):
+        self.assertNotEqual(index_path(Path("/music/a")), index_path(Path("/music/b")))
+        self.assertEqual(index_path(Path("/music/a")), index_path(Path("/music/a")))
+
+
+class TestRebuild(StoreIndexTestCase):
+    def test_scan_file_without_tags(self):
+        spotify_id, digest = scan_file(self.write("song.mp3"))
+        self.assertIsNone(spotify_id)
+        self.assertTrue(digest.startswith("blake2b:"))
+
+    @patch("mporg.audio_digest.audio_digest", side_effect=lambda path: f"hashed:{path.stem}")
+    @patch("mporg.store_index.scan_file", side_effect=lambda path: (path.stem, f"digest:{path.stem}"))
+    def test_rebuild(self, scan, audio_digest):
+        kept = self.write("Artist/kept.mp3")
+        undigested = self.write("Artist/undigested.mp3")
+        changed = self.write("Artist/changed.flac")
+        self.write("Artist/cover.jpg")
+        self.index.record(kept, "kept", "blake2b:00", source=Path("/music/kept.mp3"))
+        self.index.record(undigested, "undigested")
+        self.index.record(changed, "old")
+        self.index.record(self.store / "deleted.mp3", "deleted")
+        os.utime(changed, ns=(0, 0))
+        new = self.write("Other/new.mp3")
+
+        counts = self.index.rebuild(workers=2)
+        self.assertEqual(counts, {"scanned": 2, "hashed": 1, "unchanged": 1, "removed": 1})
+        self.assertEqual({call.args[0] for call in scan.call_args_list}, {changed, new})
+        audio_digest.assert_called_once_with(undigested)
+        self.assertEqual(self.index.find_digest("hashed:undigested"), [undigested])
+        self.assertEqual(self.index.get(undigested)["spotify_id"], "undigested")
+        self.assertEqual(self.index.find_spotify_id("changed"), [changed])
+        self.assertEqual(self.index.get(new)["tag_source"], "SPOTIFY")
+        self.assertEqual(self.index.get(kept)["source"], str(Path("/music/kept.mp3")))
+        self.assertFalse(self.index.contains(self.store / "deleted.mp3"))
+
+        self.assertEqual(self.index.rebuild(full=True)["scanned"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
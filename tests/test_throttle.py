@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mporg.throttle import Batcher, LaneScheduler, RateLimiter, SingleFlight
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_spacing(self):
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 20 - 0.01)
+
+    def test_arrival_order(self):
+        limiter = RateLimiter(50)
+        order = []
+        lock = threading.Lock()
+
+        def call(i):
+            with limiter:
+                with lock:
+                    order.append(i)
+
+        threads = []
+        for i in range(5):
+            threads.append(threading.Thread(target=call, args=(i,)))
+            threads[-1].start()
+            time.sleep(0.002)  # Arrive in order, well inside one interval
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, list(range(5)))
+        self.assertGreater(limiter.waited, 0)
+
+
+class TestBatcher(unittest.TestCase):
+    def test_batches_concurrent_callers(self):
+        batches = []
+        batcher = Batcher(lambda items: batches.append(list(items)) or [item * 2 for item in items],
+                          max_size=4, max_wait=0.2)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(batcher, range(8)))
+
+        self.assertEqual(results, [i * 2 for i in range(8)])
+        self.assertEqual(sum(len(batch) for batch in batches), 8)
+        self.assertLess(len(batches), 8)
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual(batcher.stats()["items"], 8)
+
+    def test_wait_window(self):
+        batcher = Batcher(lambda items: items, max_size=10, max_wait=0.05)
+        start = time.monotonic()
+        self.assertEqual(batcher("only"), "only")
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_errors_reach_every_caller(self):
+        def handler(items):
+            raise RuntimeError("service down")
+
+        batcher = Batcher(handler, max_size=2, max_wait=0.2)
+        futures = [batcher.submit(i) for i in range(2)]
+        for future in futures:
+            with self.assertRaisesRegex(RuntimeError, "service down"):
+                future.result(timeout=5)
+
+    def test_limiter(self):
+        limiter = RateLimiter(10)
+        batcher = Batcher(lambda items: items, max_size=1, max_wait=0, limiter=limiter)
+        start = time.monotonic()
+        for i in range(3):
+            batcher(i)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_shared(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return "recording"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(flight.do, "mbid", fetch) for _ in range(4)]
+            while flight.shared < 3:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, ["recording"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.do("mbid", lambda: "again"), "again")  # Finished calls are not remembered
+
+    def test_errors_shared(self):
+        flight = SingleFlight()
+        with self.assertRaises(KeyError):
+            flight.do("mbid", lambda: {}["missing"])
+        self.assertEqual(flight.do("mbid", lambda: 1), 1)
+
+
+class TestLaneScheduler(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+        self.order = []
+        self.gate = threading.Event()
+
+    def task(self, name):
+        self.gate.wait(5)
+        self.order.append(name)
+        return name
+
+    def test_earlier_lanes_first(self):
+        scheduler = LaneScheduler(self.executor, 1, ["fast", "slow"])
+        futures = [scheduler.submit("slow", self.task, "slow 1")]  # Starts at once, the only task so far
+        futures += [scheduler.submit("slow", self.task, "slow 2"), scheduler.submit("fast", self.task, "fast 1"),
+                    scheduler.submit("fast", self.task, "fast 2")]
+        self.gate.set()
+        self.assertEqual([f.result(5) for f in futures], ["slow 1", "slow 2", "fast 1", "fast 2"])
+        self.assertEqual(self.order, ["slow 1", "fast 1", "fast 2", "slow 2"])
+        self.assertEqual(scheduler.stats()["fast"], {"submitted": 2, "finished": 2, "queued": 0, "running": 0})
+
+    def test_lane_limit(self):
+        scheduler = LaneScheduler(self.executor, 2, ["fast", "slow"], {"slow": 1})
+        slow = [scheduler.submit("slow", self.task, f"slow {i}") for i in range(2)]
+        fast = scheduler.submit("fast", self.task, "fast")  # Gets the second thread although submitted last
+        stats = scheduler.stats()
+        self.assertEqual((stats["slow"]["running"], stats["slow"]["queued"], stats["fast"]["running"]), (1, 1, 1))
+        self.gate.set()
+        self.assertEqual(fast.result(5), "fast")
+        self.assertEqual([future.result(5) for future in slow], ["slow 0", "slow 1"])
+
+    def test_exceptions_and_cancel(self):
+        scheduler = LaneScheduler(self.executor, 1, ["only"])
+        blocker = scheduler.submit("only", self.task, "blocker")
+        failing = scheduler.submit("only", lambda: 1 / 0)
+        cancelled = scheduler.submit("only", self.task, "cancelled")
+        self.assertTrue(cancelled.cancel())
+        self.gate.set()
+        blocker.result(5)
+        with self.assertRaises(ZeroDivisionError):
+            failing.result(5)
+        self.assertNotIn("cancelled", self.order)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from mporg import watch
+from mporg.watch import InotifyWatcher, PollingWatcher, SettleTracker
+
+
+def collect(watcher, expected: int, timeout: float = 5) -> set[Path]:
+    changed = set()
+    deadline = time.monotonic() + timeout
+    while len(changed) < expected and time.monotonic() < deadline:
+        changed |= watcher.changes(0.1)
+    return changed
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp.name)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+
+class TestPollingWatcher(WatchTestCase):
+    def test_new_and_modified_files(self):
+        existing = self.root / "old.mp3"
+        existing.write_bytes(b"old")
+        untouched = self.root / "untouched.mp3"
+        untouched.write_bytes(b"same")
+        watcher = PollingWatcher(self.root, 0.05)
+
+        (self.root / "album").mkdir()
+        new = self.root / "album" / "new.mp3"
+        new.write_bytes(b"new")
+        existing.write_bytes(b"changed")
+        self.assertEqual(collect(watcher, 2), {new, existing})
+        self.assertEqual(watcher.changes(0.1), set())
+
+    def test_waits_for_interval(self):
+        watcher = PollingWatcher(self.root, 10)
+        (self.root / "new.mp3").write_bytes(b"new")
+        self.assertEqual(watcher.changes(0.01), set())
+
+
+@unittest.skipUnless(hasattr(os, "uname") and os.uname().sysname == "Linux", "inotify is Linux only")
+class TestInotifyWatcher(WatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.watcher = InotifyWatcher(self.root)
+        self.addCleanup(self.watcher.close)
+
+    def test_new_file(self):
+        path = self.root / "song.mp3"
+        path.write_bytes(b"data")
+        self.assertEqual(collect(self.watcher, 1), {path})
+
+    def test_new_directory_watched(self):
+        album = self.root / "album" / "disc 1"
+        album.mkdir(parents=True)
+        first = album / "1.mp3"
+        first.write_bytes(b"data")
+        changed = collect(self.watcher, 1)
+        self.assertIn(first, changed)
+
+        second = album / "2.mp3"
+        second.write_bytes(b"data")
+        self.assertIn(second, collect(self.watcher, 1))
+
+    def test_moved_in(self):
+        outside = tempfile.TemporaryDirectory()
+        self.addCleanup(outside.cleanup)
+        source = Path(outside.name) / "song.mp3"
+        source.write_bytes(b"data")
+        destination = self.root / "song.mp3"
+        os.replace(source, destination)
+        self.assertEqual(collect(self.watcher, 1), {destination})
+
+
+class TestSettleTracker(WatchTestCase):
+    def test_ready_after_settle(self):
+        path = self.root / "song.mp3"
+        path.write_bytes(b"data")
+        tracker = SettleTracker(5)
+        tracker.touch([path], now=0)
+        self.assertEqual(tracker.ready(now=1), [])
+        self.assertEqual(tracker.next_check(now=1), 4)
+        self.assertEqual(tracker.ready(now=5), [])  # First stat, confirmed after another settle period
+        self.assertEqual(tracker.ready(now=10), [path])
+        self.assertEqual(len(tracker), 0)
+        self.assertIsNone(tracker.next_check())
+
+    def test_growing_file_held_back(self):
+        path = self.root / "song.mp3"
+        path.write_bytes(b"part")
+        tracker = SettleTracker(5)
+        tracker.touch([path], now=0)
+        tracker.ready(now=5)
+        with open(path, "ab") as f:
+            f.write(b" more")
+        self.assertEqual(tracker.ready(now=10), [])
+        self.assertEqual(tracker.ready(now=15), [path])
+
+    def test_event_restarts_settle(self):
+        path = self.root / "song.mp3"
+        path.write_bytes(b"data")
+        tracker = SettleTracker(5)
+        tracker.touch([path], now=0)
+        tracker.ready(now=5)
+        tracker.touch([path], now=8)
+        self.assertEqual(tracker.ready(now=10), [])
+
+    def test_deleted_dropped(self):
+        tracker = SettleTracker(0)
+        tracker.touch([self.root / "gone.mp3"], now=0)
+        self.assertEqual(tracker.ready(now=1), [])
+        self.assertEqual(len(tracker), 0)
+
+
+class TestWatch(WatchTestCase):
+    def test_reports_settled_files_outside_store(self):
+        store = self.root / "store"
+        store.mkdir()
+        ready = []
+        stop = threading.Event()
+
+        def on_ready(path):
+            ready.append(path)
+            stop.set()
+
+        thread = threading.Thread(target=watch.watch, args=(self.root, on_ready, 0.1, 0.05, stop, store))
+        thread.start()
+        time.sleep(0.1)
+        (store / "organized.mp3").write_bytes(b"data")
+        song = self.root / "song.mp3"
+        song.write_bytes(b"data")
+        thread.join(5)
+        stop.set()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(ready, [song])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from mporg.workqueue import DONE, FAILED, LEASED, PENDING, WorkQueue, Worker
+
+
+class FakeOrganizer:
+    def __init__(self, fail: set = ()):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.fail = fail
+        self.processed = []
+        self._lock = threading.Lock()
+
+    def accepts(self, file: Path) -> bool:
+        return file.suffix == ".mp3"
+
+    def process_file(self, args):
+        root, file = args
+        with self._lock:
+            self.processed.append(root / file)
+        if file.name in self.fail:
+            return f"Error processing file {file}: bad"
+        return None
+
+    def submit_file(self, root: Path, file: Path):
+        return self.executor.submit(self.process_file, (root, file))
+
+
+class WorkQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp.name) / "queue.db"
+        self.queue = WorkQueue(self.path)
+        self.addCleanup(self.temp.cleanup)
+        self.addCleanup(self.queue.close)
+
+    def fill(self, count: int) -> list[Path]:
+        files = [Path(f"{i}.mp3") for i in range(count)]
+        self.queue.add((Path(self.temp.name), file) for file in files)
+        return files
+
+
+class TestWorkQueue(WorkQueueTestCase):
+    def test_add_ignores_duplicates(self):
+        self.assertEqual(self.queue.add([("/music", "a.mp3"), ("/music", "b.mp3")]), 2)
+        self.assertEqual(self.queue.add([("/music", "a.mp3"), ("/music", "c.mp3")]), 1)
+        self.assertEqual(self.queue.counts()[PENDING], 3)
+
+    def test_lease_and_ack(self):
+        self.fill(3)
+        items = self.queue.lease("a", 2)
+        self.assertEqual([item.file for item in items], [Path("0.mp3"), Path("1.mp3")])
+        self.assertEqual(self.queue.lease("b", 5)[0].file, Path("2.mp3"))
+        self.assertEqual(self.queue.lease("b", 5), [])
+
+        self.assertTrue(self.queue.ack("a", items[0].id))
+        self.assertTrue(self.queue.ack("a", items[1].id, "bad file"))
+        self.assertEqual(self.queue.counts(), {PENDING: 0, LEASED: 1, DONE: 1, FAILED: 1})
+        self.assertEqual(self.queue.failures(), [(str(Path(self.temp.name) / "1.mp3"), "bad file")])
+
+    def test_expired_lease_taken_over(self):
+        self.fill(1)
+        first = self.queue.lease("crashed", 1, lease=0.01)[0]
+        time.sleep(0.02)
+        second = self.queue.lease("b", 1)[0]
+        self.assertEqual((second.id, second.attempts), (first.id, 2))
+        self.assertFalse(self.queue.ack("crashed", first.id))
+        self.assertTrue(self.queue.ack("b", second.id))
+
+    def test_renew_keeps_lease(self):
+        self.fill(1)
+        item = self.queue.lease("a", 1, lease=0.05)[0]
+        self.assertEqual(self.queue.renew("a", [item.id], lease=60), 1)
+        time.sleep(0.06)
+        self.assertEqual(self.queue.lease("b", 1), [])
+        self.assertEqual(self.queue.renew("b", [item.id]), 0)
+
+    def test_max_attempts(self):
+        self.fill(1)
+        for _ in range(2):
+            self.queue.lease("a", 1, lease=0, max_attempts=2)
+            time.sleep(0.01)
+        self.assertEqual(self.queue.lease("a", 1, max_attempts=2), [])
+        self.assertEqual(self.queue.counts()[FAILED], 1)
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.assertEqual(self.queue.lease("a", 1)[0].attempts, 1)
+
+    def test_concurrent_leases_are_disjoint(self):
+        self.fill(200)
+        leased = []
+        lock = threading.Lock()
+
+        def lease(name):
+            queue = WorkQueue(self.path)
+            while items := queue.lease(name, 7):
+                with lock:
+                    leased.extend(item.id for item in items)
+            queue.close()
+
+        threads = [threading.Thread(target=lease, args=(str(i),)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(leased), sorted(set(leased)))
+        self.assertEqual(len(leased), 200)
+
+
+class TestWorker(WorkQueueTestCase):
+    def test_processes_queue(self):
+        files = self.fill(10)
+        self.queue.add([(self.temp.name, "cover.jpg")])
+        org = FakeOrganizer(fail={"3.mp3"})
+        counts = Worker(self.queue, org, batch=3).run()
+        self.assertEqual(sorted(org.processed), sorted(Path(self.temp.name) / file for file in files))
+        self.assertEqual(counts, {"processed": 9, "failed": 1, "lost": 0})
+        self.assertEqual(self.queue.counts(), {PENDING: 0, LEASED: 0, DONE: 10, FAILED: 1})
+
+    def test_workers_share_queue(self):
+        self.fill(50)
+        orgs = [FakeOrganizer(), FakeOrganizer()]
+        threads = [threading.Thread(target=Worker(WorkQueue(self.path), org, batch=4, name=str(i)).run,
+                                    kwargs={"idle": 0.05})
+                   for i, org in enumerate(orgs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(sum(len(org.processed) for org in orgs), 50)
+        self.assertEqual(self.queue.counts()[DONE], 50)
+
+    def test_waits_for_other_leases(self):
+        self.fill(1)
+        self.queue.lease("crashed", 1, lease=0.2)
+        org = FakeOrganizer()
+        start = time.monotonic()
+        Worker(self.queue, org, batch=2).run(idle=0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(len(org.processed), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
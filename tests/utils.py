@@ -29,6 +29,15 @@ class MockTagger(mporg.types.Tagger):
         pass
 
 
+class DictCache(dict):
+    """In-memory stand-in for the diskcache.Cache methods used by the indexes"""
+    def set(self, key, value, expire=None):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
+
 class MockSearcher:
     def search(self, name: str = None, artist: str = None, spot_id: str = None):
         return mporg.types.Track(track_name='Test Track', track_artists=['Test Artist'], album_name='Test Album',